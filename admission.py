@@ -0,0 +1,171 @@
+import asyncio
+import os
+from collections import deque
+from time import monotonic
+from typing import Optional
+from litestar import Request
+from litestar.config.app import AppConfig
+from litestar.exceptions import ServiceUnavailableException
+from litestar.types import ASGIApp, Receive, Scope, Send
+
+
+# // ADMISSION CONFIGURATION
+# requests served at once per route class, up to QUEUE_LIMIT more wait for a slot
+LIMITS = {
+    "cached": int(os.environ.get("ADMIT_CACHED", 256)),  # response cache hits
+    "read": int(os.environ.get("ADMIT_READ", 12)),
+    "write": int(os.environ.get("ADMIT_WRITE", 6)),
+    "hash": int(os.environ.get("ADMIT_HASH", 4)),  # login / register, pbkdf2
+}
+QUEUE_LIMIT = int(os.environ.get("ADMIT_QUEUE", 64))
+QUEUE_TIMEOUT = float(os.environ.get("ADMIT_QUEUE_TIMEOUT", 2.0))  # seconds
+POOL_WAIT_LIMIT = float(os.environ.get("ADMIT_POOL_WAIT", 0.5))  # seconds
+POOL_WAIT_WEIGHT = 0.2  # of the newest sample in the moving average
+POOL_WAIT_WINDOW = 1.0  # seconds a pool wait sample counts, then requests probe again
+RETRY_AFTER = 1
+EXEMPT = "exempt"  # opt={"admission": EXEMPT}: never queued or shed (/metrics)
+
+DETAIL = "⚠️ SERVER BUSY, TRY AGAIN"
+BODY = DETAIL.encode()
+HEADERS = [
+    (b"content-type", b"text/plain; charset=utf-8"),
+    (b"content-length", str(len(BODY)).encode()),
+    (b"retry-after", str(RETRY_AFTER).encode()),
+]
+
+
+# // GATE
+# a counting semaphore with a bounded FIFO of waiters: a full queue or a wait
+# past QUEUE_TIMEOUT answers 503 at once instead of piling onto the pool
+class Gate:
+    __slots__ = ("limit", "active", "waiters")
+
+    def __init__(self, limit: int) -> None:
+        self.limit = limit
+        self.active = 0
+        self.waiters: deque[asyncio.Future[None]] = deque()
+
+    async def enter(self) -> Optional[str]:
+        if self.active < self.limit and not self.waiters:
+            self.active += 1
+            return None
+        if len(self.waiters) >= QUEUE_LIMIT:
+            return "queue_full"
+        waiter = asyncio.get_running_loop().create_future()
+        self.waiters.append(waiter)
+        try:
+            await asyncio.wait_for(waiter, QUEUE_TIMEOUT)
+        except BaseException as exc:
+            if waiter.done() and not waiter.cancelled():
+                self.leave()  # handed a slot just as we gave up, pass it on
+            else:
+                self.waiters.remove(waiter)
+            if isinstance(exc, TimeoutError):
+                return "timeout"
+            raise
+        return None
+
+    # the slot goes straight to the oldest waiter, `active` stays the same
+    def leave(self) -> None:
+        while self.waiters:
+            waiter = self.waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self.active -= 1
+
+
+class Admission:
+    def __init__(self) -> None:
+        self.gates = {name: Gate(limit) for name, limit in LIMITS.items()}
+        self.shed: dict[tuple[str, str], int] = {}  # (route class, reason) -> count
+        self.classes: dict[int, str] = {}  # id(route handler) -> route class
+        self.pool_wait = 0.0  # moving average, seconds
+        self.pool_wait_at = 0.0
+
+    def observe_pool_wait(self, wait: float) -> None:
+        self.pool_wait += (wait - self.pool_wait) * POOL_WAIT_WEIGHT
+        self.pool_wait_at = monotonic()
+
+    def saturated(self) -> bool:
+        return (
+            self.pool_wait > POOL_WAIT_LIMIT
+            and monotonic() - self.pool_wait_at < POOL_WAIT_WINDOW
+        )
+
+    def count(self, route_class: str, reason: str) -> None:
+        key = (route_class, reason)
+        self.shed[key] = self.shed.get(key, 0) + 1
+
+
+admission = Admission()
+
+
+def route_class(scope: Scope) -> str:
+    handler = scope["route_handler"]
+    found = admission.classes.get(id(handler))
+    if found is None:
+        found = handler.opt.get("admission")
+        if found is None:
+            if "GET" in handler.http_methods or "HEAD" in handler.http_methods:
+                found = "read"
+            else:
+                found = "write"
+        admission.classes[id(handler)] = found
+    return found
+
+
+# a cached route is only cheap when its response is there: a miss runs the
+# handler's queries like any read, so it keeps the read slot and the pool shed.
+# The key is kept in the scope state, the route looks up the same one
+async def cache_hit(scope: Scope) -> bool:
+    app, handler = scope["app"], scope["route_handler"]
+    config = app.response_cache_config
+    key = (handler.cache_key_builder or config.key_builder)(Request(scope))
+    return await config.get_store_from_app(app).get(key) is not None
+
+
+# raised by provide_transaction when the pool itself has no connection in time
+def overloaded(scope: Scope, reason: str) -> ServiceUnavailableException:
+    admission.count(route_class(scope), reason)
+    return ServiceUnavailableException(
+        DETAIL, headers={"Retry-After": str(RETRY_AFTER)}
+    )
+
+
+# // MIDDLEWARE
+def middleware(app: ASGIApp) -> ASGIApp:
+    async def admitted(scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await app(scope, receive, send)
+            return
+        name = route_class(scope)
+        if name == "read" and scope["route_handler"].cache and await cache_hit(scope):
+            name = "cached"
+        gate = admission.gates.get(name)
+        if gate is None:
+            await app(scope, receive, send)
+            return
+        # cache hits never touch the pool, the rest would only wait on it
+        reason = "pool" if name != "cached" and admission.saturated() else None
+        reason = reason or await gate.enter()
+        if reason is not None:
+            admission.count(name, reason)
+            await send(
+                {"type": "http.response.start", "status": 503, "headers": HEADERS}
+            )
+            await send({"type": "http.response.body", "body": BODY})
+            return
+        try:
+            await app(scope, receive, send)
+        finally:
+            gate.leave()
+
+    return admitted
+
+
+# registered before metrics.on_app_init: metrics stays outermost and counts the
+# 503s, auth runs only for admitted requests
+def on_app_init(app_config: AppConfig) -> AppConfig:
+    app_config.middleware.insert(0, middleware)
+    return app_config
@@ -0,0 +1,104 @@
+from typing import Any
+from litestar.exceptions import ValidationException
+from sqlalchemy import ARRAY, Column, Integer, any_, bindparam, literal, select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+import cache
+import likes as lk
+import models as md
+
+
+# // BATCH CONFIGURATION
+MAX_BATCH = 100
+
+ADDED, EXISTS, NOT_FOUND = "added", "already exists", "not found"
+
+
+def _parent_column(model: type[md.Base], parent: type[md.Base]) -> Column[Any]:
+    return next(
+        c
+        for c in model.__table__.columns
+        if any(fk.column.table is parent.__table__ for fk in c.foreign_keys)
+    )
+
+
+def _ids(ids: list[int]) -> list[int]:
+    if not ids:
+        raise ValidationException("⚠️ No ids given")
+    if len(ids) > MAX_BATCH:
+        raise ValidationException(f"⚠️ At most {MAX_BATCH} ids per batch")
+    return list(dict.fromkeys(ids))  # duplicates would only report twice
+
+
+# // INSERT
+# one round trip: the existence check (id = ANY) feeds a multi-row
+# INSERT ... ON CONFLICT DO NOTHING RETURNING, and a left join tells the three
+# outcomes apart
+async def insert_many(
+    db: AsyncSession,
+    model: type[md.Base],
+    parent: type[md.Base],
+    user_id: str,
+    ids: list[int],
+    **values: Any,
+) -> dict[int, str]:
+    ids = _ids(ids)
+    column = _parent_column(model, parent)
+    found = (
+        select(parent.id)  # type: ignore
+        .where(parent.id == any_(bindparam("ids", ids, type_=ARRAY(Integer))))
+        .cte("found")
+    )
+    extra = [literal(v).label(k) for k, v in values.items()]
+    ins = (
+        insert(model)
+        .from_select(
+            ["user_id", column.name, *values],
+            select(literal(user_id).label("user_id"), found.c.id, *extra),
+        )
+        .on_conflict_do_nothing()
+        .returning(column)
+        .cte("ins")
+    )
+    stmt = select(found.c.id, ins.c[column.name]).outerjoin(
+        ins, ins.c[column.name] == found.c.id
+    )
+    statuses = dict.fromkeys(ids, NOT_FOUND)
+    for entity_id, inserted in await db.execute(stmt):
+        statuses[entity_id] = EXISTS if inserted is None else ADDED
+    return statuses
+
+
+def _report(statuses: dict[int, str]) -> dict[str, Any]:
+    return {
+        "added": sum(s == ADDED for s in statuses.values()),
+        "results": [{"id": i, "status": s} for i, s in statuses.items()],
+    }
+
+
+async def list_add(
+    db: AsyncSession,
+    model: type[md.Base],
+    parent: type[md.Base],
+    user_id: str,
+    ids: list[int],
+    view: str,
+) -> dict[str, Any]:
+    statuses = await insert_many(db, model, parent, user_id, ids, view=view)
+    if ADDED in statuses.values():
+        await cache.invalidate(db, model)
+    return _report(statuses)
+
+
+async def likes_add(
+    db: AsyncSession,
+    model: type[md.Base],
+    parent: type[md.Base],
+    user_id: str,
+    ids: list[int],
+) -> dict[str, Any]:
+    statuses = await insert_many(db, model, parent, user_id, ids)
+    for entity_id, status in statuses.items():
+        if status == ADDED:
+            lk.stage(db, parent, entity_id)
+    return _report(statuses)
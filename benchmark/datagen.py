@@ -0,0 +1,276 @@
+"""Deterministic synthetic dataset, bulk loaded with COPY into the configured database.
+
+    python -m benchmark.datagen --scale small --reset
+
+The same --scale and --seed always produce the same rows, ids start at 1 so the
+load driver (benchmark.load) knows which ids exist. --reset TRUNCATEs every
+table first, restart the API afterwards so its in-memory indexes reload.
+"""
+import argparse
+import asyncio
+import random
+import time
+from collections import Counter
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Any
+import asyncpg
+from passlib.hash import pbkdf2_sha256 as securepwd
+import db_connenction as dc
+import migrations as mg
+import models_validation as mv
+
+
+# // SCALES
+@dataclass(frozen=True)
+class Scale:
+    colleges: int
+    courses: int
+    exams: int
+    academics: int
+    users: int
+    posts: int  # per entity kind
+    likes: int  # per entity kind
+    lists: int  # per entity kind
+
+
+SCALES = {
+    "tiny": Scale(50, 30, 10, 2_000, 50, 500, 1_000, 500),
+    "small": Scale(500, 200, 40, 50_000, 1_000, 10_000, 20_000, 5_000),
+    "medium": Scale(3_000, 600, 80, 500_000, 10_000, 100_000, 200_000, 50_000),
+    "large": Scale(10_000, 1_500, 150, 3_000_000, 50_000, 500_000, 1_000_000, 200_000),
+}
+
+PASSWORD = "bench"  # every generated user, the admin keeps admin/admin
+REPLY_RATE = 0.6  # share of posts that answer an earlier post of the same entity
+PUBLIC_RATE = 0.1  # share of list entries that are public, the default is private
+START = datetime(2024, 1, 1)
+
+STATES = [
+    ("Maharashtra", ["Mumbai", "Pune", "Nagpur"]),
+    ("Karnataka", ["Bengaluru", "Mysuru", "Manipal"]),
+    ("Tamil Nadu", ["Chennai", "Vellore", "Coimbatore"]),
+    ("Delhi", ["New Delhi"]),
+    ("Uttar Pradesh", ["Kanpur", "Lucknow", "Varanasi"]),
+    ("West Bengal", ["Kolkata", "Kharagpur"]),
+    ("Telangana", ["Hyderabad", "Warangal"]),
+    ("Rajasthan", ["Jaipur", "Pilani", "Jodhpur"]),
+]
+SUBJECTS = [
+    "Engineering",
+    "Technology",
+    "Medicine",
+    "Management",
+    "Law",
+    "Science",
+    "Architecture",
+    "Pharmacy",
+    "Design",
+    "Commerce",
+]
+KINDS = ["Institute", "University", "College", "Academy", "School"]
+WORDS = (
+    "algebra calculus physics chemistry biology anatomy economics statistics "
+    "programming circuits mechanics thermodynamics accounting marketing ethics "
+    "reasoning aptitude english history geography"
+).split()
+
+
+def sentence(rng: random.Random, n: int) -> str:
+    return " ".join(rng.choice(WORDS) for _ in range(n))
+
+
+def pairs(rng: random.Random, n: int, left: int, right: int) -> list[tuple[int, int]]:
+    # n distinct (left, right) pairs, 1-based
+    n = min(n, left * right)
+    seen: set[tuple[int, int]] = set()
+    while len(seen) < n:
+        seen.add((rng.randint(1, left), rng.randint(1, right)))
+    return sorted(seen)
+
+
+def view(rng: random.Random) -> str:
+    return "Public" if rng.random() < PUBLIC_RATE else "Private"
+
+
+# // ROWS
+@dataclass
+class Dataset:
+    tables: dict[str, tuple[list[str], list[tuple[Any, ...]]]]
+
+    def add(self, table: str, columns: list[str], rows: list[tuple[Any, ...]]) -> None:
+        self.tables[table] = (columns, rows)
+
+
+def generate(scale: Scale, seed: int) -> Dataset:
+    rng = random.Random(seed)
+    data = Dataset({})
+    pwd = securepwd.hash(PASSWORD)
+    users = [("Admin", "admin", "admin", securepwd.hash("admin"), True)]
+    users += [
+        (f"User {i}", f"user{i}", f"user{i}@bench.local", pwd, False)
+        for i in range(1, scale.users + 1)
+    ]
+    usernames = [u[1] for u in users[1:]]
+    data.add("User", ["name", "username", "email", "pwd", "admin"], users)
+
+    # likes first: the entity rows carry their like count
+    sizes = {"Course": scale.courses, "College": scale.colleges, "Exam": scale.exams}
+    likes = {m: pairs(rng, scale.likes, scale.users, n) for m, n in sizes.items()}
+    counts = {m: Counter(e for _, e in rows) for m, rows in likes.items()}
+
+    types = [t.value for t in mv.course_type]
+    courses = []
+    for i in range(1, scale.courses + 1):
+        subject = rng.choice(SUBJECTS)
+        kind = rng.choice(types)
+        name = f"{kind} {subject} {sentence(rng, 1).title()} {i}"
+        courses.append((i, name, rng.choice([2, 3, 4, 5]), kind, sentence(rng, 4)))
+    data.add(
+        "Course",
+        ["id", "name", "duration", "type", "elig", "likes"],
+        [(*c, counts["Course"][c[0]]) for c in courses],
+    )
+
+    colleges = []
+    for i in range(1, scale.colleges + 1):
+        state, cities = rng.choice(STATES)
+        city = rng.choice(cities)
+        name = f"{city} {rng.choice(KINDS)} of {rng.choice(SUBJECTS)} {i}"
+        colleges.append(
+            (i, name, i, city, f"info@college{i}.edu", state, "India", f"{i} Main Road")
+        )
+    data.add(
+        "College",
+        ["id", "name", "rank", "city", "email", "state", "country", "address", "likes"],
+        [(*c, counts["College"][c[0]]) for c in colleges],
+    )
+
+    exams = [
+        (i, f"{rng.choice(SUBJECTS)} Entrance Test {i}", sentence(rng, 3))
+        + (sentence(rng, 8), float(rng.randrange(500, 5000, 50)))
+        for i in range(1, scale.exams + 1)
+    ]
+    data.add(
+        "Exam",
+        ["id", "name", "elig", "syllabus", "fee", "likes"],
+        [(*e, counts["Exam"][e[0]]) for e in exams],
+    )
+
+    triples: set[tuple[int, int, int]] = set()
+    limit = min(scale.academics, scale.courses * scale.colleges * scale.exams)
+    while len(triples) < limit:
+        triples.add(
+            (
+                rng.randint(1, scale.courses),
+                rng.randint(1, scale.colleges),
+                rng.randint(1, scale.exams),
+            )
+        )
+    academics = [
+        (i, course, college, exam, float(rng.randrange(10_000, 2_000_000, 500)))
+        + (rng.randint(1, 200_000),)
+        for i, (course, college, exam) in enumerate(sorted(triples), 1)
+    ]
+    data.add(
+        "Academics",
+        ["id", "course_id", "college_id", "exam_id", "course_fee", "cutoff_rank"],
+        academics,
+    )
+
+    for model, n in sizes.items():
+        key, parent = f"{model.lower()}_id", f"{model.lower()}post_id"
+        posts, threads = [], [[] for _ in range(n + 1)]
+        for i in range(1, scale.posts + 1):
+            entity_id = rng.randint(1, n)
+            earlier = threads[entity_id]
+            reply_to = (
+                rng.choice(earlier) if earlier and rng.random() < REPLY_RATE else None
+            )
+            created = START + timedelta(seconds=i * 37)
+            posts.append(
+                (i, sentence(rng, 4), sentence(rng, 20), rng.choice(usernames))
+                + (created, entity_id, reply_to)
+            )
+            earlier.append(i)
+        columns = ["id", "title", "body", "user_id", "created_at", key, parent]
+        data.add(f"{model}Post", columns, posts)
+
+        lists = [
+            (i, usernames[u - 1], view(rng), entity_id)
+            for i, (u, entity_id) in enumerate(
+                pairs(rng, scale.lists, scale.users, n), 1
+            )
+        ]
+        data.add(f"{model}List", ["id", "user_id", "view", key], lists)
+        data.add(
+            f"{model}Likes",
+            ["id", "user_id", key],
+            [(i, usernames[u - 1], e) for i, (u, e) in enumerate(likes[model], 1)],
+        )
+    return data
+
+
+# // LOAD
+ORDER = ["User", "Course", "College", "Exam", "Academics"] + [
+    f"{m}{t}" for t in ("Post", "List", "Likes") for m in ("Course", "College", "Exam")
+]
+
+
+# the same migrations as manage.py migrate, a fresh database is ready for the API
+async def create_schema() -> None:
+    engine = dc.direct_engine()
+    try:
+        await mg.upgrade(engine)
+    finally:
+        await engine.dispose()
+
+
+async def load(data: Dataset, reset: bool) -> None:
+    await create_schema()
+    conn = await asyncpg.connect(
+        user=dc.config.user,
+        password=dc.config.password,
+        host=dc.config.host,
+        port=dc.config.port,
+        database=dc.config.name,
+    )
+    try:
+        async with conn.transaction():
+            names = ", ".join(f'"{t}"' for t in ORDER)
+            if not reset:
+                # only the admin account from manage.py create-admin may exist
+                counts = [f'(SELECT count(*) FROM "{t}")' for t in ORDER]
+                if await conn.fetchval(f"SELECT {' + '.join(counts)}") > 1:
+                    raise SystemExit("database not empty, pass --reset to replace it")
+            await conn.execute(f"TRUNCATE {names} RESTART IDENTITY CASCADE")
+            for table in ORDER:
+                columns, rows = data.tables[table]
+                start = time.perf_counter()
+                await conn.copy_records_to_table(table, records=rows, columns=columns)
+                took = time.perf_counter() - start
+                print(f"{table:<14} {len(rows):>10,} rows  {took:6.2f} s")
+                if "id" in columns:
+                    await conn.execute(
+                        f"SELECT setval(pg_get_serial_sequence('\"{table}\"', 'id'),"
+                        f' (SELECT coalesce(max(id), 0) + 1 FROM "{table}"), false)'
+                    )
+        await conn.execute("ANALYZE")
+    finally:
+        await conn.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--scale", choices=list(SCALES), default="small")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--reset", action="store_true")
+    args = parser.parse_args()
+    start = time.perf_counter()
+    data = generate(SCALES[args.scale], args.seed)
+    print(f"generated in {time.perf_counter() - start:.2f} s")
+    asyncio.run(load(data, args.reset))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+"""Event-loop latency while logins hash passwords, inline vs. on the hashing pool.
+
+    python -m benchmark.hashing --logins 64
+"""
+import argparse
+import asyncio
+import statistics
+import time
+from passlib.hash import pbkdf2_sha256 as securepwd
+import hashing
+
+
+TICK = 0.001  # interval of the probe that measures how late the loop wakes up
+MODES = ("inline", "pool")  # verify on the event loop / on hashing.pool
+
+
+async def probe(lags: list[float], stop: asyncio.Event) -> None:
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(TICK)
+        lags.append(time.perf_counter() - start - TICK)
+
+
+async def run(logins: int, mode: str) -> list[float]:
+    hashed = securepwd.hash("admin")
+    lags: list[float] = []
+    stop = asyncio.Event()
+    prober = asyncio.create_task(probe(lags, stop))
+    await asyncio.sleep(0)
+
+    async def login() -> None:
+        if mode == "inline":
+            securepwd.verify("admin", hashed)
+        else:
+            await hashing.pool.verify("admin", hashed)
+
+    await asyncio.gather(*(login() for _ in range(logins)))
+    stop.set()
+    await prober
+    return lags
+
+
+def report(name: str, lags: list[float], elapsed: float) -> None:
+    lags = sorted(lags) or [0.0]
+    pct = statistics.quantiles(lags, n=100) if len(lags) > 1 else lags * 99
+    print(
+        f"{name:<8} total {elapsed * 1000:8.1f} ms | loop lag "
+        f"p50 {pct[49] * 1000:7.2f} ms  p99 {pct[98] * 1000:7.2f} ms  "
+        f"max {lags[-1] * 1000:7.2f} ms"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--logins", type=int, default=64)
+    args = parser.parse_args()
+    hashing.pool.queue_limit = args.logins  # measure latency, not shedding
+    for mode in MODES:
+        start = time.perf_counter()
+        lags = asyncio.run(run(args.logins, mode))
+        report(mode, lags, time.perf_counter() - start)
+    hashing.pool.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+"""Convergence check of the write-behind like counter under concurrency.
+
+    python -m benchmark.likes --likes 500 --lost 50
+
+Two simulated workers (an engine and a LikeCounter each) insert likes on one
+scratch course at once while both flush in a tight loop, racing on its row.
+Another --lost likes go to a second course and their counter is dropped, as if
+the worker died before flushing: likes.reconcile (manage.py reconcile-likes)
+must repair it. Exits 1 when a stored `likes` doesn't match the course's likes rows. The
+scratch courses and users are deleted afterwards.
+"""
+import argparse
+import asyncio
+import random
+import secrets
+import time
+from sqlalchemy import delete, func, insert, select
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession
+from commit_hooks import on_commit
+import db_connenction as dc
+import likes as lk
+import models as md
+
+
+WORKERS = 2
+FLUSH_JITTER = 0.005  # seconds, at most, between two flushes of a worker
+
+
+async def scratch(engine: AsyncEngine, users: int) -> tuple[list[int], list[str]]:
+    tag = f"likes-bench-{secrets.token_hex(4)}"
+    names = [f"{tag}-{i}" for i in range(users)]
+    async with engine.begin() as conn:
+        courses = [
+            await conn.scalar(
+                insert(md.Course)
+                .values(name=f"{tag}-{n}", duration=1, type="UG", elig="-")
+                .returning(md.Course.id)
+            )
+            for n in ("raced", "lost")
+        ]
+        await conn.execute(
+            insert(md.User),
+            [{"name": u, "username": u, "email": u, "pwd": "-"} for u in names],
+        )
+    return courses, names
+
+
+async def like(
+    engine: AsyncEngine, counter: lk.LikeCounter, course: int, user: str
+) -> None:
+    async with AsyncSession(engine) as db:
+        async with db.begin():
+            await db.execute(
+                insert(md.CourseLikes).values(user_id=user, course_id=course)
+            )
+            # what likes.stage does, with this worker's counter
+            on_commit(db, counter.add, md.Course, course)
+
+
+async def flusher(
+    engine: AsyncEngine, counter: lk.LikeCounter, done: asyncio.Event
+) -> int:
+    flushes = 0
+    while not done.is_set():
+        await counter.flush(engine)
+        flushes += 1
+        await asyncio.sleep(random.uniform(0, FLUSH_JITTER))
+    await counter.flush(engine)  # the shutdown flush
+    return flushes + 1
+
+
+async def stored(engine: AsyncEngine, course: int) -> tuple[int, int]:
+    async with engine.connect() as conn:
+        likes = await conn.scalar(select(md.Course.likes).where(md.Course.id == course))
+        rows = await conn.scalar(
+            select(func.count()).where(md.CourseLikes.course_id == course)
+        )
+    return likes, rows
+
+
+async def run(likes: int, lost: int) -> bool:
+    engines = [dc.create_engine() for _ in range(WORKERS)]
+    counters = [lk.LikeCounter() for _ in range(WORKERS)]
+    (raced, dropped), users = await scratch(engines[0], max(likes, lost))
+    try:
+        done = asyncio.Event()
+        flushers = [
+            asyncio.create_task(flusher(e, c, done)) for e, c in zip(engines, counters)
+        ]
+        # at most pool_size requests per worker, as the pool would queue them
+        gates = [asyncio.Semaphore(dc.config.pool_size) for _ in range(WORKERS)]
+
+        async def worker_like(i: int) -> None:
+            w = i % WORKERS
+            async with gates[w]:
+                await like(engines[w], counters[w], raced, users[i])
+
+        start = time.perf_counter()
+        await asyncio.gather(*(worker_like(i) for i in range(likes)))
+        done.set()
+        flushes = sum(await asyncio.gather(*flushers))
+        took = time.perf_counter() - start
+        # committed, but the worker "dies" before its counter is flushed
+        for user in users[:lost]:
+            await like(engines[0], lk.LikeCounter(), dropped, user)
+
+        ok = True
+        count, rows = await stored(engines[0], raced)
+        print(
+            f"raced  {likes} likes, {flushes} flushes in {took:.2f} s: likes={count} rows={rows}"
+        )
+        ok &= count == rows == likes
+        count, rows = await stored(engines[0], dropped)
+        print(f"lost   before reconcile: likes={count} rows={rows}")
+        async with engines[0].begin() as conn:
+            await lk.reconcile(conn)
+        count, rows = await stored(engines[0], dropped)
+        print(f"lost   after reconcile:  likes={count} rows={rows}")
+        ok &= count == rows == lost
+        return ok
+    finally:
+        async with engines[0].begin() as conn:
+            await conn.execute(
+                delete(md.Course).where(md.Course.id.in_([raced, dropped]))
+            )
+            await conn.execute(delete(md.User).where(md.User.username.in_(users)))
+        for engine in engines:
+            await engine.dispose()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--likes", type=int, default=500)
+    parser.add_argument("--lost", type=int, default=50)
+    args = parser.parse_args()
+    if not asyncio.run(run(args.likes, args.lost)):
+        print("⚠️ LIKE COUNTS DIDN'T CONVERGE")
+        raise SystemExit(1)
+    print("✅ LIKE COUNTS CONVERGED !!")
+
+
+if __name__ == "__main__":
+    main()
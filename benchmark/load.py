@@ -0,0 +1,431 @@
+"""HTTP load driver: virtual users hit every route of a running API with a weighted mix.
+
+    python -m benchmark.datagen --scale small --reset    # then (re)start the API
+    python -m benchmark.load --scale small --users 50 --duration 60 --out run.json
+    python -m benchmark.report run.json --baseline last-release.json
+
+Each virtual user logs in as one of the generated accounts (its own cookie jar),
+then loops: pick a scenario by weight, run it, record route, status and latency.
+Reads dominate the mix like on the live site, writes touch likes, lists and
+posts, and a small admin share creates, updates, exports and deletes its own rows.
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+import uuid
+from collections import Counter, defaultdict
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Optional
+import httpx
+from benchmark import datagen
+from benchmark.report import render
+
+
+ENTITIES = ("course", "college", "exam")
+LOGIN_RETRIES = 20
+
+
+# // RECORDING
+@dataclass
+class Recorder:
+    latencies: dict[str, list[float]] = field(default_factory=lambda: defaultdict(list))
+    statuses: dict[str, Counter] = field(default_factory=lambda: defaultdict(Counter))
+
+    def add(self, route: str, status: int, seconds: float) -> None:
+        self.latencies[route].append(seconds)
+        self.statuses[route][status] += 1
+
+    def dump(self, meta: dict[str, Any]) -> dict[str, Any]:
+        routes = {
+            route: {
+                "latencies": self.latencies[route],
+                "statuses": self.statuses[route],
+            }
+            for route in self.latencies
+        }
+        return {"meta": meta, "routes": routes}
+
+
+@dataclass
+class VirtualUser:
+    client: httpx.AsyncClient
+    rng: random.Random
+    scale: datagen.Scale
+    recorder: Recorder
+    username: str
+
+    async def call(
+        self, method: str, path: str, route: str, **kwargs: Any
+    ) -> Optional[httpx.Response]:
+        start = time.perf_counter()
+        try:
+            response = await self.client.request(method, path, **kwargs)
+        except httpx.HTTPError:
+            self.recorder.add(route, 0, time.perf_counter() - start)
+            return None
+        self.recorder.add(route, response.status_code, time.perf_counter() - start)
+        return response
+
+    def id(self, name: str) -> int:
+        return self.rng.randint(1, getattr(self.scale, f"{name}s"))
+
+    def entity(self) -> tuple[str, int]:
+        name = self.rng.choice(ENTITIES)
+        return name, self.id(name)
+
+    def word(self) -> str:
+        return self.rng.choice(datagen.WORDS + datagen.SUBJECTS)
+
+
+Scenario = Callable[[VirtualUser], Awaitable[Any]]
+
+
+# // SCENARIOS
+async def browse(vu: VirtualUser) -> None:
+    name, _ = vu.entity()
+    sort = vu.rng.choice(["id", "-id", "name"])
+    await vu.call(
+        "GET", f"/{name}/", f"GET /{name}/", params={"limit": 20, "sort": sort}
+    )
+
+
+async def text_search(vu: VirtualUser) -> None:
+    name, _ = vu.entity()
+    await vu.call(
+        "GET", f"/{name}/search", f"GET /{name}/search", params={"q": vu.word()}
+    )
+
+
+async def posts(vu: VirtualUser) -> None:
+    name, entity_id = vu.entity()
+    await vu.call("GET", f"/{name}/post/{entity_id}", f"GET /{name}/post/{{id}}")
+
+
+async def thread(vu: VirtualUser) -> None:
+    name, entity_id = vu.entity()
+    route = f"GET /{name}/post/{{id}}/thread"
+    await vu.call("GET", f"/{name}/post/{entity_id}/thread", route)
+
+
+async def lists(vu: VirtualUser) -> None:
+    name, _ = vu.entity()
+    if vu.rng.random() < 0.2:
+        await vu.call("GET", f"/{name}/list/all", f"GET /{name}/list/all")
+    else:
+        await vu.call("GET", f"/{name}/list", f"GET /{name}/list")
+
+
+async def ranking(vu: VirtualUser) -> None:
+    name, _ = vu.entity()
+    route = f"GET /{name}/likes/ranking"
+    await vu.call("GET", f"/{name}/likes/ranking", route, params={"limit": 10})
+
+
+async def academics(vu: VirtualUser) -> None:
+    params = {"limit": 50, "sort": vu.rng.choice(["id", "course_fee", "-cutoff_rank"])}
+    await vu.call("GET", "/academics/", "GET /academics/", params=params)
+
+
+async def academics_search(vu: VirtualUser) -> None:
+    params: dict[str, Any] = {"exam_id": vu.rng.randint(1, vu.scale.exams)}
+    if vu.rng.random() < 0.5:
+        params["fee_max"] = vu.rng.randrange(100_000, 2_000_000, 100_000)
+    if vu.rng.random() < 0.3:
+        params["state"] = vu.rng.choice(datagen.STATES)[0]
+    params["facets"] = vu.rng.random() < 0.5
+    await vu.call("GET", "/academics/search", "GET /academics/search", params=params)
+
+
+async def predict(vu: VirtualUser) -> None:
+    params = {
+        "exam_id": vu.rng.randint(1, vu.scale.exams),
+        "rank": vu.rng.randint(1, 200_000),
+    }
+    await vu.call("GET", "/academics/predict", "GET /academics/predict", params=params)
+
+
+async def predict_batch(vu: VirtualUser) -> None:
+    body = [
+        {
+            "exam_id": vu.rng.randint(1, vu.scale.exams),
+            "rank": vu.rng.randint(1, 200_000),
+        }
+        for _ in range(20)
+    ]
+    route = "POST /academics/predict/batch"
+    await vu.call("POST", "/academics/predict/batch", route, json=body)
+
+
+async def relations(vu: VirtualUser) -> None:
+    path, key, size = vu.rng.choice(
+        [
+            ("colleges-from-course", "course_id", vu.scale.courses),
+            ("academics-from-exam", "exam_id", vu.scale.exams),
+            ("fees-from-course", "course_id", vu.scale.courses),
+        ]
+    )
+    params = {key: vu.rng.randint(1, size)}
+    await vu.call("GET", f"/academics/{path}", f"GET /academics/{path}", params=params)
+
+
+async def like(vu: VirtualUser) -> None:
+    name, entity_id = vu.entity()
+    if vu.rng.random() < 0.2:
+        ids = [vu.id(name) for _ in range(5)]
+        await vu.call(
+            "POST", f"/{name}/likes/batch", f"POST /{name}/likes/batch", json=ids
+        )
+    else:
+        params = {f"{name}_id": entity_id}
+        await vu.call("POST", f"/{name}/likes", f"POST /{name}/likes", params=params)
+
+
+async def list_entry(vu: VirtualUser) -> None:
+    name, entity_id = vu.entity()
+    view = vu.rng.choice(["Public", "Private"])
+    roll = vu.rng.random()
+    if roll < 0.45:
+        body = {"course_id": entity_id, "view": view}
+        await vu.call("POST", f"/{name}/list/add", f"POST /{name}/list/add", json=body)
+    elif roll < 0.55:
+        body = {"ids": [entity_id, max(1, entity_id - 1)], "view": view}
+        route = f"POST /{name}/list/add/batch"
+        await vu.call("POST", f"/{name}/list/add/batch", route, json=body)
+    else:
+        route = f"DELETE /{name}/list/{{id}}/delete"
+        await vu.call("DELETE", f"/{name}/list/{entity_id}/delete", route)
+
+
+async def comment(vu: VirtualUser) -> None:
+    # post, sometimes reply to it, then delete the post (replies cascade)
+    name, entity_id = vu.entity()
+    title = f"bench {uuid.uuid4().hex[:12]}"
+    body = {"title": title, "body": " ".join(vu.word() for _ in range(12))}
+    route = f"POST /{name}/post/{{id}}/add"
+    await vu.call("POST", f"/{name}/post/{entity_id}/add", route, json=body)
+    res = await vu.call("GET", f"/{name}/post/{entity_id}", f"GET /{name}/post/{{id}}")
+    mine = [p["id"] for p in (res.json() if res else []) if p["title"] == title]
+    if not mine:
+        return
+    if vu.rng.random() < 0.5:
+        route = f"POST /{name}/post/{{id}}/{{post_id}}/add"
+        await vu.call(
+            "POST", f"/{name}/post/{entity_id}/{mine[0]}/add", route, json=body
+        )
+    route = f"DELETE /{name}/post/{{post_id}}/delete"
+    await vu.call("DELETE", f"/{name}/post/{mine[0]}/delete", route)
+
+
+async def session(vu: VirtualUser) -> None:
+    # sign up then remove the account (admin only), the cost is password hashing
+    username = f"bench{uuid.uuid4().hex[:12]}"
+    body = {
+        "name": "bench",
+        "username": username,
+        "email": f"{username}@bench.local",
+        "pwd": datagen.PASSWORD,
+        "cpwd": datagen.PASSWORD,
+    }
+    await vu.call("POST", "/user/register", "POST /user/register", json=body)
+    route = "DELETE /user/delete/{user}"
+    await vu.call("DELETE", f"/user/delete/{username}", route)
+
+
+WEIGHTS: dict[Scenario, int] = {
+    browse: 12,
+    text_search: 8,
+    posts: 6,
+    thread: 8,
+    lists: 4,
+    ranking: 5,
+    academics: 3,
+    academics_search: 8,
+    predict: 8,
+    predict_batch: 1,
+    relations: 9,
+    like: 5,
+    list_entry: 4,
+    comment: 2,
+}
+
+
+# ------> ADMIN
+async def admin_crud(vu: VirtualUser) -> None:
+    tag = uuid.uuid4().hex[:12]
+    name = vu.rng.choice(ENTITIES)
+    body: dict[str, Any] = {
+        "course": {"name": f"bench {tag}", "duration": 3, "type": "UG", "elig": "-"},
+        "college": {
+            "name": f"bench {tag}",
+            "rank": vu.rng.randint(10**8, 2 * 10**9),
+            "email": "-",
+            "city": "-",
+            "state": "-",
+            "country": "-",
+            "address": "-",
+        },
+        "exam": {"name": f"bench {tag}", "elig": "-", "syllabus": "-", "fee": 1.0},
+    }[name]
+    await vu.call("POST", f"/{name}/add", f"POST /{name}/add", json=body)
+    res = await vu.call(
+        "GET", f"/{name}/search", f"GET /{name}/search", params={"q": tag}
+    )
+    found = [e["id"] for e in (res.json() if res else []) if tag in e["name"]]
+    if not found:
+        return
+    update = {"name": f"bench {tag} renamed"}
+    await vu.call(
+        "PATCH",
+        f"/{name}/update/{found[0]}",
+        f"PATCH /{name}/update/{{id}}",
+        json=update,
+    )
+    await vu.call(
+        "DELETE", f"/{name}/delete/{found[0]}", f"DELETE /{name}/delete/{{id}}"
+    )
+
+
+async def admin_academics(vu: VirtualUser) -> None:
+    body = {
+        "course_id": vu.rng.randint(1, vu.scale.courses),
+        "college_id": vu.rng.randint(1, vu.scale.colleges),
+        "exam_id": vu.rng.randint(1, vu.scale.exams),
+        "course_fee": 1.0,
+        "cutoff_rank": vu.rng.randint(1, 200_000),
+    }
+    res = await vu.call("POST", "/academics/add", "POST /academics/add", json=body)
+    if res is None or res.status_code != 201:
+        return
+    params = {"limit": 1, "sort": "-id"}
+    res = await vu.call("GET", "/academics/", "GET /academics/", params=params)
+    if res is not None and res.json():
+        academics_id = res.json()[0]["id"]
+        route = "DELETE /academics/delete/{id}"
+        await vu.call("DELETE", f"/academics/delete/{academics_id}", route)
+
+
+async def admin_bulk(vu: VirtualUser) -> None:
+    tag = uuid.uuid4().hex[:12]
+    rows = "".join(f"bench {tag} {i},2,PG,-\n" for i in range(50))
+    body = f"name,duration,type,elig\n{rows}".encode()
+    headers = {"Content-Type": "text/csv"}
+    await vu.call(
+        "POST", "/course/bulk", "POST /course/bulk", content=body, headers=headers
+    )
+    res = await vu.call(
+        "GET", "/course/search", "GET /course/search", params={"q": tag}
+    )
+    for course in res.json() if res else []:
+        if tag in course["name"]:
+            route = "DELETE /course/delete/{id}"
+            await vu.call("DELETE", f"/course/delete/{course['id']}", route)
+
+
+async def admin_read(vu: VirtualUser) -> None:
+    roll = vu.rng.random()
+    if roll < 0.3:
+        await vu.call("GET", "/user/", "GET /user/")
+    elif roll < 0.5:
+        await vu.call("GET", "/academics/graph/stats", "GET /academics/graph/stats")
+    elif roll < 0.8:
+        params = {"exam_id": vu.rng.randint(1, vu.scale.exams), "format": "ndjson"}
+        route = "GET /export/academics-from-exam"
+        await vu.call("GET", "/export/academics-from-exam", route, params=params)
+    else:
+        table = vu.rng.choice(["Course", "College", "Exam"])
+        params = {"compress": "gzip"}
+        await vu.call("GET", f"/export/{table}", "GET /export/{table}", params=params)
+
+
+ADMIN_WEIGHTS: dict[Scenario, int] = {
+    admin_crud: 4,
+    admin_academics: 3,
+    admin_bulk: 1,
+    admin_read: 4,
+    session: 1,
+}
+
+
+# // DRIVER
+async def login(vu: VirtualUser, password: str) -> None:
+    body = {"emailname": vu.username, "pwd": password, "cpwd": password}
+    for _ in range(LOGIN_RETRIES):
+        res = await vu.call("POST", "/user/login", "POST /user/login", json=body)
+        if res is not None and res.status_code == 201:
+            return
+        retry = res.headers.get("Retry-After", "1") if res is not None else "1"
+        await asyncio.sleep(float(retry) * vu.rng.random())  # the hash pool shed us
+    raise SystemExit(f"could not log in as {vu.username}")
+
+
+async def virtual_user(
+    vu: VirtualUser, weights: dict[Scenario, int], deadline: float
+) -> None:
+    scenarios = list(weights)
+    while time.perf_counter() < deadline:
+        (scenario,) = vu.rng.choices(scenarios, list(weights.values()))
+        await scenario(vu)
+
+
+async def run(args: argparse.Namespace) -> dict[str, Any]:
+    scale, recorder = datagen.SCALES[args.scale], Recorder()
+    limits = httpx.Limits(max_connections=1, max_keepalive_connections=1)
+    users = []
+    for i in range(args.users + args.admins):
+        admin = i >= args.users
+        username = "admin" if admin else f"user{i % scale.users + 1}"
+        client = httpx.AsyncClient(
+            base_url=args.url, timeout=args.timeout, limits=limits
+        )
+        rng = random.Random(args.seed + i)
+        vu = VirtualUser(client, rng, scale, Recorder(), username)
+        users.append((vu, ADMIN_WEIGHTS if admin else WEIGHTS))
+    try:
+        await asyncio.gather(
+            *(
+                login(vu, "admin" if w is ADMIN_WEIGHTS else datagen.PASSWORD)
+                for vu, w in users
+            )
+        )
+        for vu, _ in users:  # logins are warm-up, not measured
+            vu.recorder = recorder
+        start = time.perf_counter()
+        deadline = start + args.duration
+        await asyncio.gather(*(virtual_user(vu, w, deadline) for vu, w in users))
+        elapsed = time.perf_counter() - start
+    finally:
+        await asyncio.gather(*(vu.client.aclose() for vu, _ in users))
+    meta = {
+        "url": args.url,
+        "scale": args.scale,
+        "users": args.users,
+        "admins": args.admins,
+        "seed": args.seed,
+        "elapsed": elapsed,
+        "started": time.time() - elapsed,
+    }
+    return recorder.dump(meta)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--url", default="http://localhost:8080")
+    parser.add_argument("--scale", choices=list(datagen.SCALES), default="small")
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--admins", type=int, default=1)
+    parser.add_argument("--duration", type=float, default=60.0)
+    parser.add_argument("--timeout", type=float, default=30.0)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--out", help="write the raw run (JSON) for benchmark.report")
+    args = parser.parse_args()
+    result = asyncio.run(run(args))
+    print(render(result))
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(result, f)
+
+
+if __name__ == "__main__":
+    main()
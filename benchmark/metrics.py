@@ -0,0 +1,64 @@
+"""Per-request cost of the metrics middleware, against the same app without it.
+
+    python -m benchmark.metrics --requests 200000
+    python -m benchmark.metrics --access-log  # ACCESS_LOG=1, one line per request
+
+Runs the app's default configuration: the logging pipeline started, writing
+to /dev/null, and the access log as ACCESS_LOG sets it (off unless =1).
+"""
+import argparse
+import asyncio
+import os
+import time
+from typing import Any
+import logs
+import metrics as mt
+
+
+class Handler:
+    ...
+
+
+async def app(scope: Any, receive: Any, send: Any) -> None:
+    await send({"type": "http.response.start", "status": 200})
+    await send({"type": "http.response.body", "body": b""})
+
+
+async def send(_: Any) -> None:
+    ...
+
+
+async def per_request(asgi: Any, scope: dict[str, Any], requests: int) -> float:
+    start = time.perf_counter()
+    for _ in range(requests):
+        await asgi(scope, None, send)
+    return (time.perf_counter() - start) / requests
+
+
+async def run(requests: int, access_log: bool) -> None:
+    handler = Handler()
+    mt.metrics.paths[id(handler)] = "/bench"
+    scope = {"type": "http", "method": "GET", "route_handler": handler, "headers": []}
+    bare = await per_request(app, scope, requests)
+    logs.ACCESS_LOG = logs.ACCESS_LOG or access_log
+    logs.pipeline.start(open(os.devnull, "w"))
+    try:
+        measured = await per_request(mt.middleware(app), scope, requests)
+    finally:
+        logs.pipeline.stop()
+    print(f"access log {'on' if logs.ACCESS_LOG else 'off'}")
+    print(f"bare      {bare * 1e6:6.2f} us/request")
+    print(f"measured  {measured * 1e6:6.2f} us/request")
+    print(f"overhead  {(measured - bare) * 1e6:6.2f} us/request")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=200_000)
+    parser.add_argument("--access-log", action="store_true")
+    args = parser.parse_args()
+    asyncio.run(run(args.requests, args.access_log))
+
+
+if __name__ == "__main__":
+    main()
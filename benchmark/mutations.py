@@ -0,0 +1,127 @@
+"""Round trips and latency per mutation, load-then-write vs. one RETURNING statement.
+
+    python -m benchmark.mutations --rounds 300
+
+Every round writes a scratch course inside a transaction that is rolled back, so
+the database is left as it was.
+"""
+import argparse
+import asyncio
+import statistics
+import time
+from typing import Any, Awaitable, Callable
+from sqlalchemy import delete, event, insert, select
+from sqlalchemy.ext.asyncio import AsyncSession
+import db_connenction as dc
+import models as md
+
+
+USER = "admin"
+
+Op = Callable[[AsyncSession, int], Awaitable[Any]]
+
+
+# ------> BEFORE (what the handlers used to do)
+async def delete_loaded(db: AsyncSession, course_id: int) -> None:
+    res = await db.scalar(select(md.Course).where(md.Course.id == course_id))
+    assert res is not None
+    await db.delete(res)
+    await db.flush()
+
+
+async def like_checked(db: AsyncSession, course_id: int) -> None:
+    await db.get_one(md.Course, course_id)
+    await db.execute(insert(md.CourseLikes).values(user_id=USER, course_id=course_id))
+
+
+async def unlist_loaded(db: AsyncSession, course_id: int) -> None:
+    await db.get_one(md.Course, course_id)
+    stmt = select(md.CourseList).where(
+        (md.CourseList.course_id == course_id) & (md.CourseList.user_id == USER)
+    )
+    res = await db.scalar(stmt)
+    assert res is not None
+    await db.delete(res)
+    await db.flush()
+
+
+# ------> AFTER
+async def delete_returning(db: AsyncSession, course_id: int) -> None:
+    stmt = delete(md.Course).where(md.Course.id == course_id).returning(md.Course.id)
+    assert await db.scalar(stmt) is not None
+
+
+async def like_insert(db: AsyncSession, course_id: int) -> None:
+    await db.execute(insert(md.CourseLikes).values(user_id=USER, course_id=course_id))
+
+
+async def unlist_returning(db: AsyncSession, course_id: int) -> None:
+    stmt = (
+        delete(md.CourseList)
+        .where((md.CourseList.course_id == course_id) & (md.CourseList.user_id == USER))
+        .returning(md.CourseList.course_id)
+    )
+    assert await db.scalar(stmt) is not None
+
+
+CASES: dict[str, tuple[Op, Op]] = {
+    "delete": (delete_loaded, delete_returning),
+    "like": (like_checked, like_insert),
+    "unlist": (unlist_loaded, unlist_returning),
+}
+
+
+async def setup(db: AsyncSession, case: str) -> int:
+    stmt = insert(md.Course).values(
+        name=f"bench-{time.perf_counter_ns()}", duration=1, type="UG", elig="-"
+    )
+    course_id = await db.scalar(stmt.returning(md.Course.id))
+    if case == "unlist":
+        await db.execute(
+            insert(md.CourseList).values(
+                user_id=USER, course_id=course_id, view="Public"
+            )
+        )
+    return course_id  # type: ignore
+
+
+async def run(case: str, rounds: int) -> None:
+    engine = dc.create_engine()
+    statements = 0
+
+    @event.listens_for(engine.sync_engine, "before_cursor_execute")
+    def count(*_: Any) -> None:
+        nonlocal statements
+        statements += 1
+
+    for name, op in zip(("before", "after"), CASES[case]):
+        timings, trips = [], []
+        for _ in range(rounds):
+            async with AsyncSession(engine) as db:
+                async with db.begin():
+                    course_id = await setup(db, case)
+                    statements = 0
+                    start = time.perf_counter()
+                    await op(db, course_id)
+                    timings.append(time.perf_counter() - start)
+                    trips.append(statements)
+                    await db.rollback()
+        pct = statistics.quantiles(timings, n=100)
+        print(
+            f"{case:<7}{name:<7} {statistics.mean(trips):4.1f} round trips | "
+            f"p50 {pct[49] * 1000:6.3f} ms  p99 {pct[98] * 1000:6.3f} ms"
+        )
+    await engine.dispose()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rounds", type=int, default=300)
+    parser.add_argument("--case", choices=list(CASES), action="append")
+    args = parser.parse_args()
+    for case in args.case or CASES:
+        asyncio.run(run(case, args.rounds))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,308 @@
+"""EXPLAIN (ANALYZE, BUFFERS) of the SQL every handler issues, checked for plan shape.
+
+    python -m benchmark.datagen --scale small --reset
+    python -m benchmark.plans
+
+Exits 1 when a table holding more than --min-rows rows is read by a Seq Scan, when
+a statement does not use the index it is expected to or when it touches more
+shared buffers than its budget. Every statement runs in a transaction that is
+rolled back, writes included.
+"""
+import argparse
+import asyncio
+import json
+from dataclasses import dataclass, field
+from typing import Any, Iterator
+from sqlalchemy import Executable, literal, select, delete as sqdl
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncEngine
+import db_connenction as dc
+import entities as en
+import migrations as mg
+import models as md
+import pagination as pg
+import search as sr
+import threads as th
+from main import COLLEGE, COURSE, EXAM, academics_from_exam
+
+
+BUFFERS = 200  # default budget, shared blocks hit + read
+CASCADE_BUFFERS = 2000  # one parent's children, e.g. all academics of an exam
+USER = "user1"  # has posts, lists and likes in the generated dataset
+NEW_USER = "admin"  # has none, so inserts do not collide
+WORD = "physics"
+
+
+# // CASES
+@dataclass(frozen=True)
+class Case:
+    name: str
+    stmt: Executable
+    params: dict[str, Any] = field(default_factory=dict)
+    indexes: tuple[str, ...] = ()  # every one must appear in the plan
+    buffers: int = BUFFERS
+
+
+def page(sort: str = "id", limit: int = pg.DEFAULT_PAGE_SIZE) -> pg.PageParams:
+    return pg.PageParams(limit=limit, sort=sort, after_id=None, cursor=None)
+
+
+def user_cases() -> Iterator[Case]:
+    who = (md.User.email == USER) | (md.User.username == USER)
+    yield Case("user login", select(md.User).where(who), indexes=("User_pkey",))
+    yield Case(
+        "user delete",
+        sqdl(md.User).where(who).returning(md.User.username),
+        indexes=("User_pkey",),
+    )
+
+
+def entity_cases(entity: en.Entity) -> Iterator[Case]:
+    sql, model, name = en.statements(entity), entity.model, entity.name
+    ids = {"entity_id": 1}
+    yield Case(f"{name} page", pg.keyset(select(model), model, page()))
+    for key in pg.SORT_KEYS[model]:
+        if key not in ("id", "name"):
+            yield Case(
+                f"{name} page by {key}",
+                pg.keyset(select(model), model, page(f"-{key}")),
+                indexes=(f"ix_{name}_{key}",),
+            )
+    yield Case(
+        f"{name} ranking",
+        select(model).order_by(model.likes.desc(), model.id).limit(100),  # type: ignore
+        indexes=(f"ix_{name}_ranking",),
+    )
+    yield Case(f"{name} delete", sql.delete, ids, buffers=1000)
+    yield Case(
+        f"{name} posts",
+        sql.posts,
+        ids,
+        indexes=(f"ix_{name}Post_thread",),
+        buffers=400,
+    )
+    yield Case(
+        f"{name} thread",
+        th._thread(
+            entity.post,
+            1,
+            None,
+            None,
+            th.DEFAULT_TOP_LEVEL,
+            th.DEFAULT_DEPTH,
+            th.DEFAULT_REPLIES,
+        ),
+        indexes=(f"ix_{name}Post_thread",),
+        buffers=1000,
+    )
+    yield Case(
+        f"{name} post add",
+        sql.post_insert.values(
+            {"title": WORD, "body": WORD, "user_id": USER, entity.key: 1}
+        ),
+    )
+    yield Case(f"{name} post delete", sql.post_delete, {"post_id": 1})
+    yield Case(
+        f"{name} lists public",
+        sql.lists_public,
+        indexes=(f"ix_{name}List_public",),
+        buffers=400,
+    )
+    yield Case(
+        f"{name} lists user",
+        sql.lists_user,
+        {"user_id": USER},
+        indexes=(f"ix_{name}List_user",),
+    )
+    yield Case(
+        f"{name} list add",
+        sql.list_insert.values({"user_id": NEW_USER, entity.key: 1, "view": "Public"}),
+    )
+    yield Case(f"{name} list delete", sql.list_delete, {**ids, "user_id": USER})
+    yield Case(
+        f"{name} like",
+        sql.like_insert.values({"user_id": NEW_USER, entity.key: 1}),
+    )
+    yield Case(
+        f"{name} search",
+        sql.search,
+        {"q": WORD, "limit": pg.DEFAULT_PAGE_SIZE, "offset": 0},
+        indexes=(f"ix_{name}_search", f"ix_{name}_name_trgm"),
+        buffers=400,
+    )
+
+
+def academics_cases() -> Iterator[Case]:
+    a = md.Academics
+    params = sr.SearchParams(
+        fee_min=None,
+        fee_max=500_000,
+        rank_min=None,
+        rank_max=None,
+        exam_id=[1],
+        course_type=None,
+        state=None,
+        city=None,
+        country=None,
+        facets=True,
+    )
+    yield Case("Academics page", pg.keyset(select(a), a, page()))
+    yield Case(
+        "Academics page by fee",
+        pg.keyset(select(a), a, page("course_fee")),
+        indexes=("ix_Academics_fee",),
+    )
+    yield Case(
+        "Academics search",
+        pg.keyset(sr.results(params), a, page("course_fee")),
+        indexes=("ix_Academics_exam_fee",),
+        buffers=1000,
+    )
+    yield Case(
+        "Academics facets",
+        sr.facets(params),
+        indexes=("ix_Academics_exam_fee",),
+        buffers=2000,
+    )
+    yield Case(
+        "Academics delete", sqdl(a).where(a.id == 1).returning(a.id), buffers=1000
+    )
+    yield Case("export academics from exam", academics_from_exam(1), buffers=2000)
+
+
+def foreign_key_cases() -> Iterator[Case]:
+    # what postgres runs per deleted or re-keyed parent row to cascade (ON DELETE
+    # / ON UPDATE CASCADE): without an index on the child column every parent
+    # row costs a scan of the child table
+    for table in md.Base.metadata.sorted_tables:
+        for fk in table.foreign_keys:
+            value = USER if fk.column.table is md.User.__table__ else 1
+            # a self reference (post -> reply) has a few children per parent
+            own = fk.column.table is table
+            yield Case(
+                f"cascade {fk.column.table.name} -> {table.name}.{fk.parent.name}",
+                select(literal(1)).where(fk.parent == value),
+                buffers=BUFFERS if own else CASCADE_BUFFERS,
+            )
+
+
+def cases() -> list[Case]:
+    found = list(user_cases())
+    for entity in (COURSE, COLLEGE, EXAM):
+        found += entity_cases(entity)
+    found += academics_cases()
+    found += foreign_key_cases()
+    return found
+
+
+# // PLAN
+def nodes(plan: dict[str, Any]) -> Iterator[dict[str, Any]]:
+    yield plan
+    for child in plan.get("Plans", []):
+        yield from nodes(child)
+
+
+async def explain(conn: AsyncConnection, case: Case) -> dict[str, Any]:
+    # bound like the handlers bind them, so the planner sees the same statement
+    compiled = case.stmt.compile(
+        dialect=conn.dialect, compile_kwargs={"render_postcompile": True}
+    )
+    values = compiled.construct_params(case.params)
+    args = tuple(values[name] for name in compiled.positiontup or ())
+    trans = await conn.begin()
+    try:
+        res = await conn.exec_driver_sql(
+            f"EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) {compiled}", args
+        )
+        raw = res.scalar_one()
+    finally:
+        await trans.rollback()
+    return (json.loads(raw) if isinstance(raw, str) else raw)[0]["Plan"]
+
+
+def buffers(plan: dict[str, Any]) -> int:
+    return plan.get("Shared Hit Blocks", 0) + plan.get("Shared Read Blocks", 0)
+
+
+@dataclass(frozen=True)
+class Schema:
+    rows: dict[str, float]  # tables above --min-rows
+    indexes: dict[str, str]  # index -> table
+
+
+async def schema(conn: AsyncConnection, min_rows: int) -> Schema:
+    res = await conn.exec_driver_sql(
+        "SELECT relname, reltuples FROM pg_class"
+        " WHERE relkind = 'r' AND relnamespace = 'public'::regnamespace"
+    )
+    rows = {name: n for name, n in res.all() if n > min_rows}
+    res = await conn.exec_driver_sql(
+        "SELECT i.relname, t.relname FROM pg_index x"
+        " JOIN pg_class i ON i.oid = x.indexrelid"
+        " JOIN pg_class t ON t.oid = x.indrelid"
+        " WHERE t.relnamespace = 'public'::regnamespace"
+    )
+    indexes = dict(res.all())
+    await conn.commit()
+    return Schema(rows, indexes)
+
+
+def check(case: Case, plan: dict[str, Any], db: Schema) -> list[str]:
+    problems = []
+    used = set()
+    for node in nodes(plan):
+        relation = node.get("Relation Name")
+        if node["Node Type"] == "Seq Scan" and relation in db.rows:
+            problems.append(f"Seq Scan on {relation} ({db.rows[relation]:,.0f} rows)")
+        if "Index Name" in node:
+            used.add(node["Index Name"])
+    for index in case.indexes:
+        if index not in db.indexes:
+            problems.append(f"{index} missing, run {mg.MIGRATE_COMMAND}")
+        # reading a small table whole is the planner's right call
+        elif index not in used and db.indexes[index] in db.rows:
+            problems.append(f"{index} not used")
+    if buffers(plan) > case.buffers:
+        problems.append(f"{buffers(plan)} buffers, budget {case.buffers}")
+    return problems
+
+
+async def run(engine: AsyncEngine, min_rows: int, verbose: bool) -> int:
+    failed = 0
+    async with engine.connect() as conn:
+        db = await schema(conn, min_rows)
+        for case in cases():
+            plan = await explain(conn, case)
+            problems = check(case, plan, db)
+            failed += bool(problems)
+            print(
+                f"{'FAIL' if problems else 'ok':<5}{case.name:<52}"
+                f"{buffers(plan):>7} buf{plan['Actual Total Time']:>10.2f} ms  "
+                + "; ".join(problems)
+            )
+            if verbose:
+                for node in nodes(plan):
+                    target = node.get("Index Name") or node.get("Relation Name", "")
+                    print(f"       {node['Node Type']} {target}")
+    return failed
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--min-rows", type=int, default=1000)
+    parser.add_argument("--verbose", action="store_true")
+    args = parser.parse_args()
+    engine = dc.create_engine()
+
+    async def checked() -> int:
+        try:
+            return await run(engine, args.min_rows, args.verbose)
+        finally:
+            await engine.dispose()
+
+    failed = asyncio.run(checked())
+    print(f"\n{failed} failing statement(s)" if failed else "\nall plans ok")
+    raise SystemExit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,448 @@
+"""Transaction pooling stand-in for PgBouncer (pool_mode=transaction): the whole API through it.
+
+    python -m benchmark.pooler --workers 4 --users 50 --duration 30
+    python -m benchmark.pooler --serve --port 6432      # only the pooler, until Ctrl-C
+
+Starts the pooler, then the API with --workers processes and DB_PGBOUNCER=1 pointed
+at it (LISTEN goes around it, straight to postgres), runs benchmark.load against
+the API and prints how many client connections the server connections served.
+
+Like PgBouncer a server connection belongs to a client for one transaction only:
+it goes back to the pool at the ReadyForQuery that ends it, and the next one is
+the least recently used, so a client's transactions hop between server
+connections. Startup parameters PgBouncer does not know are refused. Exits 1
+when anything relied on a session: a prepared statement missing or already
+taken on the server connection, a LISTEN through the pooler or a refused
+startup parameter.
+"""
+import argparse
+import asyncio
+import base64
+import hashlib
+import hmac
+import os
+import secrets
+import sys
+from collections import Counter, deque
+from dataclasses import dataclass, field
+from typing import Callable, Optional
+import httpx
+import db_connenction as dc
+from benchmark import load
+
+
+PROTOCOL = 196608  # 3.0
+SSL_REQUEST = 80877103
+CANCEL_REQUEST = 80877102
+MIN_SERVERS = 2  # per database, so consecutive transactions land on different ones
+# what PgBouncer takes from a client's startup packet, anything else is an error
+STARTUP_PARAMETERS = {
+    "user",
+    "database",
+    "application_name",
+    "client_encoding",
+    "datestyle",
+    "timezone",
+    "standard_conforming_strings",
+}
+# postgres errors that only show up when a session is shared between clients
+POOLING_ERRORS = {
+    "26000": "prepared statement missing on the server connection",
+    "42P05": "prepared statement already exists on the server connection",
+}
+
+
+# // STATS
+@dataclass
+class Stats:
+    clients: int = 0
+    connected: int = 0
+    peak: int = 0
+    transactions: int = 0
+    waits: int = 0  # a client found every server connection busy
+    listens: int = 0
+    refused: Counter[str] = field(default_factory=Counter)
+    errors: Counter[str] = field(default_factory=Counter)  # SQLSTATE -> count
+    messages: dict[str, str] = field(default_factory=dict)  # first one per SQLSTATE
+
+    def failed(self) -> bool:
+        pooling = any(code in POOLING_ERRORS for code in self.errors)
+        return pooling or bool(self.listens or self.refused)
+
+    def render(self, servers: int) -> str:
+        lines = [
+            f"client connections  {self.clients:>8,}  (peak {self.peak} at once)",
+            f"server connections  {servers:>8,}",
+            f"transactions        {self.transactions:>8,}  "
+            f"(a client waited for a server {self.waits:,} times)",
+        ]
+        if self.listens:
+            lines.append(f"LISTEN through the pooler: {self.listens}")
+        for name, n in self.refused.most_common():
+            lines.append(f"refused startup parameter {name} x {n}")
+        for code, n in self.errors.most_common():
+            note = POOLING_ERRORS.get(code, "")
+            lines.append(f"postgres error {code} x {n}  {note or self.messages[code]}")
+        return "\n".join(lines)
+
+
+stats = Stats()
+
+
+# // WIRE PROTOCOL
+async def read_message(reader: asyncio.StreamReader) -> tuple[bytes, bytes]:
+    head = await reader.readexactly(5)
+    body = await reader.readexactly(int.from_bytes(head[1:], "big") - 4)
+    return head[:1], head + body
+
+
+def message(kind: bytes, payload: bytes = b"") -> bytes:
+    return kind + (len(payload) + 4).to_bytes(4, "big") + payload
+
+
+def error(code: str, text: str) -> bytes:
+    fields = f"SFATAL\0VFATAL\0C{code}\0M{text}\0".encode() + b"\0"
+    return message(b"E", fields)
+
+
+def error_fields(raw: bytes) -> dict[str, str]:
+    found = {}
+    for part in raw[5:].split(b"\0"):
+        if part:
+            found[chr(part[0])] = part[1:].decode(errors="replace")
+    return found
+
+
+def ready(raw: bytes) -> Optional[bytes]:
+    return raw[5:6] if raw[:1] == b"Z" else None
+
+
+# // SCRAM-SHA-256 (the server side of every connection is a real login)
+class Scram:
+    def __init__(self, password: str) -> None:
+        self.password = password.encode()
+        self.nonce = base64.b64encode(secrets.token_bytes(18)).decode()
+        self.first_bare = f"n=,r={self.nonce}"
+
+    def first(self) -> bytes:
+        data = ("n,," + self.first_bare).encode()
+        return b"SCRAM-SHA-256\0" + len(data).to_bytes(4, "big") + data
+
+    def final(self, server_first: bytes) -> bytes:
+        text = server_first.decode()
+        attrs = dict(a.split("=", 1) for a in text.split(","))
+        salted = hashlib.pbkdf2_hmac(
+            "sha256", self.password, base64.b64decode(attrs["s"]), int(attrs["i"])
+        )
+        client_key = hmac.new(salted, b"Client Key", "sha256").digest()
+        stored = hashlib.sha256(client_key).digest()
+        without_proof = f"c=biws,r={attrs['r']}"
+        auth = f"{self.first_bare},{text},{without_proof}".encode()
+        signature = hmac.new(stored, auth, "sha256").digest()
+        proof = bytes(a ^ b for a, b in zip(client_key, signature))
+        return f"{without_proof},p={base64.b64encode(proof).decode()}".encode()
+
+
+# // SERVER CONNECTIONS
+@dataclass
+class Server:
+    reader: asyncio.StreamReader
+    writer: asyncio.StreamWriter
+    parameters: list[bytes]  # ParameterStatus messages, replayed to clients
+
+
+async def open_server(host: str, port: int, database: str) -> Server:
+    reader, writer = await asyncio.open_connection(host, port)
+    user, password = dc.config.user, dc.config.password
+    params = {"user": user, "database": database, "client_encoding": "UTF8"}
+    payload = PROTOCOL.to_bytes(4, "big")
+    payload += b"".join(f"{k}\0{v}\0".encode() for k, v in params.items()) + b"\0"
+    writer.write((len(payload) + 4).to_bytes(4, "big") + payload)
+    parameters, scram = [], Scram(password)
+    while True:
+        kind, raw = await read_message(reader)
+        if kind == b"R":
+            code = int.from_bytes(raw[5:9], "big")
+            if code == 3:
+                writer.write(message(b"p", password.encode() + b"\0"))
+            elif code == 5:
+                inner = hashlib.md5((password + user).encode()).hexdigest().encode()
+                digest = hashlib.md5(inner + raw[9:13]).hexdigest()
+                writer.write(message(b"p", f"md5{digest}\0".encode()))
+            elif code == 10:
+                writer.write(message(b"p", scram.first()))
+            elif code == 11:
+                writer.write(message(b"p", scram.final(raw[9:])))
+        elif kind == b"S":
+            parameters.append(raw)
+        elif kind == b"E":
+            writer.close()
+            raise ConnectionError(error_fields(raw).get("M", "login failed"))
+        elif kind == b"Z":
+            return Server(reader, writer, parameters)
+
+
+class Pool:
+    def __init__(self, size: int, host: str, port: int, database: str) -> None:
+        self.size = size
+        self.target = (host, port, database)
+        self.opened = 0
+        self.idle: deque[Server] = deque()
+        self.waiters: deque[asyncio.Future[Server]] = deque()
+
+    # at least two, or a client alone would always get the same one back
+    async def fill(self, n: int) -> None:
+        while self.opened < min(n, self.size):
+            self.opened += 1
+            try:
+                self.put(await open_server(*self.target))
+            except BaseException:
+                self.opened -= 1
+                raise
+
+    async def get(self) -> Server:
+        if self.idle:
+            return self.idle.popleft()
+        if self.opened < self.size:
+            self.opened += 1
+            try:
+                return await open_server(*self.target)
+            except BaseException:
+                self.opened -= 1
+                raise
+        stats.waits += 1
+        waiter = asyncio.get_running_loop().create_future()
+        self.waiters.append(waiter)
+        return await waiter
+
+    def put(self, server: Server) -> None:
+        while self.waiters:
+            waiter = self.waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(server)
+                return
+        self.idle.append(server)  # taken from the left: least recently used first
+
+    # a connection left mid-transaction by a client that went away
+    def discard(self, server: Server) -> None:
+        server.writer.close()
+        self.opened -= 1
+        if self.waiters:
+            asyncio.create_task(self._replace())
+
+    async def _replace(self) -> None:
+        self.opened += 1
+        try:
+            self.put(await open_server(*self.target))
+        except Exception:
+            self.opened -= 1
+
+
+# // CLIENTS
+class Link:
+    def __init__(self) -> None:
+        self.server: Optional[Server] = None
+        self.pending = 0  # Sync / Query sent, ReadyForQuery not back yet
+        self.status = b"I"
+
+
+async def startup(
+    reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+) -> Optional[dict[str, str]]:
+    while True:
+        length = int.from_bytes(await reader.readexactly(4), "big")
+        body = await reader.readexactly(length - 4)
+        code = int.from_bytes(body[:4], "big")
+        if code == SSL_REQUEST:
+            writer.write(b"N")
+            continue
+        if code == CANCEL_REQUEST or code != PROTOCOL:  # cancels are not forwarded
+            return None
+        items = body[4:].split(b"\0")
+        params = {k.decode(): v.decode() for k, v in zip(items[::2], items[1::2]) if k}
+        refused = [k for k in params if k.lower() not in STARTUP_PARAMETERS]
+        if refused:
+            stats.refused.update(refused)
+            writer.write(error("08P01", f"unsupported startup parameter: {refused[0]}"))
+            return None
+        return params
+
+
+async def forward(link: Link, pool: Pool, writer: asyncio.StreamWriter) -> None:
+    server = link.server
+    assert server is not None
+    while True:
+        kind, raw = await read_message(server.reader)
+        if kind == b"E":
+            found = error_fields(raw)
+            code = found.get("C", "?????")
+            stats.errors[code] += 1
+            stats.messages.setdefault(code, found.get("M", ""))
+        writer.write(raw)
+        await writer.drain()
+        status = ready(raw)
+        if status is not None:
+            link.pending -= 1
+            link.status = status
+            if status == b"I" and link.pending == 0:
+                link.server = None
+                stats.transactions += 1
+                pool.put(server)
+                return
+
+
+async def serve_client(
+    reader: asyncio.StreamReader,
+    writer: asyncio.StreamWriter,
+    pools: dict[str, Pool],
+    make_pool: Callable[[str], Pool],
+) -> None:
+    stats.clients += 1
+    stats.connected += 1
+    stats.peak = max(stats.peak, stats.connected)
+    link, relay = Link(), None
+    try:
+        params = await startup(reader, writer)
+        if params is None:
+            return
+        database = params.get("database", params["user"])
+        pool = pools.get(database) or pools.setdefault(database, make_pool(database))
+        await pool.fill(MIN_SERVERS)
+        server = await pool.get()
+        pool.put(server)
+        writer.write(message(b"R", (0).to_bytes(4, "big")))
+        writer.write(b"".join(server.parameters))
+        writer.write(message(b"K", secrets.token_bytes(8)))
+        writer.write(message(b"Z", b"I"))
+        while True:
+            kind, raw = await read_message(reader)
+            if kind == b"X":
+                return
+            if kind == b"Q" and raw[5:].lstrip()[:6].upper() == b"LISTEN":
+                stats.listens += 1
+            if link.server is None:
+                link.server = await pool.get()
+                relay = asyncio.create_task(forward(link, pool, writer))
+            if kind in (b"S", b"Q"):
+                link.pending += 1
+            link.server.writer.write(raw)
+            await link.server.writer.drain()
+    except (asyncio.IncompleteReadError, ConnectionError):
+        pass
+    finally:
+        stats.connected -= 1
+        if relay is not None and not relay.done():
+            relay.cancel()
+            if link.server is not None:
+                pool.discard(link.server)
+        writer.close()
+
+
+async def start_pooler(
+    port: int, size: int, server_host: str, server_port: int
+) -> tuple[asyncio.Server, dict[str, Pool]]:
+    pools: dict[str, Pool] = {}
+
+    def make_pool(database: str) -> Pool:
+        return Pool(size, server_host, server_port, database)
+
+    listener = await asyncio.start_server(
+        lambda r, w: serve_client(r, w, pools, make_pool), "127.0.0.1", port
+    )
+    return listener, pools
+
+
+def opened(pools: dict[str, Pool]) -> int:
+    return sum(pool.opened for pool in pools.values())
+
+
+# // RUN THE API THROUGH IT
+async def api_ready(url: str, timeout: float) -> None:
+    deadline = asyncio.get_running_loop().time() + timeout
+    async with httpx.AsyncClient() as client:
+        while True:
+            try:
+                if (await client.get(f"{url}/metrics")).status_code == 200:
+                    return
+            except httpx.TransportError:
+                pass
+            if asyncio.get_running_loop().time() > deadline:
+                raise SystemExit(f"API not up at {url} after {timeout:.0f} s")
+            await asyncio.sleep(0.5)
+
+
+async def run(args: argparse.Namespace) -> int:
+    listener, pools = await start_pooler(
+        args.port, args.pool_size, dc.config.host, dc.config.port
+    )
+    if args.serve:
+        print(f"pooling 127.0.0.1:{args.port} -> {dc.config.host}:{dc.config.port}")
+        try:
+            await asyncio.Event().wait()
+        finally:
+            print(stats.render(opened(pools)))
+    env = {
+        **os.environ,
+        "DB_HOST": "127.0.0.1",
+        "DB_PORT": str(args.port),
+        "DB_PGBOUNCER": "1",
+        "DB_STATEMENT_TIMEOUT": str(args.statement_timeout),
+        "DB_LISTEN_HOST": dc.config.host,
+        "DB_LISTEN_PORT": str(dc.config.port),
+        "ACCESS_LOG": "0",
+    }
+    url = f"http://127.0.0.1:{args.api_port}"
+    log = open(args.api_log, "w")
+    api = await asyncio.create_subprocess_exec(
+        *(sys.executable, "-m", "uvicorn", "main:app", "--log-level", "warning"),
+        *("--port", str(args.api_port), "--workers", str(args.workers)),
+        env=env,
+        stdout=log,
+        stderr=log,
+    )
+    try:
+        await api_ready(url, 60)
+        load_args = argparse.Namespace(
+            url=url,
+            scale=args.scale,
+            users=args.users,
+            admins=1,
+            duration=args.duration,
+            timeout=30.0,
+            seed=1,
+        )
+        print(load.render(await load.run(load_args)))
+    finally:
+        api.terminate()
+        await api.wait()
+        log.close()
+        listener.close()
+    print()
+    print(f"{args.workers} API workers through the pooler")
+    print(stats.render(opened(pools)))
+    return 1 if stats.failed() else 0
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--port", type=int, default=6432)
+    parser.add_argument("--pool-size", type=int, default=10, help="per database")
+    parser.add_argument("--serve", action="store_true")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--api-port", type=int, default=8081)
+    parser.add_argument("--api-log", default=os.devnull)
+    parser.add_argument("--statement-timeout", type=int, default=30000, help="ms")
+    parser.add_argument("--scale", choices=list(load.datagen.SCALES), default="small")
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--duration", type=float, default=30.0)
+    args = parser.parse_args()
+    try:
+        raise SystemExit(asyncio.run(run(args)))
+    except KeyboardInterrupt:
+        raise SystemExit(1 if stats.failed() else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+"""Throughput and latency percentiles per route from a benchmark.load run.
+
+    python -m benchmark.report run.json --baseline last-release.json
+
+With --baseline it exits 1 when a route got slower (p95) or lost throughput by
+more than --threshold, so it can gate a deploy.
+"""
+import argparse
+import json
+import statistics
+import sys
+from dataclasses import dataclass
+from typing import Any, Optional
+
+
+# // SUMMARY
+@dataclass(slots=True)
+class RouteSummary:
+    route: str
+    count: int
+    rps: float
+    client_errors: int  # 4xx, most are expected (already liked, not found)
+    errors: int  # 5xx and requests that never got a response
+    p50: float
+    p95: float
+    p99: float
+    max: float
+
+
+def _percentiles(latencies: list[float]) -> list[float]:
+    if len(latencies) < 2:
+        return (latencies or [0.0]) * 99
+    return statistics.quantiles(latencies, n=100, method="inclusive")
+
+
+def summarize(run: dict[str, Any]) -> list[RouteSummary]:
+    elapsed = run["meta"]["elapsed"]
+    summaries = []
+    for route, stats in sorted(run["routes"].items()):
+        latencies = sorted(stats["latencies"])
+        statuses = {int(code): n for code, n in stats["statuses"].items()}
+        pct = _percentiles(latencies)
+        summaries.append(
+            RouteSummary(
+                route=route,
+                count=len(latencies),
+                rps=len(latencies) / elapsed,
+                client_errors=sum(n for c, n in statuses.items() if 400 <= c < 500),
+                errors=sum(n for c, n in statuses.items() if c >= 500 or c == 0),
+                p50=pct[49] * 1000,
+                p95=pct[94] * 1000,
+                p99=pct[98] * 1000,
+                max=(latencies[-1] if latencies else 0.0) * 1000,
+            )
+        )
+    return summaries
+
+
+def render(run: dict[str, Any]) -> str:
+    meta = run["meta"]
+    rows = summarize(run)
+    total = sum(r.count for r in rows)
+    lines = [
+        f"{meta['users']} users, {meta['elapsed']:.1f} s, {total:,} requests, "
+        f"{total / meta['elapsed']:,.1f} req/s",
+        f"{'route':<46}{'count':>8}{'req/s':>9}{'4xx':>6}{'err':>6}"
+        f"{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'max ms':>9}",
+    ]
+    for r in rows:
+        lines.append(
+            f"{r.route:<46}{r.count:>8}{r.rps:>9.1f}{r.client_errors:>6}{r.errors:>6}"
+            f"{r.p50:>9.2f}{r.p95:>9.2f}{r.p99:>9.2f}{r.max:>9.1f}"
+        )
+    return "\n".join(lines)
+
+
+# // REGRESSIONS
+def compare(
+    run: dict[str, Any], baseline: dict[str, Any], threshold: float
+) -> list[str]:
+    before = {r.route: r for r in summarize(baseline)}
+    found = []
+    for r in summarize(run):
+        old: Optional[RouteSummary] = before.get(r.route)
+        if old is None:
+            continue
+        if old.p95 and r.p95 > old.p95 * (1 + threshold):
+            found.append(f"{r.route}: p95 {old.p95:.2f} -> {r.p95:.2f} ms")
+        if old.rps and r.rps < old.rps * (1 - threshold):
+            found.append(f"{r.route}: {old.rps:.1f} -> {r.rps:.1f} req/s")
+        if r.errors > old.errors:
+            found.append(f"{r.route}: {old.errors} -> {r.errors} errors")
+    return found
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("run")
+    parser.add_argument("--baseline")
+    parser.add_argument("--threshold", type=float, default=0.2)
+    args = parser.parse_args()
+    with open(args.run) as f:
+        run = json.load(f)
+    print(render(run))
+    if args.baseline:
+        with open(args.baseline) as f:
+            found = compare(run, json.load(f), args.threshold)
+        print("\nregressions:" if found else "\nno regressions")
+        for line in found:
+            print(f"  {line}")
+        sys.exit(1 if found else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,275 @@
+import csv
+import dataclasses
+import enum
+import io
+import json
+from dataclasses import dataclass
+from typing import Any, AsyncIterator, Callable, Optional
+from litestar import Request
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncSession
+import cache
+import models as md, models_validation as mv  # noqa: E401
+
+
+# // BULK CONFIGURATION
+BATCH_SIZE = 5000  # rows per COPY into the staging table
+MAX_ERRORS = 1000  # rows reported individually, the rest are only counted
+MAX_LINE_LENGTH = 1 << 20  # bytes per line / CSV record, longer ones are rejected
+TOO_LONG = f"⚠️ Line longer than {MAX_LINE_LENGTH} bytes"
+
+
+@dataclass(frozen=True)
+class BulkSpec:
+    schema: type
+    key: tuple[str, ...]  # the unique key rows are merged on
+    check: Optional[Callable[[Any], Optional[str]]] = None
+
+    @property
+    def columns(self) -> list[str]:
+        return [f.name for f in dataclasses.fields(self.schema)]
+
+
+# same rules as the single-row /add handlers
+SPECS: dict[type[md.Base], BulkSpec] = {
+    md.Course: BulkSpec(
+        mv.Course,
+        ("name",),
+        lambda r: "Duration can't be less than than 1" if r.duration < 1 else None,
+    ),
+    md.College: BulkSpec(
+        mv.College,
+        ("name",),
+        lambda r: "Rank can't be less than than 1" if r.rank < 1 else None,
+    ),
+    md.Exam: BulkSpec(mv.Exam, ("name",)),
+    md.Academics: BulkSpec(mv.Academics, ("course_id", "college_id", "exam_id")),
+}
+
+
+@dataclass
+class Report:
+    inserted: int = 0
+    rejected: int = 0
+    errors: list[dict[str, Any]] = dataclasses.field(default_factory=list)
+
+    def reject(self, line: int, error: str) -> None:
+        self.rejected += 1
+        if len(self.errors) < MAX_ERRORS:
+            self.errors.append({"line": line, "error": error})
+
+    def as_dict(self) -> dict[str, Any]:
+        return {
+            "inserted": self.inserted,
+            "rejected": self.rejected,
+            "errors": self.errors,
+            "errors_truncated": self.rejected > len(self.errors),
+        }
+
+
+# // PARSING (one line in memory at a time)
+# None for a line over MAX_LINE_LENGTH: its bytes are dropped as they arrive,
+# up to its newline. Each chunk is scanned once, from where the last scan ended
+async def _lines(request: Request) -> AsyncIterator[tuple[int, Optional[bytes]]]:
+    buffer = bytearray()
+    number = scanned = 0
+    skipping = False
+    async for chunk in request.stream():
+        buffer += chunk
+        start = 0
+        while (end := buffer.find(b"\n", scanned)) != -1:
+            number += 1
+            too_long = skipping or end - start > MAX_LINE_LENGTH
+            yield number, None if too_long else bytes(buffer[start:end])
+            skipping = False
+            start = scanned = end + 1
+        del buffer[:start]
+        scanned = len(buffer)
+        if scanned > MAX_LINE_LENGTH:
+            buffer.clear()
+            scanned = 0
+            skipping = True
+    if skipping or buffer.strip():
+        yield number + 1, None if skipping else bytes(buffer)
+
+
+async def _ndjson_rows(request: Request) -> AsyncIterator[tuple[int, Any]]:
+    async for number, line in _lines(request):
+        if line is None:
+            yield number, TOO_LONG
+            continue
+        if not line.strip():
+            continue
+        try:
+            yield number, json.loads(line)
+        except ValueError:
+            yield number, "⚠️ Invalid JSON"
+
+
+async def _csv_rows(request: Request) -> AsyncIterator[tuple[int, Any]]:
+    header: Optional[list[str]] = None
+    pending: list[str] = []
+    start = size = 0
+    async for number, line in _lines(request):
+        if not pending:
+            start, size = number, 0
+        # a quote left open would otherwise gather the rest of the upload
+        size += len(line or b"")
+        if line is None or size > MAX_LINE_LENGTH:
+            pending = []
+            yield start, TOO_LONG
+            continue
+        try:
+            pending.append(line.decode().rstrip("\r"))
+        except UnicodeDecodeError:
+            pending = []
+            yield number, "⚠️ Invalid UTF-8"
+            continue
+        record = "\n".join(pending)
+        if record.count('"') % 2:
+            continue  # a quoted field spans several lines
+        pending = []
+        if not record.strip():
+            continue
+        values = next(csv.reader(io.StringIO(record)))
+        if header is None:
+            header = values
+        elif len(values) != len(header):
+            yield start, f"⚠️ Expected {len(header)} columns, got {len(values)}"
+        else:
+            yield start, dict(zip(header, values))
+    if pending:
+        yield start, "⚠️ Unterminated quoted field"
+
+
+# // VALIDATION
+def _coerce(tp: Any, value: Any) -> Any:
+    if isinstance(tp, type) and issubclass(tp, enum.Enum):
+        return tp(value)
+    if tp is int:
+        value = int(value)
+        if not -(2**31) <= value < 2**31:
+            raise ValueError
+        return value
+    if tp is float:
+        return float(value)
+    return str(value)
+
+
+def _record(spec: BulkSpec, line: int, row: Any) -> tuple[Any, ...]:
+    if not isinstance(row, dict):
+        raise ValueError(row if isinstance(row, str) else "⚠️ Expected an object")
+    values = {}
+    for f in dataclasses.fields(spec.schema):
+        if row.get(f.name) is None:
+            raise ValueError(f"⚠️ Missing {f.name}")
+        try:
+            values[f.name] = _coerce(f.type, row[f.name])
+        except ValueError:
+            raise ValueError(f"⚠️ Invalid {f.name}")
+    data = spec.schema(**values)
+    if spec.check is not None and (error := spec.check(data)):
+        raise ValueError(f"⚠️ {error}")
+    return (line,) + tuple(
+        v.value if isinstance(v, enum.Enum) else v
+        for v in (getattr(data, c) for c in spec.columns)
+    )
+
+
+# // STAGING + MERGE
+def _quote(names: Any) -> str:
+    return ", ".join(f'"{n}"' for n in names)
+
+
+async def _stage(conn: AsyncConnection, model: type[md.Base], spec: BulkSpec) -> str:
+    stage = f"_bulk_{model.__tablename__}"
+    dialect = postgresql.dialect()
+    columns = ", ".join(
+        f'"{c}" {model.__table__.c[c].type.compile(dialect=dialect)}'
+        for c in spec.columns
+    )
+    # through SQLAlchemy, so the request transaction is open before asyncpg is used
+    await conn.exec_driver_sql(
+        f'CREATE TEMP TABLE "{stage}" (_line bigint, {columns}) ON COMMIT DROP'
+    )
+    return stage
+
+
+async def _merge(
+    raw: Any,
+    model: type[md.Base],
+    spec: BulkSpec,
+    stage: str,
+    batch: list[tuple[Any, ...]],
+    report: Report,
+) -> None:
+    table = model.__tablename__
+    await raw.copy_records_to_table(
+        stage, records=batch, columns=["_line", *spec.columns]
+    )
+    for fk in model.__table__.foreign_keys:
+        target = fk.column.table.name
+        missing = await raw.fetch(
+            f'DELETE FROM "{stage}" s WHERE NOT EXISTS (SELECT 1 FROM "{target}" t'
+            f' WHERE t."{fk.column.name}" = s."{fk.parent.name}") RETURNING _line'
+        )
+        for row in missing:
+            report.reject(row["_line"], f"⚠️ Unknown {fk.parent.name}")
+    # columns with a python-side default (likes) are filled in as parameters
+    defaults = {
+        c.name: c.default.arg
+        for c in model.__table__.columns
+        if c.name not in spec.columns and c.default is not None and c.default.is_scalar
+    }
+    key, columns = _quote(spec.key), _quote(spec.columns)
+    params = ", ".join(f"${i}" for i in range(1, len(defaults) + 1))
+    target = _quote([*spec.columns, *defaults])
+    source = ", ".join(filter(None, [columns, params]))
+    rows = await raw.fetch(
+        f"""
+        WITH chosen AS (
+            SELECT DISTINCT ON ({key}) * FROM "{stage}" ORDER BY {key}, _line
+        ), ins AS (
+            INSERT INTO "{table}" ({target}) SELECT {source} FROM chosen
+            ON CONFLICT DO NOTHING RETURNING id, {key}
+        )
+        SELECT s._line, i.id FROM "{stage}" s LEFT JOIN (
+            SELECT c._line, ins.id FROM chosen c JOIN ins USING ({key})
+        ) i ON i._line = s._line
+        """,
+        *defaults.values(),
+    )
+    for row in rows:
+        if row["id"] is None:
+            report.reject(row["_line"], "⚠️ Already exists")
+        else:
+            report.inserted += 1
+    await raw.execute(f'TRUNCATE "{stage}"')
+
+
+async def load(
+    db: AsyncSession, request: Request, model: type[md.Base]
+) -> dict[str, Any]:
+    spec = SPECS[model]
+    report = Report()
+    conn = await db.connection()
+    stage = await _stage(conn, model, spec)
+    raw = (await conn.get_raw_connection()).driver_connection
+    is_csv = "csv" in request.headers.get("content-type", "")
+    rows = _csv_rows(request) if is_csv else _ndjson_rows(request)
+    batch: list[tuple[Any, ...]] = []
+    async for line, row in rows:
+        try:
+            batch.append(_record(spec, line, row))
+        except (ValueError, TypeError) as e:
+            report.reject(line, str(e))
+            continue
+        if len(batch) >= BATCH_SIZE:
+            await _merge(raw, model, spec, stage, batch, report)
+            batch = []
+    if batch:
+        await _merge(raw, model, spec, stage, batch, report)
+    # new rows start with 0 likes, the ranking indexes pick them up on refresh
+    if report.inserted:
+        await cache.invalidate(db, model)
+    return report.as_dict()
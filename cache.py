@@ -0,0 +1,111 @@
+import asyncio
+import math
+import os
+from contextlib import asynccontextmanager
+from time import monotonic
+from typing import Any, AsyncIterator
+from litestar import Litestar, Request
+from litestar.config.response_cache import (
+    ResponseCacheConfig,
+    default_cache_key_builder,
+    default_do_cache_predicate,
+)
+from litestar.types import HTTPScope
+from sqlalchemy.ext.asyncio import AsyncSession
+from commit_hooks import on_commit
+import models as md
+import pubsub
+import streaming as st
+
+
+# // CACHE CONFIGURATION
+CATALOG_TTL = int(os.environ.get("CATALOG_CACHE_TTL", 600))  # seconds
+SWEEP_INTERVAL = 60.0
+CHANNEL = "cache_invalidate"
+_KEY = "cache_key"
+
+# every tag (table name) has a generation, a write bumps it and all the
+# cached responses built from the old generation stop matching any key
+versions: dict[str, int] = {}
+bumped: dict[str, float] = {}  # monotonic time of the last bump, see written_within
+
+
+def tags(*models: type[md.Base]) -> dict[str, Any]:
+    return {"cache_tags": tuple(m.__tablename__ for m in models)}
+
+
+def key_builder(request: Request) -> str:
+    # built once per request, a write landing mid-request must not relabel
+    # a response read before it with the new generation
+    scope_state = request.scope["state"]
+    if _KEY not in scope_state:
+        names = request.route_handler.opt.get("cache_tags", ())
+        generations = ",".join(f"{n}:{versions.get(n, 0)}" for n in names)
+        media = "ndjson" if st.wants_ndjson(request) else "json"
+        base = default_cache_key_builder(request)
+        scope_state[_KEY] = f"{base}|{media}|{generations}"
+    return scope_state[_KEY]
+
+
+def response_filter(scope: HTTPScope, status_code: int) -> bool:
+    # full-table streams are never buffered into the cache
+    accept = dict(scope["headers"]).get(b"accept", b"")
+    return default_do_cache_predicate(scope, status_code) and (
+        st.NDJSON.encode() not in accept
+    )
+
+
+config = ResponseCacheConfig(
+    default_expiration=CATALOG_TTL,
+    key_builder=key_builder,
+    cache_response_filter=response_filter,
+)
+
+
+# // INVALIDATION
+def bump(names: list[str]) -> None:
+    now = monotonic()
+    for name in names:
+        versions[name] = versions.get(name, 0) + 1
+        bumped[name] = now
+
+
+def bump_all() -> None:
+    bump(list(md.Base.metadata.tables))
+
+
+async def invalidate(db: AsyncSession, *models: type[md.Base]) -> None:
+    names = [m.__tablename__ for m in models]
+    on_commit(db, bump, names)
+    await pubsub.publish(db, CHANNEL, ",".join(names))
+
+
+# a cached route read shortly after a write to one of its tags: a lagging
+# replica would hand it pre-write rows to store under the new generation
+def written_within(request: Request, window: float) -> bool:
+    names = request.route_handler.opt.get("cache_tags")
+    if not names:
+        return False
+    now = monotonic()
+    return any(now - bumped.get(name, -math.inf) < window for name in names)
+
+
+pubsub.subscribe(CHANNEL, lambda payload: bump(payload.split(",")), bump_all)
+
+
+# // LIFESPAN
+# stale generations are never read again, drop them once they expire
+async def _sweep(app: Litestar) -> None:
+    store = config.get_store_from_app(app)
+    while True:
+        await asyncio.sleep(SWEEP_INTERVAL)
+        await store.delete_expired()  # type: ignore
+
+
+@asynccontextmanager
+async def response_cache(app: Litestar) -> AsyncIterator[None]:
+    sweeper = asyncio.create_task(_sweep(app))
+    try:
+        yield
+    finally:
+        sweeper.cancel()
@@ -0,0 +1,30 @@
+import logging
+from typing import Any, Callable
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+
+_CALLBACKS = "after_commit_callbacks"
+
+logger = logging.getLogger(__name__)
+
+
+# // AFTER COMMIT CALLBACKS
+# in-process state (counters, indexes, caches) must only follow committed rows
+def on_commit(db: AsyncSession, fn: Callable[..., Any], *args: Any) -> None:
+    db.info.setdefault(_CALLBACKS, []).append((fn, args))
+
+
+@event.listens_for(Session, "after_commit")
+def _run_callbacks(session: Session) -> None:
+    for fn, args in session.info.pop(_CALLBACKS, ()):
+        try:
+            fn(*args)
+        except Exception:
+            logger.exception("after commit callback %r failed", fn)
+
+
+@event.listens_for(Session, "after_rollback")
+def _drop_callbacks(session: Session) -> None:
+    session.info.pop(_CALLBACKS, None)
@@ -1,51 +1,320 @@
+import asyncio
+import logging
+import os
+import tomllib
 from contextlib import asynccontextmanager
-from typing import Any
-from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
-from sqlalchemy import select, insert
-import models as md
-from litestar import Litestar
+from dataclasses import dataclass, fields
+from time import perf_counter
+from typing import Any, Mapping
+from sqlalchemy.ext.asyncio import (
+    AsyncConnection,
+    AsyncEngine,
+    AsyncSession,
+    create_async_engine,
+)
+from sqlalchemy import Connection, Executable, URL, event, text
+from sqlalchemy.exc import TimeoutError as PoolTimeout
+import cache
+import graph as gr
+import hashing
+import likes as lk
+import migrations as mg
+from admission import admission, overloaded
+from metrics import metrics
+import pubsub
+import ranking as rk
+from litestar import Litestar, Request
 from litestar.datastructures import State
-from passlib.hash import pbkdf2_sha256 as securepwd
 
 
 # // DATABASE CONFIGURATION
-server_name = "postgres"
-server_password = "1"
-host_address = "localhost"
-port = "5432"
-database_name = "academicworld"
+# defaults < the TOML file named by DB_CONFIG < DB_<FIELD> environment variables
+# (DB_HOST, DB_POOL_SIZE, DB_PGBOUNCER=1, ...), pools are per worker process
+@dataclass(frozen=True)
+class DatabaseConfig:
+    user: str = "postgres"
+    password: str = "1"
+    host: str = "localhost"
+    port: int = 5432
+    name: str = "academicworld"
+    # read replica, no host = every request goes to the primary
+    replica_host: str = ""
+    replica_port: int = 0  # 0 = port
+    replica_name: str = ""  # "" = name
+    pool_size: int = 5
+    max_overflow: int = 10
+    pool_timeout: float = 1.0  # seconds a request waits for a connection, then 503
+    pool_pre_ping: bool = False
+    pool_recycle: int = -1  # seconds before a connection is replaced, -1 = never
+    statement_cache_size: int = 500  # prepared statements kept per connection
+    statement_timeout: int = 0  # ms, 0 = none
+    # PgBouncer in pool_mode=transaction (or any transaction pooler) in between
+    pgbouncer: bool = False
+    # LISTEN needs a session of its own, behind a pooler it goes to postgres itself
+    listen_host: str = ""  # "" = host
+    listen_port: int = 0  # 0 = port
+    # open every pooled connection and prepare the hot statements before serving
+    warmup: bool = False
+
+
+def _coerce(default: Any, value: Any) -> Any:
+    if isinstance(default, bool) and isinstance(value, str):
+        return value.lower() in ("1", "true", "yes", "on")
+    return type(default)(value)
+
+
+def load_config(environ: Mapping[str, str] = os.environ) -> DatabaseConfig:
+    values: dict[str, Any] = {}
+    if environ.get("DB_CONFIG"):
+        with open(environ["DB_CONFIG"], "rb") as f:
+            values.update(tomllib.load(f))
+    defaults = {f.name: f.default for f in fields(DatabaseConfig)}
+    unknown = values.keys() - defaults.keys()
+    if unknown:
+        raise ValueError(f"unknown database settings: {', '.join(sorted(unknown))}")
+    for name in defaults:
+        if f"DB_{name.upper()}" in environ:
+            values[name] = environ[f"DB_{name.upper()}"]
+    return DatabaseConfig(**{k: _coerce(defaults[k], v) for k, v in values.items()})
+
+
+config = load_config()
+
+replica_max_lag = 5.0  # seconds behind the primary before reads fall back to it
+replica_check_interval = 2.0
+
+logger = logging.getLogger(__name__)
+
+REPLICA_LAG = text(
+    "SELECT CASE WHEN NOT pg_is_in_recovery()"
+    " OR pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0"
+    " ELSE extract(epoch FROM now() - pg_last_xact_replay_timestamp()) END"
+)
+
+
+# // ENGINE
+def engine_url(host: str, port: int, name: str) -> URL:
+    return URL.create(
+        "postgresql+asyncpg",
+        username=config.user,
+        password=config.password,
+        host=host,
+        port=port,
+        database=name,
+    )
+
+
+def _unnamed() -> str:
+    return ""
+
+
+def engine_options() -> dict[str, Any]:
+    connect_args: dict[str, Any] = {
+        "prepared_statement_cache_size": config.statement_cache_size
+    }
+    if config.pgbouncer:
+        # every transaction may run on another server connection, which other
+        # clients used before: named statements (asyncpg's own cache too) would
+        # be missing or already taken there. The unnamed one only has to last
+        # from prepare to execute, inside one transaction
+        connect_args["prepared_statement_cache_size"] = 0
+        connect_args["statement_cache_size"] = 0
+        connect_args["prepared_statement_name_func"] = _unnamed
+    elif config.statement_timeout:
+        # a startup parameter, the pooler would refuse it (see _set_timeout)
+        timeout = str(config.statement_timeout)
+        connect_args["server_settings"] = {"statement_timeout": timeout}
+    return {
+        "pool_size": config.pool_size,
+        "max_overflow": config.max_overflow,
+        "pool_timeout": config.pool_timeout,
+        "pool_pre_ping": config.pool_pre_ping,
+        "pool_recycle": config.pool_recycle,
+        "connect_args": connect_args,
+    }
+
+
+# a session-wide SET would stay on a server connection other clients share next
+def _set_timeout(conn: Connection) -> None:
+    conn.exec_driver_sql(f"SET LOCAL statement_timeout = {config.statement_timeout}")
+
+
+def create_engine(
+    host: str = config.host, port: int = config.port, name: str = config.name
+) -> AsyncEngine:
+    engine = create_async_engine(engine_url(host, port, name), **engine_options())
+    if config.pgbouncer and config.statement_timeout:
+        event.listen(engine.sync_engine, "begin", _set_timeout)
+    return engine
+
+
+# postgres itself (the LISTEN address), for what a transaction pooler can't
+# carry: session advisory locks and statements outside a transaction
+def direct_engine() -> AsyncEngine:
+    return create_engine(
+        config.listen_host or config.host, config.listen_port or config.port
+    )
+
+
+# // READ REPLICA HEALTH
+async def check_replica(state: State) -> None:
+    while True:
+        try:
+            async with state.replica_engine.connect() as conn:
+                lag = await conn.scalar(REPLICA_LAG)
+            state.replica_ok = lag is not None and lag <= replica_max_lag
+        except Exception:
+            logger.warning("read replica unreachable, reading from the primary")
+            state.replica_ok = False
+        await asyncio.sleep(replica_check_interval)
+
+
+def read_engine(state: State) -> AsyncEngine:
+    if state.replica_engine is not None and state.replica_ok:
+        return state.replica_engine
+    return state.engine
 
 
 # // DATABASE SETUP
 @asynccontextmanager  # type: ignore
 async def db_connection(app: Litestar) -> Any:
-    engine = create_async_engine(
-        f"postgresql+asyncpg://{server_name}:{server_password}@{host_address}:{port}/{database_name}?prepared_statement_cache_size=500",
-        echo=True,
-    )
+    engine = create_engine()
     app.state.engine = engine
-    async with engine.begin() as conn:
-        # await conn.run_sync(md.Base.metadata.drop_all)
-        await conn.run_sync(md.Base.metadata.create_all)
-        res = await conn.scalar(select(md.User).where(md.User.username == "admin"))
-        if res is None:
-            await conn.execute(
-                insert(md.User).values(
-                    name="admin",
-                    username="admin",
-                    email="admin",
-                    pwd=securepwd.hash("admin"),
-                    admin=True,
-                )
-            )
+    app.state.replica_engine = None
+    app.state.replica_ok = False
+    if config.replica_host:
+        app.state.replica_engine = create_engine(
+            config.replica_host,
+            config.replica_port or config.port,
+            config.replica_name or config.name,
+        )
+    async with engine.connect() as conn:
+        # reads only, every worker boots at once: manage.py migrate owns the
+        # schema, manage.py reconcile-likes repairs the like counts
+        await mg.check(conn)
+        await rk.seed(conn, lk.counter.pending)
+        await gr.graph.load_catalog(conn)
+        await gr.graph.load(conn)
+    gr.graph.engine = engine
+    listen_url = engine_url(
+        config.listen_host or config.host,
+        config.listen_port or config.port,
+        config.name,
+    )
+    listener = asyncio.create_task(pubsub.listen(listen_url))
+    flusher = asyncio.create_task(lk.flush_periodically(engine))
+    refresher = asyncio.create_task(rk.refresh_periodically(engine, lk.counter.pending))
+    monitor = None
+    if app.state.replica_engine is not None:
+        monitor = asyncio.create_task(check_replica(app.state))
     try:
         yield
     finally:
-        await engine.dispose()
+        if monitor is not None:
+            monitor.cancel()
+            await app.state.replica_engine.dispose()
+        refresher.cancel()
+        flusher.cancel()
+        listener.cancel()
+        gr.graph.close()
+        try:
+            await lk.counter.flush(engine)
+        except Exception:
+            # gone with this process, python manage.py reconcile-likes repairs them
+            logger.exception(
+                "final likes flush failed, unflushed deltas: %s",
+                lk.counter.unflushed(),
+            )
+        finally:
+            await engine.dispose()
+            hashing.pool.shutdown()
+
+
+# // WARM-UP
+# pool_size connections per engine at once, so the pool really opens that many,
+# each runs the statements once through a session, as a request would:
+# SQLAlchemy caches their compiled form per engine, asyncpg prepares them per
+# connection (not behind PgBouncer, where only the connecting is saved)
+async def warm_up(
+    state: State, statements: list[tuple[Executable, dict[str, Any]]]
+) -> None:
+    engines = [state.engine]
+    if state.replica_engine is not None:
+        engines.append(state.replica_engine)
+    start = perf_counter()
+
+    async def prepare(engine: AsyncEngine) -> None:
+        async with engine.connect() as conn:
+            async with AsyncSession(conn) as session:
+                for statement, params in statements:
+                    await session.execute(statement, params)
+
+    await asyncio.gather(
+        *(prepare(engine) for engine in engines for _ in range(config.pool_size))
+    )
+    logger.info(
+        "warmed up %d connections with %d statements in %.0f ms",
+        len(engines) * config.pool_size,
+        len(statements),
+        (perf_counter() - start) * 1000,
+    )
 
 
 # // DATABASE SESSIONMAKER
-async def provide_transaction(state: State) -> Any:
-    async with async_sessionmaker(state.engine, expire_on_commit=False)() as session:
-        async with session.begin():
-            yield session
+# GET/HEAD read from the replica and everything else writes to the primary,
+# a handler can pin itself with opt={"db": "primary"} or opt={"db": "replica"}.
+# Cached routes read the primary for a while after a write to their tags: the
+# replica may be up to replica_max_lag behind as of its last check, which was
+# up to replica_check_interval ago
+def route_engine(state: State, request: Request) -> AsyncEngine:
+    target = request.route_handler.opt.get("db")
+    if target is None:
+        target = "replica" if request.method in ("GET", "HEAD") else "primary"
+    if target == "replica" and cache.written_within(
+        request, replica_max_lag + replica_check_interval
+    ):
+        target = "primary"
+    return read_engine(state) if target == "replica" else state.engine
+
+
+# time spent waiting for the pool (or a new connection) shows up in /metrics,
+# and admission control sheds requests while it stays high
+async def acquire(engine: AsyncEngine) -> AsyncConnection:
+    start = perf_counter()
+    try:
+        return await engine.connect()
+    finally:
+        wait = perf_counter() - start
+        metrics.pool_wait.observe(wait)
+        admission.observe_pool_wait(wait)
+
+
+async def connect(state: State, request: Request) -> AsyncConnection:
+    engine = route_engine(state, request)
+    try:
+        return await acquire(engine)
+    except Exception:
+        if engine is state.engine:
+            raise
+        logger.warning("read replica unreachable, reading from the primary")
+        state.replica_ok = False
+        return await acquire(state.engine)
+
+
+async def provide_transaction(state: State, request: Request) -> Any:
+    try:
+        conn = await connect(state, request)
+    except PoolTimeout:
+        raise overloaded(request.scope, "pool")
+    try:
+        async with AsyncSession(conn, expire_on_commit=False) as session:
+            async with session.begin():
+                yield session
+    finally:
+        await conn.close()
+
+
+# the same session, opened inside a handler that only needs it on some paths:
+# an injected `db` is checked out (and BEGIN / ROLLBACK run) before the handler
+# even looks at the request, e.g. for NDJSON dumps that stream on their own
+transaction = asynccontextmanager(provide_transaction)
@@ -0,0 +1,356 @@
+from dataclasses import dataclass
+from typing import Any, Optional
+from litestar import Controller, MediaType, Request, Response, delete, get, post
+from litestar.exceptions import NotFoundException
+from litestar.params import Parameter
+from litestar.types import Guard
+from sqlalchemy import (
+    Delete,
+    Executable,
+    Insert,
+    Select,
+    bindparam,
+    insert,
+    select,
+    delete as sqdl,
+)
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from commit_hooks import on_commit
+from db_connenction import read_engine, transaction
+import models as md, models_validation as mv  # noqa: E401
+import batch as bt
+import bulk
+import cache
+import likes as lk
+import mutations as mu
+import pagination as pg
+import ranking as rk
+import search as sr
+import streaming as st
+import threads as th
+
+
+# // ENTITY SPEC
+# course, college and exam expose the same routes over their own post, list and
+# likes tables: one spec per entity, the routes are built from it
+@dataclass(frozen=True)
+class Entity:
+    model: type[md.Base]
+    post: type[md.Base]
+    list: type[md.Base]
+    likes: type[md.Base]
+    search: str  # description of the /search route
+
+    @property
+    def name(self) -> str:
+        return self.model.__tablename__
+
+    @property
+    def key(self) -> str:
+        return f"{self.name.lower()}_id"
+
+    @property
+    def parent(self) -> str:
+        return f"{self.name.lower()}post_id"
+
+
+# // STATEMENTS
+# built once per process with bound parameters, so a request only binds values
+# and the engine's compiled cache hands back the SQL; writes go to the tables
+# (core statements), reads that return rows to serialize go through the models
+@dataclass(frozen=True, slots=True)
+class Statements:
+    exists: Select
+    delete: Delete
+    posts: Select
+    post_insert: Insert
+    post_delete: Delete
+    lists_public: Select
+    lists_user: Select
+    list_insert: Insert
+    list_delete: Delete
+    like_insert: Insert
+    search: Select
+
+
+def statements(entity: Entity) -> Statements:
+    table = entity.model.__table__
+    post, lst = entity.post.__table__, entity.list.__table__
+    entity_id, user_id = bindparam("entity_id"), bindparam("user_id")
+    return Statements(
+        exists=select(table.c.id).where(table.c.id == entity_id),
+        delete=sqdl(table).where(table.c.id == entity_id).returning(table.c.id),
+        posts=select(entity.post).where(post.c[entity.key] == entity_id),
+        post_insert=insert(post),
+        post_delete=sqdl(post)
+        .where(post.c.id == bindparam("post_id"))
+        .returning(post.c.id),
+        lists_public=select(entity.list).where(lst.c.view == "Public"),
+        lists_user=select(entity.list).where(lst.c.user_id == user_id),
+        list_insert=insert(lst),
+        list_delete=sqdl(lst)
+        .where(lst.c[entity.key] == entity_id, lst.c.user_id == user_id)
+        .returning(lst.c[entity.key]),
+        like_insert=insert(entity.likes.__table__),
+        search=sr.text_search(entity.model),
+    )
+
+
+# the reads behind the busiest routes, db_connection.warm_up runs them on every
+# pooled connection at startup (DB_WARMUP=1), any values will do
+def warm_up_statements(entity: Entity) -> list[tuple[Executable, dict[str, Any]]]:
+    sql = statements(entity)
+    first_page = pg.PageParams(pg.DEFAULT_PAGE_SIZE, "id", None, None)
+    ids = {"entity_id": 0}
+    return [
+        (pg.keyset(select(entity.model), entity.model, first_page), {}),
+        (sql.exists, ids),
+        (sql.posts, ids),
+        (sql.lists_user, {"user_id": ""}),
+        # LIMIT 0: prepared and planned, postgres never ranks a row
+        (sql.search, {"q": "warm up", "limit": 0, "offset": 0}),
+    ]
+
+
+# // CONTROLLER
+# the shared routes of an entity, main.py subclasses it with the entity's own
+# add/update handlers
+def controller(entity: Entity, admin: Guard) -> type[Controller]:
+    model, post_model, list_model = entity.model, entity.post, entity.list
+    name, key, upper = entity.name, entity.key, entity.name.upper()
+    sql = statements(entity)
+
+    class EntityController(Controller):
+        path = f"/{name.lower()}"
+        tags = [f"🟢   {name}s"]
+
+        @get("/", exclude_from_auth=True, cache=True, opt=cache.tags(model))
+        async def entities(
+            self, request: Request, page: pg.PageParams
+        ) -> Response[list[model]]:  # type: ignore
+            state = request.app.state
+            if st.wants_ndjson(request):
+                return st.ndjson(read_engine(state), st.table_dump(model))
+            async with transaction(state, request) as db:
+                res = await db.scalars(pg.keyset(select(model), model, page))
+            return pg.paginate(res.all(), page)
+
+        @post(
+            "/bulk",
+            guards=[admin],
+            description="Bulk import from a CSV (text/csv) or NDJSON upload",
+        )
+        async def entity_bulk(
+            self, request: Request, db: AsyncSession
+        ) -> dict[str, Any]:
+            return await bulk.load(db, request, model)
+
+        @delete(
+            "/delete/{entity_id:int}",
+            status_code=200,
+            guards=[admin],
+            media_type=MediaType.TEXT,
+        )
+        async def entity_delete(
+            self,
+            db: AsyncSession,
+            entity_id: int = Parameter(description=f"ID of {name} to delete"),
+        ) -> str:
+            if await db.scalar(sql.delete, {"entity_id": entity_id}) is None:
+                raise NotFoundException(f"⚠️ NO {upper} FOUND !!")
+            on_commit(db, rk.rankings[model].discard, entity_id)
+            await cache.invalidate(db, model, md.Academics, post_model, list_model)
+            return f"✅ DELETED {upper} SUCCESSFULLY !!"
+
+        # ------------------------------------------------------------------->   POST
+        @get(
+            ["/post/{entity_id:int}"],
+            exclude_from_auth=True,
+            cache=True,
+            opt=cache.tags(post_model),
+            description=f"Get all the posts of specific {name.lower()}",
+        )
+        async def posts(
+            self,
+            db: AsyncSession,
+            entity_id: int = Parameter(description=f"ID of {name}"),
+        ) -> list[post_model]:  # type: ignore
+            res = await db.scalars(sql.posts, {"entity_id": entity_id})
+            return res._allrows()
+
+        @get(
+            ["/post/{entity_id:int}/thread"],
+            exclude_from_auth=True,
+            cache=True,
+            opt=cache.tags(post_model),
+            description=f"Get the posts of specific {name.lower()} as a reply tree",
+        )
+        async def thread(
+            self,
+            db: AsyncSession,
+            thread: th.ThreadParams,
+            entity_id: int = Parameter(description=f"ID of {name}"),
+        ) -> Response[list[dict[str, Any]]]:
+            return await th.thread(db, post_model, entity_id, thread)
+
+        @post(["/post/{entity_id:int}/add", "/post/{entity_id:int}/{post_id:int}/add"])
+        async def post_add(
+            self,
+            data: mv.Post,
+            request: Request,
+            db: AsyncSession,
+            post_id: Optional[int] = Parameter(description="ID of comment to reply to"),
+            entity_id: int = Parameter(description=f"ID of {name} to comment on"),
+        ) -> mv.Post:
+            values = {"title": data.title, "body": data.body, key: entity_id}
+            values["user_id"] = request.user.get("user_id")
+            if post_id is not None:
+                values[entity.parent] = post_id
+            try:
+                await db.execute(sql.post_insert, values)
+            except IntegrityError as exc:
+                if mu.is_missing(exc):
+                    raise NotFoundException(f"⚠️ NO {upper} OR POST FOUND !!")
+                raise
+            await cache.invalidate(db, post_model)
+            return data
+
+        @delete(
+            "/post/{post_id:int}/delete", status_code=201, media_type=MediaType.TEXT
+        )
+        async def post_delete(
+            self,
+            db: AsyncSession,
+            post_id: int = Parameter(description="ID of Post to delete"),
+        ) -> str:
+            if await db.scalar(sql.post_delete, {"post_id": post_id}) is None:
+                raise NotFoundException("⚠️ NO POST FOUND !!")
+            await cache.invalidate(db, post_model)
+            return "✅ DELETED POST SUCCESSFULLY !!"
+
+        # ------------------------------------------------------------------->   LIST
+        @get(
+            ["/list/all"],
+            exclude_from_auth=True,
+            cache=True,
+            opt=cache.tags(list_model),
+        )
+        async def lists_all(self, db: AsyncSession) -> list[list_model]:  # type: ignore
+            res = await db.scalars(sql.lists_public)
+            return res._allrows()
+
+        @get(["/list"], opt={"db": "primary"})
+        async def lists_user(
+            self, request: Request, db: AsyncSession
+        ) -> list[list_model]:  # type: ignore
+            user_id = request.user.get("user_id")
+            res = await db.scalars(sql.lists_user, {"user_id": user_id})
+            return res._allrows()
+
+        @post(["/list/add"], media_type=MediaType.TEXT)
+        async def list_add(
+            self, data: mv.List, request: Request, db: AsyncSession
+        ) -> Any:
+            user_id = request.user.get("user_id")
+            values = {"user_id": user_id, key: data.course_id, "view": data.view.value}
+            try:
+                await db.execute(sql.list_insert, values)
+            except IntegrityError as exc:
+                if mu.is_missing(exc):
+                    raise NotFoundException(f"⚠️ NO {upper} FOUND !!")
+                return Response("⚠️ LIST ENTRY ALREADY EXISTS !!", status_code=400)
+            await cache.invalidate(db, list_model)
+            return "✅ ADDED SUCCESSFULLY !!"
+
+        @post(
+            "/list/add/batch",
+            description=f"Add several {name.lower()}s to your list at once",
+        )
+        async def list_add_batch(
+            self, data: mv.ListBatch, request: Request, db: AsyncSession
+        ) -> dict[str, Any]:
+            user_id = request.user.get("user_id")
+            return await bt.list_add(
+                db, list_model, model, user_id, data.ids, data.view.value
+            )
+
+        @delete(
+            "/list/{entity_id:int}/delete", status_code=200, media_type=MediaType.TEXT
+        )
+        async def list_delete(
+            self,
+            request: Request,
+            db: AsyncSession,
+            entity_id: int = Parameter(
+                description=f"ID of {name} in your list to delete"
+            ),
+        ) -> Any:
+            user_id = request.user.get("user_id")
+            params = {"entity_id": entity_id, "user_id": user_id}
+            if await db.scalar(sql.list_delete, params) is None:
+                # only a miss pays for the lookup that picks the message
+                if await db.scalar(sql.exists, {"entity_id": entity_id}) is None:
+                    raise NotFoundException(f"⚠️ NO {upper} FOUND !!")
+                raise NotFoundException("⚠️ NO LIST ENTRY FOUND !!")
+            await cache.invalidate(db, list_model)
+            return "✅ DELETED LIST ENTRY SUCCESSFULLY !!"
+
+        # ------------------------------------------------------------------->   LIKES
+        @post("/likes/batch", description=f"Like several {name.lower()}s at once")
+        async def likes_batch(
+            self, data: list[int], request: Request, db: AsyncSession
+        ) -> dict[str, Any]:
+            user_id = request.user.get("user_id")
+            return await bt.likes_add(db, entity.likes, model, user_id, data)
+
+        @post("/likes", media_type=MediaType.TEXT)
+        async def likes_add(
+            self,
+            request: Request,
+            db: AsyncSession,
+            entity_id: int = Parameter(query=key, description=f"ID of {name}"),
+        ) -> str | Response:
+            values = {"user_id": request.user.get("user_id"), key: entity_id}
+            try:
+                await db.execute(sql.like_insert, values)
+            except IntegrityError as exc:
+                if mu.is_missing(exc):
+                    raise NotFoundException(f"⚠️ NO {upper} FOUND !!")
+                return Response("⚠️ ALREADY LIKED !!", status_code=400)
+            lk.stage(db, model, entity_id)
+            return f"✅ LIKED {upper} {entity_id}"
+
+        @get("/likes/ranking", exclude_from_auth=True)
+        async def likes_ranking(
+            self,
+            db: AsyncSession,
+            limit: int = Parameter(
+                default=pg.DEFAULT_PAGE_SIZE, ge=1, le=pg.MAX_PAGE_SIZE
+            ),
+            offset: int = Parameter(default=0, ge=0),
+        ) -> list[model]:  # type: ignore
+            return await rk.top(db, model, limit, offset)  # type: ignore
+
+        # ------------------------------------------------------------------->   SEARCH
+        @get(
+            "/search",
+            exclude_from_auth=True,
+            cache=True,
+            opt=cache.tags(model),
+            description=entity.search,
+        )
+        async def search(
+            self,
+            db: AsyncSession,
+            q: str = Parameter(min_length=1, max_length=sr.MAX_QUERY_LENGTH),
+            limit: int = Parameter(
+                default=pg.DEFAULT_PAGE_SIZE, ge=1, le=pg.MAX_PAGE_SIZE
+            ),
+            offset: int = Parameter(default=0, ge=0),
+        ) -> list[model]:  # type: ignore
+            params = {"q": q, "limit": limit, "offset": offset}
+            res = await db.scalars(sql.search, params)
+            return list(res.all())
+
+    return EntityController
@@ -0,0 +1,134 @@
+import asyncio
+import zlib
+from typing import Any, AsyncIterator, Callable, Literal, Optional
+import brotli
+from litestar.exceptions import NotFoundException
+from litestar.response import Stream
+from sqlalchemy import Column, Select, Table, select
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.ext.asyncio import AsyncEngine
+import models as md
+import streaming as st
+
+
+# // EXPORT CONFIGURATION
+QUEUE_SIZE = 16  # COPY chunks buffered ahead of a slow client
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5  # higher levels cost far more CPU on the event loop
+
+Format = Literal["csv", "ndjson"]
+Compression = Literal["gzip", "br"]
+
+MEDIA_TYPES = {"csv": "text/csv", "ndjson": st.NDJSON}
+COMPRESSED = {
+    "gzip": ("application/gzip", ".gz"),
+    "br": ("application/x-brotli", ".br"),
+}
+HIDDEN = {md.User.__table__.c.pwd}
+
+
+# // STATEMENTS
+def tables() -> dict[str, Table]:
+    return {name.lower(): t for name, t in md.Base.metadata.tables.items()}
+
+
+def columns(table: Table) -> list[Column[Any]]:
+    return [c for c in table.columns if c not in HIDDEN and st.public(c)]
+
+
+def table_dump(name: str) -> Select:
+    table = tables().get(name.lower())
+    if table is None:
+        raise NotFoundException(f"⚠️ NO TABLE {name} !!")
+    return select(*columns(table)).order_by(*table.primary_key.columns)
+
+
+def _sql(stmt: Select) -> str:
+    # COPY takes no bind parameters, values (ints from the path/query) are inlined
+    dialect = postgresql.dialect()
+    return str(stmt.compile(dialect=dialect, compile_kwargs={"literal_binds": True}))
+
+
+# // COPY STREAM
+# asyncpg hands COPY data to a callback, a bounded queue turns it into an
+# async iterator and stops reading from the socket while the client lags behind
+async def _copy_chunks(
+    engine: AsyncEngine, stmt: Select, format: Format
+) -> AsyncIterator[bytes]:
+    sql = _sql(stmt)
+    options: dict[str, Any] = {"format": "csv", "header": True}
+    if format == "ndjson":
+        # one json value per row, quote/delimiter bytes never appear in json text
+        # so csv mode writes it out untouched
+        sql = f"SELECT row_to_json(t) FROM ({sql}) t"
+        options = {"format": "csv", "quote": "\x01", "delimiter": "\x02"}
+    queue: asyncio.Queue[Any] = asyncio.Queue(QUEUE_SIZE)
+
+    async with engine.connect() as conn:
+        raw = (await conn.get_raw_connection()).driver_connection
+
+        async def sink(data: bytearray) -> None:
+            await queue.put(bytes(data))
+
+        async def copy() -> None:
+            try:
+                # one read-only snapshot: only ACCESS SHARE locks, writers go on
+                async with raw.transaction(isolation="repeatable_read", readonly=True):
+                    await raw.copy_from_query(sql, output=sink, **options)
+            except Exception as e:
+                await queue.put(e)
+            else:
+                await queue.put(None)
+
+        task = asyncio.create_task(copy())
+        try:
+            while (chunk := await queue.get()) is not None:
+                if isinstance(chunk, Exception):
+                    raise chunk
+                yield chunk
+        finally:
+            if not task.done():
+                # client went away mid-COPY, the connection can't be reused
+                task.cancel()
+                await asyncio.gather(task, return_exceptions=True)
+                await conn.invalidate()
+
+
+def _compressor(
+    compress: Compression,
+) -> tuple[Callable[[bytes], bytes], Callable[[], bytes]]:
+    if compress == "gzip":
+        z = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 31)  # 31: gzip container
+        return z.compress, z.flush
+    b = brotli.Compressor(quality=BROTLI_QUALITY)
+    return b.process, b.finish
+
+
+async def _compressed(
+    chunks: AsyncIterator[bytes], compress: Compression
+) -> AsyncIterator[bytes]:
+    process, finish = _compressor(compress)
+    async for chunk in chunks:
+        if data := process(chunk):
+            yield data
+    yield finish()
+
+
+def copy_stream(
+    engine: AsyncEngine,
+    stmt: Select,
+    name: str,
+    format: Format = "csv",
+    compress: Optional[Compression] = None,
+) -> Stream:
+    chunks = _copy_chunks(engine, stmt, format)
+    media_type, filename = MEDIA_TYPES[format], f"{name}.{format}"
+    if compress is not None:
+        chunks = _compressed(chunks, compress)
+        media_type, extension = COMPRESSED[compress]
+        filename += extension
+    return Stream(
+        chunks,
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
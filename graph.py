@@ -0,0 +1,333 @@
+import asyncio
+import json
+import logging
+import heapq
+import sys
+from array import array
+from bisect import bisect_left
+from typing import Any, Iterable, Literal, Optional
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncEngine, AsyncSession
+import cache
+import models as md, models_validation as mv  # noqa: E401
+import pubsub
+import streaming as st
+
+
+# // GRAPH CONFIGURATION
+CHANNEL = "academics_graph"
+COMPACT_AT = 1024  # delta entries folded back into the arrays
+RELOAD_DELAY = 0.5  # seconds, a burst of invalidations causes one reload
+CHUNK_SIZE = 10000
+
+logger = logging.getLogger(__name__)
+
+# (id, course_id, college_id, exam_id, course_fee, cutoff_rank)
+Row = tuple[int, int, int, int, float, int]
+COLUMNS = ("id", "course_id", "college_id", "exam_id", "course_fee", "cutoff_rank")
+TYPECODES = ("i", "i", "i", "i", "d", "i")
+MAX_PREDICTIONS = 100
+PredictSort = Literal["college_rank", "fee"]
+
+
+# // SNAPSHOT
+# columnar copy of Academics sorted by id, plus CSR indexes: the rows of course
+# `c` are positions by_course[course_offsets[c]:course_offsets[c + 1]], ordered
+# by fee, and the rows of an exam are ordered by cutoff rank
+class Snapshot:
+    def __init__(self) -> None:
+        self.columns = [array(t) for t in TYPECODES]
+        self.by_course, self.course_offsets = array("i"), array("i")
+        self.by_exam, self.exam_offsets = array("i"), array("i")
+
+    def __len__(self) -> int:
+        return len(self.columns[0])
+
+    def append(self, rows: Iterable[Row]) -> None:
+        for row in rows:
+            for column, value in zip(self.columns, row):
+                column.append(value)
+
+    def row(self, i: int) -> Row:
+        return tuple(c[i] for c in self.columns)  # type: ignore
+
+    def has(self, academics_id: int) -> bool:
+        ids = self.columns[0]
+        i = bisect_left(ids, academics_id)
+        return i < len(ids) and ids[i] == academics_id
+
+    def index(self) -> "Snapshot":
+        _, course, _, exam, fee, cutoff = self.columns
+        self.by_course, self.course_offsets = _csr(course, fee)
+        self.by_exam, self.exam_offsets = _csr(exam, cutoff)
+        return self
+
+    def positions(self, key: str, value: int) -> array:
+        order, offsets = (
+            (self.by_course, self.course_offsets)
+            if key == "course"
+            else (self.by_exam, self.exam_offsets)
+        )
+        if not 0 <= value < len(offsets) - 1:
+            return array("i")
+        return order[offsets[value] : offsets[value + 1]]
+
+    def eligible(self, exam_id: int, rank: int) -> array:
+        # rows of the exam are sorted by cutoff: one binary search, then a slice
+        if not 0 <= exam_id < len(self.exam_offsets) - 1:
+            return array("i")
+        a, b = self.exam_offsets[exam_id], self.exam_offsets[exam_id + 1]
+        cutoff = self.columns[5]
+        start = bisect_left(self.by_exam, rank, a, b, key=cutoff.__getitem__)
+        return self.by_exam[start:b]
+
+    def nbytes(self) -> int:
+        arrays = [*self.columns, self.by_course, self.course_offsets]
+        arrays += [self.by_exam, self.exam_offsets]
+        return sum(a.itemsize * len(a) for a in arrays)
+
+
+def _csr(keys: array, sort_by: Optional[array] = None) -> tuple[array, array]:
+    offsets = array("i", bytes(4 * (max(keys, default=-1) + 2)))
+    for k in keys:
+        offsets[k + 1] += 1
+    for k in range(1, len(offsets)):
+        offsets[k] += offsets[k - 1]
+    order, slot = array("i", bytes(4 * len(keys))), offsets[:-1]
+    for i, k in enumerate(keys):
+        order[slot[k]] = i
+        slot[k] += 1
+    if sort_by is not None:
+        for k in range(len(offsets) - 1):
+            a, b = offsets[k], offsets[k + 1]
+            if b - a > 1:
+                order[a:b] = array("i", sorted(order[a:b], key=sort_by.__getitem__))
+    return order, offsets
+
+
+def _compacted(base: Snapshot, pending: list[Row], removed: set[int]) -> Snapshot:
+    ids = base.columns[0]
+    rows = [base.row(i) for i in range(len(base)) if ids[i] not in removed]
+    rows += [r for r in pending if r[0] not in removed]
+    rows.sort()
+    snapshot = Snapshot()
+    snapshot.append(rows)
+    return snapshot.index()
+
+
+# // GRAPH
+# the snapshot is immutable once indexed, adds/deletes land in a small delta
+# (pending rows, removed ids) that is folded in by a rebuild off the arrays
+class AcademicsGraph:
+    def __init__(self) -> None:
+        self.snapshot = Snapshot()
+        self.pending: list[Row] = []
+        self.removed: set[int] = set()
+        self.colleges: dict[int, md.College] = {}
+        self.courses: dict[int, md.Course] = {}
+        self.engine: Optional[AsyncEngine] = None
+        self._dirty: set[str] = set()
+        self._task: Optional[asyncio.Task[None]] = None
+
+    # ------> DELTA
+    def add(self, row: Row) -> None:
+        if not self.snapshot.has(row[0]) and all(r[0] != row[0] for r in self.pending):
+            self.pending.append(row)
+        self._maybe_compact()
+
+    def remove(self, academics_id: int) -> None:
+        self.removed.add(academics_id)
+        self._maybe_compact()
+
+    def _maybe_compact(self) -> None:
+        if len(self.pending) + len(self.removed) >= COMPACT_AT:
+            self.schedule("compact")
+
+    def _swap(self, snapshot: Snapshot) -> None:
+        # keeps the delta that arrived while `snapshot` was being built
+        self.snapshot = snapshot
+        self.pending = [
+            r
+            for r in self.pending
+            if not snapshot.has(r[0]) and r[0] not in self.removed
+        ]
+        self.removed = {i for i in self.removed if snapshot.has(i)}
+
+    def _rows(self, key: str, value: int) -> list[Row]:
+        snapshot, removed = self.snapshot, self.removed
+        rows = [snapshot.row(i) for i in snapshot.positions(key, value)]
+        column = 1 if key == "course" else 3
+        rows += [r for r in self.pending if r[column] == value]
+        return [r for r in rows if r[0] not in removed]
+
+    # ------> LOADING
+    async def load(self, conn: AsyncConnection) -> None:
+        snapshot = Snapshot()
+        table = md.Academics.__table__
+        stmt = select(*(table.c[c] for c in COLUMNS)).order_by(table.c.id)
+        result = await conn.stream(stmt.execution_options(yield_per=CHUNK_SIZE))
+        async for part in result.partitions(CHUNK_SIZE):
+            snapshot.append(part)  # type: ignore
+        self._swap(await asyncio.to_thread(snapshot.index))
+
+    async def load_catalog(self, conn: AsyncConnection) -> None:
+        res = await conn.execute(select(*st.columns(md.College)))
+        self.colleges = {r.id: md.College(**r._asdict()) for r in res}
+        res = await conn.execute(select(*st.columns(md.Course)))
+        self.courses = {r.id: md.Course(**r._asdict()) for r in res}
+
+    async def compact(self) -> None:
+        pending, removed = list(self.pending), set(self.removed)
+        snapshot = await asyncio.to_thread(_compacted, self.snapshot, pending, removed)
+        self._swap(snapshot)
+
+    def schedule(self, *what: str) -> None:
+        self._dirty.update(what)
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._sync())
+
+    async def _sync(self) -> None:
+        while self._dirty:
+            await asyncio.sleep(RELOAD_DELAY)
+            dirty, self._dirty = self._dirty, set()
+            try:
+                if "academics" in dirty or "catalog" in dirty:
+                    async with self.engine.connect() as conn:  # type: ignore
+                        if "catalog" in dirty:
+                            await self.load_catalog(conn)
+                        if "academics" in dirty:
+                            await self.load(conn)
+                if "compact" in dirty and "academics" not in dirty:
+                    await self.compact()
+            except Exception:
+                logger.exception("academics graph reload failed, retrying")
+                self._dirty |= dirty
+                continue
+            # responses built from the old snapshot must not outlive it
+            cache.bump([md.Academics.__tablename__])
+
+    def close(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+
+    # ------> QUERIES
+    def _eligible(self, exam_id: int, rank: int) -> list[Row]:
+        snapshot, removed = self.snapshot, self.removed
+        rows = [snapshot.row(i) for i in snapshot.eligible(exam_id, rank)]
+        rows += [r for r in self.pending if r[3] == exam_id and r[5] >= rank]
+        return [r for r in rows if r[0] not in removed]
+
+    def colleges_from_course(self, course_id: int) -> list[md.College]:
+        rows = self._rows("course", course_id)
+        return [self.colleges[r[2]] for r in rows if r[2] in self.colleges]
+
+    def academics_from_exam(self, exam_id: int) -> list[dict[str, Any]]:
+        return [
+            {
+                "College_id": r[2],
+                "College": self.colleges[r[2]].name,
+                "Course_id": r[1],
+                "Course": self.courses[r[1]].name,
+            }
+            for r in self._rows("exam", exam_id)
+            if r[2] in self.colleges and r[1] in self.courses
+        ]
+
+    def fees_from_course(self, course_id: int) -> list[dict[str, Any]]:
+        rows = sorted(self._rows("course", course_id), key=lambda r: (r[4], r[0]))
+        return [
+            {"College": self.colleges[r[2]].name, "Fee": r[4]}
+            for r in rows
+            if r[2] in self.colleges
+        ]
+
+    def predict(
+        self, query: mv.PredictQuery, sort: PredictSort, limit: int
+    ) -> dict[str, Any]:
+        matches = []
+        for r in self._eligible(query.exam_id, query.rank):
+            college, course = self.colleges.get(r[2]), self.courses.get(r[1])
+            if college is None or course is None:
+                continue
+            if query.max_fee is not None and r[4] > query.max_fee:
+                continue
+            if query.course_type is not None and course.type != query.course_type.value:
+                continue
+            if query.state is not None and college.state != query.state:
+                continue
+            matches.append((r, college, course))
+
+        def key(match: tuple[Row, md.College, md.Course]) -> tuple[Any, ...]:
+            r, college = match[0], match[1]
+            if sort == "fee":
+                return (r[4], r[0])
+            # unranked colleges last
+            return (college.rank is None, college.rank or 0, r[0])
+
+        return {
+            "exam_id": query.exam_id,
+            "rank": query.rank,
+            "eligible": len(matches),
+            "results": [
+                {
+                    "academics_id": r[0],
+                    "course_id": r[1],
+                    "course": course.name,
+                    "course_type": course.type,
+                    "college_id": r[2],
+                    "college": college.name,
+                    "college_rank": college.rank,
+                    "state": college.state,
+                    "course_fee": r[4],
+                    "cutoff_rank": r[5],
+                }
+                for r, college, course in heapq.nsmallest(limit, matches, key=key)
+            ],
+        }
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "rows": len(self.snapshot),
+            "pending": len(self.pending),
+            "removed": len(self.removed),
+            "colleges": len(self.colleges),
+            "courses": len(self.courses),
+            "array_bytes": self.snapshot.nbytes(),
+            "delta_bytes": sys.getsizeof(self.pending) + sys.getsizeof(self.removed),
+        }
+
+
+graph = AcademicsGraph()
+
+
+# // WRITES (NOTIFY is delivered on commit, to every worker including this one)
+async def added(db: AsyncSession, academics_id: int, data: mv.Academics) -> None:
+    row = [academics_id, data.course_id, data.college_id, data.exam_id]
+    row += [data.course_fee, data.cutoff_rank]
+    await pubsub.publish(db, CHANNEL, json.dumps(["add", row]))
+
+
+async def deleted(db: AsyncSession, academics_id: int) -> None:
+    await pubsub.publish(db, CHANNEL, json.dumps(["delete", academics_id]))
+
+
+def _on_delta(payload: str) -> None:
+    op, arg = json.loads(payload)
+    if op == "add":
+        graph.add(tuple(arg))  # type: ignore
+    else:
+        graph.remove(arg)
+    cache.bump([md.Academics.__tablename__])
+
+
+# any other write to these tables (cascades, bulk imports, renames) reloads
+def _on_invalidate(payload: str) -> None:
+    names = payload.split(",")
+    if md.Academics.__tablename__ in names:
+        graph.schedule("academics")
+    if md.College.__tablename__ in names or md.Course.__tablename__ in names:
+        graph.schedule("catalog")
+
+
+pubsub.subscribe(CHANNEL, _on_delta, lambda: graph.schedule("academics", "catalog"))
+pubsub.subscribe(cache.CHANNEL, _on_invalidate)
@@ -0,0 +1,54 @@
+import asyncio
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable
+from litestar.exceptions import ServiceUnavailableException
+from passlib.hash import pbkdf2_sha256 as securepwd
+
+
+# // HASHING CONFIGURATION
+HASH_WORKERS = int(os.environ.get("HASH_WORKERS", 2))
+HASH_QUEUE_LIMIT = int(os.environ.get("HASH_QUEUE_LIMIT", 32))  # waiting jobs, then 503
+RETRY_AFTER = 1
+
+
+# // HASHING POOL
+# pbkdf2 releases the GIL inside hashlib, so a few threads keep the event loop free
+class HashPool:
+    def __init__(self, workers: int, queue_limit: int) -> None:
+        self.workers = workers
+        self.queue_limit = queue_limit
+        self.inflight = 0
+        self.executor: ThreadPoolExecutor | None = None
+
+    async def _run(self, fn: Callable[..., Any], *args: Any) -> Any:
+        if self.inflight >= self.workers + self.queue_limit:
+            raise ServiceUnavailableException(
+                "⚠️ SERVER BUSY, TRY AGAIN",
+                headers={"Retry-After": str(RETRY_AFTER)},
+            )
+        if self.executor is None:
+            self.executor = ThreadPoolExecutor(
+                self.workers, thread_name_prefix="pwdhash"
+            )
+        self.inflight += 1
+        try:
+            return await asyncio.get_running_loop().run_in_executor(
+                self.executor, fn, *args
+            )
+        finally:
+            self.inflight -= 1
+
+    async def hash(self, pwd: str) -> str:
+        return await self._run(securepwd.hash, pwd)
+
+    async def verify(self, pwd: str, hashed: str) -> bool:
+        return await self._run(securepwd.verify, pwd, hashed)
+
+    def shutdown(self) -> None:
+        if self.executor is not None:
+            self.executor.shutdown(wait=True)
+            self.executor = None
+
+
+pool = HashPool(HASH_WORKERS, HASH_QUEUE_LIMIT)
@@ -0,0 +1,119 @@
+import asyncio
+import logging
+from collections import Counter
+from sqlalchemy import Integer, any_, bindparam, func, select, update
+from sqlalchemy.dialects.postgresql import ARRAY
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncEngine, AsyncSession
+from commit_hooks import on_commit
+import models as md
+import ranking as rk
+
+
+# // LIKES CONFIGURATION
+FLUSH_INTERVAL = 2.0  # seconds between two flushes of the aggregated counters
+
+logger = logging.getLogger(__name__)
+
+
+# // WRITE-BEHIND COUNTER
+# the likes rows each parent's `likes` column counts
+LIKES = {
+    md.Course: md.CourseLikes.course_id,
+    md.College: md.CollegeLikes.college_id,
+    md.Exam: md.ExamLikes.exam_id,
+}
+
+
+# the flushed deltas are added to `likes`: a flush costs the same for the most
+# liked entity as for any other. The rows are locked first, sorted, so two
+# workers' flushes can't deadlock. FOR NO KEY UPDATE, the lock the UPDATE takes
+# anyway: it doesn't conflict with the FOR KEY SHARE the FK check of every
+# concurrent like INSERT takes on the row
+async def apply(
+    conn: AsyncConnection, model: type[md.Base], deltas: Counter[int]
+) -> None:
+    table = model.__table__
+    ids, ns = (list(c) for c in zip(*sorted(deltas.items())))
+    # array parameters, the same prepared statements for any number of ids
+    ids_param = bindparam("ids", ids, type_=ARRAY(Integer))
+    await conn.execute(
+        select(table.c.id)
+        .where(table.c.id == any_(ids_param))
+        .order_by(table.c.id)
+        .with_for_update(key_share=True)
+    )
+    rows = func.unnest(ids_param, bindparam("ns", ns, type_=ARRAY(Integer)))
+    rows = rows.table_valued("id", "n").render_derived()
+    await conn.execute(
+        update(table)
+        .where(table.c.id == rows.c.id)
+        .values(likes=table.c.likes + rows.c.n)
+    )
+
+
+# likes rows are inserted right away, only the parent's `likes` column is batched
+class LikeCounter:
+    def __init__(self) -> None:
+        self.deltas: dict[type[md.Base], Counter[int]] = {}
+
+    def add(self, model: type[md.Base], entity_id: int, n: int = 1) -> None:
+        self.deltas.setdefault(model, Counter())[entity_id] += n
+
+    def pending(self, model: type[md.Base], entity_id: int) -> int:
+        return self.deltas.get(model, Counter())[entity_id]
+
+    def unflushed(self) -> dict[str, dict[int, int]]:
+        return {m.__tablename__: dict(c) for m, c in self.deltas.items() if c}
+
+    async def flush(self, engine: AsyncEngine) -> None:
+        deltas, self.deltas = self.deltas, {}
+        if not deltas:
+            return
+        try:
+            async with engine.begin() as conn:
+                for model, counts in deltas.items():
+                    await apply(conn, model, counts)
+        except Exception:
+            for model, counts in deltas.items():
+                self.deltas.setdefault(model, Counter()).update(counts)
+            raise
+
+
+counter = LikeCounter()
+
+
+# deltas are lost when a worker dies before its flush, and likes rows deleted
+# through ON DELETE CASCADE (a deleted user) are never subtracted: sets `likes`
+# back to its rows' count wherever it drifted. A repair run by
+# `python manage.py reconcile-likes` while the API is stopped, a running
+# worker's unflushed deltas would be added on top of the recount
+async def reconcile(conn: AsyncConnection) -> dict[str, int]:
+    repaired = {}
+    for model, key in LIKES.items():
+        table = model.__table__
+        n = select(func.count()).where(key == table.c.id).scalar_subquery()
+        res = await conn.execute(
+            update(table).where(table.c.likes != n).values(likes=n)
+        )
+        repaired[table.name] = res.rowcount
+    return repaired
+
+
+async def flush_periodically(engine: AsyncEngine) -> None:
+    while True:
+        await asyncio.sleep(FLUSH_INTERVAL)
+        try:
+            await counter.flush(engine)
+        except Exception:
+            logger.exception("likes flush failed, retrying on the next tick")
+
+
+# // TRANSACTION HOOKS
+def _liked(model: type[md.Base], entity_id: int) -> None:
+    counter.add(model, entity_id)
+    rk.rankings[model].bump(entity_id)
+
+
+# a like only reaches the counter once the transaction that inserted it commits
+def stage(db: AsyncSession, model: type[md.Base], entity_id: int) -> None:
+    on_commit(db, _liked, model, entity_id)
@@ -0,0 +1,249 @@
+import itertools
+import logging
+import os
+import queue
+import secrets
+import sys
+import threading
+import time
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from logging.handlers import QueueHandler
+from typing import Any, AsyncIterator, Optional, TextIO
+from litestar import Litestar
+from litestar.types import Scope
+from pythonjsonlogger import jsonlogger
+import orjson
+
+
+# // LOGGING CONFIGURATION
+LOG_LEVEL = os.environ.get("LOG_LEVEL", "INFO")
+# one line per request costs the event loop about 5 us (python -m benchmark.metrics)
+ACCESS_LOG = os.environ.get("ACCESS_LOG", "0") == "1"
+QUEUE_SIZE = 10000  # records waiting for the writer, past that they are dropped
+BATCH_SIZE = 500  # records per write() call
+REQUEST_ID_HEADER = "X-Request-ID"
+MAX_REQUEST_ID_LENGTH = 64
+
+FORMAT = "%(asctime)s %(levelname)s %(name)s %(message)s"
+
+logger = logging.getLogger(__name__)
+access_logger = logging.getLogger("access")
+
+request_id: ContextVar[Optional[str]] = ContextVar("request_id", default=None)
+
+# unique per worker and cheap: a random prefix and a counter, no urandom per request
+_PREFIX = secrets.token_hex(4) + "-"
+_sequence = itertools.count(1)
+
+
+# // REQUEST ID
+# a caller's id (a proxy or another service) is kept so its logs line up with ours
+def begin(scope: Scope) -> str:
+    rid = None
+    for key, value in scope["headers"]:
+        if key == b"x-request-id":
+            rid = value.decode("latin-1")[:MAX_REQUEST_ID_LENGTH]
+            break
+    rid = rid or f"{_PREFIX}{next(_sequence):x}"
+    # never reset: each request runs in its own task, and the app's exception
+    # handler (outside the middleware for auth errors) still needs it
+    request_id.set(rid)
+    return rid
+
+
+def access(
+    route: str,
+    status: int,
+    latency: float,
+    db_time: float,
+    queries: int,
+    scope: Scope,
+) -> None:
+    if not ACCESS_LOG or not access_logger.isEnabledFor(logging.INFO):
+        return
+    user = scope.get("user")
+    # one line per request: a plain tuple on the queue, no LogRecord, the
+    # writer thread builds the line (see Writer.access_line)
+    pipeline.put(
+        (
+            time.time(),
+            route,
+            status,
+            latency,
+            db_time,
+            queries,
+            user.get("user_id") if isinstance(user, dict) else None,
+            request_id.get(),
+        )
+    )
+
+
+# errors the app turns into a 5xx, with the traceback and the request id; a 503
+# is load shed on purpose and counted in /metrics, one line each would add load
+async def log_exception(exc: Exception, scope: Scope) -> None:
+    status = getattr(exc, "status_code", 500)
+    if status >= 500 and status != 503:
+        logger.error(
+            "%s %s failed: %r",
+            scope.get("method", ""),
+            scope.get("path", ""),
+            exc,
+            exc_info=exc,
+        )
+
+
+# // QUEUE
+# the calling thread (usually the event loop) only stamps the record and puts
+# it on a bounded queue, formatting and the blocking write happen in `Writer`
+class DroppingQueueHandler(QueueHandler):
+    def __init__(self, records: "queue.SimpleQueue[Any]") -> None:
+        super().__init__(records)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # args may be mutated after the call returns, the message may not
+        record.msg = record.getMessage()
+        record.args = None
+        record.request_id = request_id.get()
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        # SimpleQueue: a C put without the Condition locks of queue.Queue, bounded here
+        if self.queue.qsize() >= QUEUE_SIZE:
+            self.dropped += 1
+        else:
+            self.queue.put(record)
+
+
+def _dumps(record: dict[str, Any], default: Any = None, **_: Any) -> str:
+    return orjson.dumps(record, default=default or str).decode()
+
+
+class Writer(threading.Thread):
+    def __init__(
+        self,
+        records: "queue.SimpleQueue[Any]",
+        handler: DroppingQueueHandler,
+        out: TextIO,
+    ) -> None:
+        super().__init__(name="log-writer", daemon=True)
+        self.records = records
+        self.handler = handler
+        self.out = out
+        self.formatter = jsonlogger.JsonFormatter(FORMAT, json_serializer=_dumps)
+        self.written = 0
+        self.reported = 0  # drops already written as a warning
+        self.second = -1
+        self.asctime = ""
+
+    def run(self) -> None:
+        while True:
+            batch = [self.records.get()]
+            while len(batch) < BATCH_SIZE:
+                try:
+                    batch.append(self.records.get_nowait())
+                except queue.Empty:
+                    break
+            stop = None in batch
+            self.write([r for r in batch if r is not None])
+            if stop:
+                return
+
+    # the same fields and order as a formatted "access" record; the date part
+    # of asctime only changes once a second
+    def access_line(self, entry: tuple[Any, ...]) -> str:
+        created, route, status, latency, db_time, queries, user_id, rid = entry
+        second = int(created)
+        if second != self.second:
+            self.second = second
+            self.asctime = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(second))
+        line = {
+            "asctime": f"{self.asctime},{int(created % 1 * 1000):03d}",
+            "levelname": "INFO",
+            "name": "access",
+            "message": "request",
+            "route": route,
+            "status": status,
+            "latency_ms": int(latency * 1e6) / 1000,
+            "db_ms": int(db_time * 1e6) / 1000,
+            "queries": queries,
+            "user_id": user_id,
+            "request_id": rid,
+        }
+        return orjson.dumps(line, default=str).decode()
+
+    def write(self, batch: list[Any]) -> None:
+        lines = []
+        for record in batch:
+            try:
+                if isinstance(record, tuple):
+                    lines.append(self.access_line(record))
+                else:
+                    lines.append(self.formatter.format(record))
+            except Exception:
+                if isinstance(record, logging.LogRecord):
+                    self.handler.handleError(record)
+        dropped = self.handler.dropped - self.reported
+        if dropped:
+            self.reported += dropped
+            warning = logging.makeLogRecord(
+                {"name": __name__, "levelno": logging.WARNING, "levelname": "WARNING"}
+            )
+            warning.msg = f"log queue full, dropped {dropped} records"
+            lines.append(self.formatter.format(warning))
+        if lines:
+            try:
+                self.out.write("\n".join(lines) + "\n")
+                self.out.flush()
+            except Exception:
+                pass  # nowhere left to report it
+        self.written += len(lines)
+
+
+class Pipeline:
+    def __init__(self) -> None:
+        self.records: "queue.SimpleQueue[Any]" = queue.SimpleQueue()
+        self.handler = DroppingQueueHandler(self.records)
+        self.writer: Optional[Writer] = None
+
+    def start(self, out: TextIO = sys.stdout) -> None:
+        # fields FORMAT never prints, each one costs a lookup per record
+        logging._srcfile = None  # type: ignore  # caller's file and line
+        logging.logThreads = False
+        logging.logProcesses = False
+        logging.logMultiprocessing = False
+        root = logging.getLogger()
+        root.setLevel(LOG_LEVEL)
+        root.addHandler(self.handler)
+        self.writer = Writer(self.records, self.handler, out)
+        self.writer.start()
+
+    # bounded like DroppingQueueHandler.enqueue, nothing is queued before start()
+    def put(self, entry: tuple[Any, ...]) -> None:
+        if self.writer is None:
+            return
+        if self.records.qsize() >= QUEUE_SIZE:
+            self.handler.dropped += 1
+        else:
+            self.records.put(entry)
+
+    def stop(self) -> None:
+        logging.getLogger().removeHandler(self.handler)
+        if self.writer is not None:
+            self.records.put(None)
+            self.writer.join(timeout=5)
+            self.writer = None
+
+
+pipeline = Pipeline()
+
+
+# // LIFESPAN
+@asynccontextmanager
+async def logging_pipeline(app: Litestar) -> AsyncIterator[None]:
+    pipeline.start()
+    try:
+        yield
+    finally:
+        pipeline.stop()
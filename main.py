@@ -1,8 +1,26 @@
+import logging
 from pydantic import validate_email
 from pydantic_core import PydanticCustomError
-from db_connenction import db_connection, provide_transaction
+from db_connenction import db_connection, provide_transaction, read_engine, transaction
+import db_connenction as dc
+from commit_hooks import on_commit
 from sqlalchemy.ext.asyncio import AsyncSession
 import models as md, models_validation as mv  # noqa: E401
+import bulk
+import entities as en
+import cache
+import export as ex
+import graph as gr
+import admission
+import hashing
+import logs
+import metrics as mt
+import pagination as pg
+import ranking as rk
+import search as sr
+import sqltrace
+import streaming as st
+import threads as th
 from litestar import (
     Litestar,
     MediaType,
@@ -14,28 +32,33 @@ from litestar import (
     delete,
     Controller,
 )
-from typing import Annotated, Any, Optional, Sequence
+from contextlib import asynccontextmanager
+from dataclasses import asdict
+from typing import Annotated, Any, AsyncIterator, Optional
 from litestar.contrib.sqlalchemy.plugins import SQLAlchemySerializationPlugin
-from sqlalchemy import desc, select, insert, update, delete as sqdl
+from sqlalchemy import Select, select, insert, update, delete as sqdl
 from litestar.openapi import OpenAPIConfig
+from litestar.response import Stream
 from litestar.params import Parameter, Body
 from litestar.exceptions import (
     NotAuthorizedException,
     ValidationException,
     NotFoundException,
+    ServiceUnavailableException,
 )
 from litestar.handlers import BaseRouteHandler
 from litestar.di import Provide
-from sqlalchemy.exc import NoResultFound, IntegrityError
-from passlib.hash import pbkdf2_sha256 as securepwd
+from sqlalchemy.exc import IntegrityError
 from jwt_authentication import jwt_cookie_auth
 from litestar.connection import ASGIConnection
 
 
+logger = logging.getLogger(__name__)
+
+
 # -----------------------------------------------------------------------------> GUARD
 async def check_admin(connection: ASGIConnection, _: BaseRouteHandler) -> Any:
-    print("CHECK  ADMIN ............................\n\n\n")
-    # print(connection.user)
+    logger.debug("admin check for %s", connection.user.get("user_id"))
     if not connection.user.get("admin"):
         raise NotAuthorizedException("⚠️ NOT ALLOWED")
 
@@ -55,7 +78,7 @@ class usercontroller(Controller):
 
     dependencies = {"check_user_dep1": Provide(check_user, True)}
 
-    @post("/login", media_type=MediaType.TEXT)
+    @post("/login", media_type=MediaType.TEXT, opt={"admission": "hash"})
     async def login(
         self, request: Request, data: mv.UserLogin, db: AsyncSession
     ) -> Any:
@@ -69,7 +92,7 @@ class usercontroller(Controller):
         res = await db.scalar(stmt)
         if res is None:
             raise NotFoundException("⚠️ NO USER FOUND !!")
-        if not securepwd.verify(data.pwd, res.pwd):
+        if not await hashing.pool.verify(data.pwd, res.pwd):
             raise ValidationException("⚠️ Incorrect Password !!")
         return jwt_cookie_auth.login(
             response_media_type=MediaType.TEXT,
@@ -94,7 +117,12 @@ class usercontroller(Controller):
         res = await db.scalars(select(md.User))
         return res._allrows()
 
-    @post("/register", exclude_from_auth=True, media_type=MediaType.TEXT)
+    @post(
+        "/register",
+        exclude_from_auth=True,
+        media_type=MediaType.TEXT,
+        opt={"admission": "hash"},
+    )
     async def register(self, data: mv.User, db: AsyncSession, request: Request) -> Any:
         try:
             validate_email(data.email)
@@ -106,7 +134,7 @@ class usercontroller(Controller):
             name=data.name,
             username=data.username,
             email=data.email,
-            pwd=securepwd.hash(data.pwd),
+            pwd=await hashing.pool.hash(data.pwd),
         )
         try:
             await db.execute(stmt)
@@ -124,31 +152,37 @@ class usercontroller(Controller):
     ) -> str:
         user_id = check_user_dep1
         # print(user_id)
-        stmt = select(md.User).where(
-            (md.User.email == user_id) | (md.User.username == user_id)
+        stmt = (
+            sqdl(md.User)
+            .where((md.User.email == user_id) | (md.User.username == user_id))
+            .returning(md.User.username)
         )
-        res = await db.scalar(stmt)
-        if res is None:
+        if await db.scalar(stmt) is None:
             raise NotFoundException("⚠️ NO USER FOUND !!")
-        await db.delete(res)
+        await cache.invalidate(
+            db,
+            md.CoursePost,
+            md.CollegePost,
+            md.ExamPost,
+            md.CourseList,
+            md.CollegeList,
+            md.ExamList,
+        )
         return "✅ DELETED USER SUCCESSFULLY !!"
 
 
 # ..........................................................................................     COURSE CONTROLLER 🔰
 
-# ------------------------------------------------------------------->   COURSE 🟢
-
-
-class coursecontroller(Controller):
-    path = "/course"
-    tags = ["🟢   Courses"]
+COURSE = en.Entity(
+    md.Course,
+    md.CoursePost,
+    md.CourseList,
+    md.CourseLikes,
+    search="Ranked full-text search by name & eligibility, typo tolerant",
+)
 
-    @get("/", exclude_from_auth=True)
-    async def courses(self, db: AsyncSession) -> list[md.Course]:
-        res = await db.scalars(select(md.Course))
-        ans = res._allrows()
-        return ans
 
+class coursecontroller(en.controller(COURSE, check_admin)):  # type: ignore
     @post("/add", guards=[check_admin], media_type=MediaType.TEXT)
     async def course_add(self, data: mv.Course, db: AsyncSession) -> Any:
         try:
@@ -164,9 +198,11 @@ class coursecontroller(Controller):
             elig=data.elig,
         )
         try:
-            await db.execute(stmt)
+            course_id = await db.scalar(stmt.returning(md.Course.id))
         except Exception:
             return Response("⚠️ COURSE ALREADY EXISTS !!", status_code=400)
+        on_commit(db, rk.rankings[md.Course].add, course_id)
+        await cache.invalidate(db, md.Course)
         return "✅ ADDED SUCCESSFULLY !!"
 
     @patch("/update/{course_id:int}", guards=[check_admin], media_type=MediaType.TEXT)
@@ -181,204 +217,27 @@ class coursecontroller(Controller):
     ) -> Any:
         stmt = update(md.Course).where(md.Course.id == course_id).values(**data)
         try:
-            await db.execute(stmt)
+            updated = await db.scalar(stmt.returning(md.Course.id))
         except Exception:
+            updated = None
+        if updated is None:
             return Response("⚠️ NO COURSE WITH THIS ID EXISTS !!", status_code=404)
+        await cache.invalidate(db, md.Course)
         return "✅ UPDATED SUCCESSFULLY !!"
 
-    @delete(
-        "/delete/{course_id:int}",
-        status_code=200,
-        guards=[check_admin],
-        media_type=MediaType.TEXT,
-    )
-    async def course_delete(
-        self,
-        course_id: Annotated[int, Parameter(description="ID of Course to delete")],
-        db: AsyncSession,
-    ) -> str | Response:
-        stmt = select(md.Course).where(md.Course.id == course_id)
-        res = await db.scalar(stmt)
-        if res is None:
-            return Response("⚠️ NO COURSE FOUND !!", status_code=404)
-        await db.delete(res)
-        return "✅ DELETED COURSE SUCCESSFULLY !!"
-
-    # ------------------------------------------------------------------->   COURSEPOST 🟢
-
-    @get(
-        ["/post/{course_id:int}"],
-        exclude_from_auth=True,
-        description="Get all the posts of specific course ",
-    )
-    async def posts(
-        self,
-        db: AsyncSession,
-        course_id: int = Parameter(description="ID of Course"),
-    ) -> list[md.CoursePost]:
-        res = await db.scalars(
-            select(md.CoursePost).where(md.CoursePost.course_id == course_id)
-        )
-        ans = res._allrows()
-        return ans
-
-    @post(
-        ["/post/{course_id:int}/add", "/post/{course_id:int}/{coursepost_id:int}/add"]
-    )
-    async def post_add(
-        self,
-        data: mv.Post,
-        request: Request,
-        db: AsyncSession,
-        coursepost_id: Optional[int] = Parameter(
-            description="ID of comment to reply to"
-        ),
-        course_id: int = Parameter(description="ID of Course to comment on"),
-    ) -> mv.Post:
-        user_id = request.user.get("user_id")
-        if coursepost_id is not None:
-            stmt = insert(md.CoursePost).values(
-                title=data.title,
-                body=data.body,
-                user_id=user_id,
-                coursepost_id=coursepost_id,
-                course_id=course_id,
-            )
-        else:
-            stmt = insert(md.CoursePost).values(
-                title=data.title,
-                body=data.body,
-                user_id=user_id,
-                course_id=course_id,
-            )
-        await db.scalar(stmt)
-        return data
-
-    @delete("/post/{post_id:int}/delete", status_code=201)
-    async def post_delete(
-        self,
-        post_id: Annotated[int, Parameter(description="ID of Post to delete")],
-        db: AsyncSession,
-    ) -> str | Response:
-        stmt = select(md.CoursePost).where(md.CoursePost.id == post_id)
-        res = await db.scalar(stmt)
-        if res is None:
-            raise NotFoundException("⚠️ NO POST FOUND !!")
-        await db.delete(res)
-        return "✅ DELETED POST SUCCESSFULLY !!"
-
-    # ------------------------------------------------------------------->   COURSELIST 🟢
-    @get(["/list/all"], exclude_from_auth=True)
-    async def lists_all(
-        self,
-        request: Request,
-        db: AsyncSession,
-    ) -> list[md.CourseList]:
-        res = await db.scalars(
-            select(md.CourseList).where(md.CourseList.view == "Public")
-        )
-        ans = res._allrows()
-        return ans
-
-    @get(["/list"])
-    async def lists_user(
-        self,
-        request: Request,
-        db: AsyncSession,
-    ) -> list[md.CourseList]:
-        # user_id = request.user.get("user_id")
-        user_id = request.user["user_id"]
-        res = await db.scalars(
-            select(md.CourseList).where(md.CourseList.user_id == user_id)
-        )
-        ans = res._allrows()
-        return ans
-
-    @post(["/list/add"], media_type=MediaType.TEXT)
-    async def list_add(
-        self,
-        data: mv.List,
-        request: Request,
-        db: AsyncSession,
-    ) -> Any:
-        try:
-            await db.get_one(md.Course, data.course_id)
-        except NoResultFound:
-            raise NotFoundException("⚠️ NO COURSE FOUND !!")
-        user_id = request.user.get("user_id")
-        stmt = insert(md.CourseList).values(
-            user_id=user_id, course_id=data.course_id, view=data.view.value
-        )
-        try:
-            await db.scalar(stmt)
-        except Exception:
-            return Response("⚠️ LIST ENTRY ALREADY EXISTS !!", status_code=400)
-        return "✅ ADDED SUCCESSFULLY !!"
-
-    @delete("/list/{course_id:int}/delete", status_code=200, media_type=MediaType.TEXT)
-    async def list_delete(
-        self,
-        request: Request,
-        db: AsyncSession,
-        course_id: int = Parameter(description="ID of Course in your list to delete"),
-    ) -> Any:
-        try:
-            await db.get_one(md.Course, course_id)
-        except NoResultFound:
-            return Response("⚠️ NO COURSE FOUND !!", status_code=404)
-        user_id = request.user.get("user_id")
-        stmt = select(md.CourseList).where(
-            (md.CourseList.course_id == course_id) & (md.CourseList.user_id == user_id)
-        )
-        res = await db.scalar(stmt)
-        if res is None:
-            raise NotFoundException("⚠️ NO LIST ENTRY FOUND !!")
-        await db.delete(res)
-        return "✅ DELETED LIST ENTRY SUCCESSFULLY !!"
-
-    # ------------------------------------------------------------------->   COURSELIKES 🟢
-    @post("/likes", media_type=MediaType.TEXT)
-    async def likes_add(
-        self, course_id: int, request: Request, db: AsyncSession
-    ) -> str | Response:
-        try:
-            await db.get_one(md.Course, course_id)
-        except NoResultFound:
-            raise NotFoundException("⚠️ NO COURSE FOUND !!")
-        user_id = request.user.get("user_id")
-        try:
-            await db.scalar(
-                insert(md.CourseLikes).values(user_id=user_id, course_id=course_id)
-            )
-        except IntegrityError:
-            return Response("⚠️ ALREADY LIKED !!", status_code=400)
-        stmt = (
-            update(md.Course)
-            .where(md.Course.id == course_id)
-            .values(likes=md.Course.likes + 1)
-        )
-        await db.execute(stmt)
-        return f"✅ LIKED COURSE {course_id}"
-
-    @get("/likes/ranking", exclude_from_auth=True, cache=20)
-    async def likes_ranking(self, db: AsyncSession) -> list[md.Course]:
-        stmt = select(md.Course).order_by(desc(md.Course.likes))
-        res = await db.scalars(stmt)
-        return res._allrows()
-
 
 # ..........................................................................................     COLLEGE CONTROLLER 🔰
 
+COLLEGE = en.Entity(
+    md.College,
+    md.CollegePost,
+    md.CollegeList,
+    md.CollegeLikes,
+    search="Ranked full-text search by name, city & state, typo tolerant",
+)
 
-class collegecontroller(Controller):
-    path = "/college"
-    tags = ["🟢   Colleges"]
-
-    @get("/", exclude_from_auth=True)
-    async def colleges(self, db: AsyncSession) -> list[md.College]:
-        res = await db.scalars(select(md.College))
-        return res._allrows()
 
+class collegecontroller(en.controller(COLLEGE, check_admin)):  # type: ignore
     @post("/add", guards=[check_admin], media_type=MediaType.TEXT)
     async def college_add(
         self,
@@ -401,9 +260,11 @@ class collegecontroller(Controller):
             country=data.country,
         )
         try:
-            await db.scalar(stmt)
+            college_id = await db.scalar(stmt.returning(md.College.id))
         except Exception:
             return Response("⚠️ COLLEGE ALREADY EXISTS !!", status_code=400)
+        on_commit(db, rk.rankings[md.College].add, college_id)
+        await cache.invalidate(db, md.College)
         return "✅ ADDED SUCCESSFULLY !!"
 
     @patch("/update/{college_id:int}", guards=[check_admin])
@@ -414,214 +275,35 @@ class collegecontroller(Controller):
         data: dict = Parameter(description=f"DEMO SCHEMA  =  {mv.College.__slots__}"),
     ) -> Any:
         stmt = update(md.College).where(md.College.id == college_id).values(**data)
-        await db.execute(stmt)
-        return data
-
-    @delete(
-        "/delete/{college_id:int}",
-        status_code=200,
-        guards=[check_admin],
-        media_type=MediaType.TEXT,
-    )
-    async def college_delete(
-        self,
-        db: AsyncSession,
-        college_id: int = Parameter(description="ID of College to delete"),
-    ) -> str | Response:
-        stmt = select(md.College).where(md.College.id == college_id)
-        res = await db.scalar(stmt)
-        if res is None:
+        if await db.scalar(stmt.returning(md.College.id)) is None:
             raise NotFoundException("⚠️ NO COLLEGE FOUND !!")
-        await db.delete(res)
-        return "✅ DELETED COLLEGE SUCCESSFULLY !!"
-
-    # ------------------------------------------------------------------->   COLLEGEPOST 🟢
-
-    @get(
-        ["/post/{college_id:int}"],
-        exclude_from_auth=True,
-        description="Get all the posts of specific college ",
-    )
-    async def posts(
-        self,
-        db: AsyncSession,
-        college_id: int = Parameter(description="ID of Course"),
-    ) -> list[md.CollegePost]:
-        res = await db.scalars(
-            select(md.CollegePost).where(md.CollegePost.college_id == college_id)
-        )
-        ans = res._allrows()
-        return ans
-
-    @post(
-        [
-            "/post/{college_id:int}/add",
-            "/post/{college_id:int}/{collegepost_id:int}/add",
-        ]
-    )
-    async def post_add(
-        self,
-        data: mv.Post,
-        request: Request,
-        db: AsyncSession,
-        collegepost_id: Optional[int] = Parameter(
-            description="ID of comment to reply to"
-        ),
-        college_id: int = Parameter(description="ID of College to comment on"),
-    ) -> mv.Post:
-        user_id = request.user.get("user_id")
-        if collegepost_id is not None:
-            stmt = insert(md.CollegePost).values(
-                title=data.title,
-                body=data.body,
-                user_id=user_id,
-                college_id=college_id,
-                collegepost_id=collegepost_id,
-            )
-        else:
-            stmt = insert(md.CollegePost).values(
-                title=data.title,
-                body=data.body,
-                user_id=user_id,
-                college_id=college_id,
-            )
-        await db.scalar(stmt)
+        await cache.invalidate(db, md.College)
         return data
 
-    @delete("/post/{post_id:int}/delete", status_code=201, media_type=MediaType.TEXT)
-    async def post_delete(
-        self,
-        post_id: Annotated[int, Parameter(description="ID of Post to delete")],
-        db: AsyncSession,
-    ) -> str | Response:
-        stmt = select(md.CollegePost).where(md.CollegePost.id == post_id)
-        res = await db.scalar(stmt)
-        if res is None:
-            raise NotFoundException("⚠️ NO POST FOUND !!")
-        await db.delete(res)
-        return "✅ DELETED POST SUCCESSFULLY !!"
-
-    # ------------------------------------------------------------------->   COLLEGELIST 🟢
-    @get(["/list/all"], exclude_from_auth=True)
-    async def lists_all(
-        self,
-        db: AsyncSession,
-    ) -> list[md.CollegeList]:
-        res = await db.scalars(
-            select(md.CollegeList).where(md.CollegeList.view == "Public")
-        )
-        ans = res._allrows()
-        return ans
-
-    @get(["/list"])
-    async def lists_user(
-        self,
-        request: Request,
-        db: AsyncSession,
-    ) -> list[md.CollegeList]:
-        user_id = request.user.get("user_id")
-        res = await db.scalars(
-            select(md.CollegeList).where(md.CollegeList.user_id == user_id)
-        )
-        ans = res._allrows()
-        return ans
-
-    @post(["/list/add"], media_type=MediaType.TEXT)
-    async def list_add(
-        self,
-        data: mv.List,
-        request: Request,
-        db: AsyncSession,
-    ) -> Any:
-        try:
-            await db.get_one(md.College, data.course_id)
-        except NoResultFound:
-            raise NotFoundException("⚠️ NO COLLEGE FOUND !!")
-        user_id = request.user.get("user_id")
-        stmt = insert(md.CollegeList).values(
-            user_id=user_id, college_id=data.course_id, view=data.view.value
-        )
-        try:
-            await db.scalar(stmt)
-        except Exception:
-            return Response("⚠️ LIST ENTRY ALREADY EXISTS !!", status_code=400)
-        return "✅ ADDED SUCCESSFULLY !!"
-
-    @delete("/list/{college_id:int}/delete", status_code=200, media_type=MediaType.TEXT)
-    async def list_delete(
-        self,
-        request: Request,
-        db: AsyncSession,
-        college_id: int = Parameter(description="ID of College in your list to delete"),
-    ) -> Any:
-        try:
-            await db.get_one(md.College, college_id)
-        except NoResultFound:
-            raise NotFoundException("⚠️ NO COLLEGE FOUND !!")
-        user_id = request.user.get("user_id")
-        stmt = select(md.CollegeList).where(
-            (md.CollegeList.college_id == college_id)
-            & (md.CollegeList.user_id == user_id)
-        )
-        res = await db.scalar(stmt)
-        if res is None:
-            raise NotFoundException("⚠️ NO LIST ENTRY FOUND !!")
-        await db.delete(res)
-        return "✅ DELETED LIST ENTRY SUCCESSFULLY !!"
-
-    # ------------------------------------------------------------------->   COLLEGELIKES 🟢
-    @post("/likes", media_type=MediaType.TEXT)
-    async def likes_add(
-        self, college_id: int, request: Request, db: AsyncSession
-    ) -> str | Response:
-        try:
-            await db.get_one(md.College, college_id)
-        except NoResultFound:
-            raise NotFoundException("⚠️ NO COLLEGE FOUND !!")
-        user_id = request.user.get("user_id")
-        try:
-            await db.scalar(
-                insert(md.CollegeLikes).values(user_id=user_id, college_id=college_id)
-            )
-        except IntegrityError:
-            return Response("⚠️ ALREADY LIKED !!", status_code=400)
-        stmt = (
-            update(md.College)
-            .where(md.College.id == college_id)
-            .values(likes=md.College.likes + 1)
-        )
-        await db.execute(stmt)
-        return f"✅ LIKED COLLEGE {college_id}"
-
-    @get("/likes/ranking", exclude_from_auth=True, cache=20)
-    async def likes_ranking(self, db: AsyncSession) -> list[md.College]:
-        stmt = select(md.College).order_by(desc(md.College.likes))
-        res = await db.scalars(stmt)
-        return res._allrows()
-
 
 # ..........................................................................................     EXAM CONTROLLER 🔰
 
+EXAM = en.Entity(
+    md.Exam,
+    md.ExamPost,
+    md.ExamList,
+    md.ExamLikes,
+    search="Ranked full-text search by name, syllabus & eligibility",
+)
 
-class examcontroller(Controller):
-    path = "/exam"
-    tags = ["🟢   Exams"]
-
-    @get("/", exclude_from_auth=True)
-    async def exams(self, db: AsyncSession) -> Sequence[md.Exam]:
-        res = await db.scalars(select(md.Exam))
-        ans = res.all()
-        return ans
 
+class examcontroller(en.controller(EXAM, check_admin)):  # type: ignore
     @post("/add", guards=[check_admin], media_type=MediaType.TEXT)
     async def exam_add(self, data: mv.Exam, db: AsyncSession) -> str | Response:
         stmt = insert(md.Exam).values(
             name=data.name, elig=data.elig, syllabus=data.syllabus, fee=data.fee
         )
         try:
-            await db.scalar(stmt)
+            exam_id = await db.scalar(stmt.returning(md.Exam.id))
         except Exception:
             return Response("⚠️ EXAM ALREADY EXISTS !!", status_code=400)
+        on_commit(db, rk.rankings[md.Exam].add, exam_id)
+        await cache.invalidate(db, md.Exam)
         return "✅ ADDED SUCCESSFULLY !!"
 
     @patch("/update/{exam_id:int}", guards=[check_admin])
@@ -632,197 +314,63 @@ class examcontroller(Controller):
         data: dict = Parameter(description=f"DEMO SCHEMA  =  {mv.Exam.__slots__}"),
     ) -> Any:
         stmt = update(md.Exam).where(md.Exam.id == exam_id).values(**data)
-        await db.execute(stmt)
-        return data
-
-    @delete(
-        "/delete/{exam_id:int}",
-        status_code=200,
-        guards=[check_admin],
-        media_type=MediaType.TEXT,
-    )
-    async def exam_delete(
-        self,
-        exam_id: Annotated[int, Parameter(description="ID of Exam to delete")],
-        db: AsyncSession,
-    ) -> str | Response:
-        stmt = select(md.Exam).where(md.Exam.id == exam_id)
-        res = await db.scalar(stmt)
-        if res is None:
+        if await db.scalar(stmt.returning(md.Exam.id)) is None:
             raise NotFoundException("⚠️ NO EXAM FOUND !!")
-        await db.delete(res)
-        return "✅ DELETED SUCCESSFULLY !!"
-
-    # ------------------------------------------------------------------->   EXAMPOST 🟢
-
-    @get(
-        ["/post/{exam_id:int}"],
-        exclude_from_auth=True,
-        description="Get all the posts of specific college ",
-    )
-    async def posts(
-        self,
-        db: AsyncSession,
-        exam_id: int = Parameter(description="ID of Course"),
-    ) -> list[md.ExamPost]:
-        res = await db.scalars(
-            select(md.ExamPost).where(md.ExamPost.exam_id == exam_id)
-        )
-        ans = res._allrows()
-        return ans
-
-    @post(
-        [
-            "/post/{exam_id:int}/add",
-            "/post/{exam_id:int}/{exampost_id:int}/add",
-        ]
-    )
-    async def post_add(
-        self,
-        data: mv.Post,
-        request: Request,
-        db: AsyncSession,
-        exampost_id: Optional[int] = Parameter(description="ID of comment to reply to"),
-        exam_id: int = Parameter(description="ID of Exam to comment on"),
-    ) -> mv.Post:
-        user_id = request.user.get("user_id")
-        if exampost_id is not None:
-            stmt = insert(md.ExamPost).values(
-                title=data.title,
-                body=data.body,
-                user_id=user_id,
-                exampost_id=exampost_id,
-                exam_id=exam_id,
-            )
-        else:
-            stmt = insert(md.ExamPost).values(
-                title=data.title,
-                body=data.body,
-                user_id=user_id,
-                exam_id=exam_id,
-            )
-        await db.scalar(stmt)
+        await cache.invalidate(db, md.Exam)
         return data
 
-    @delete("/post/{post_id:int}/delete", status_code=201, media_type=MediaType.TEXT)
-    async def post_delete(
-        self,
-        post_id: Annotated[int, Parameter(description="ID of Post to delete")],
-        db: AsyncSession,
-    ) -> str | Response:
-        stmt = select(md.ExamPost).where(md.ExamPost.id == post_id)
-        res = await db.scalar(stmt)
-        if res is None:
-            raise NotFoundException("⚠️ NO POST FOUND !!")
-        await db.delete(res)
-        return "✅ DELETED POST SUCCESSFULLY !!"
 
-    # ------------------------------------------------------------------->   EXAMLIST 🟢
-    @get(["/list/all"], exclude_from_auth=True)
-    async def lists_all(
-        self,
-        db: AsyncSession,
-    ) -> list[md.ExamList]:
-        res = await db.scalars(select(md.ExamList).where(md.ExamList.view == "Public"))
-        ans = res._allrows()
-        return ans
+# ..........................................................................................     ACADEMICS CONTROLLER 🔰
 
-    @get(["/list"])
-    async def lists_user(
-        self,
-        request: Request,
-        db: AsyncSession,
-    ) -> list[md.ExamList]:
-        user_id = request.user.get("user_id")
-        res = await db.scalars(
-            select(md.ExamList).where(md.ExamList.user_id == user_id)
-        )
-        ans = res._allrows()
-        return ans
 
-    @post(["/list/add"], media_type=MediaType.TEXT)
-    async def list_add(
-        self,
-        data: mv.List,
-        request: Request,
-        db: AsyncSession,
-    ) -> Any:
-        try:
-            await db.get_one(md.Exam, data.course_id)
-        except NoResultFound:
-            raise NotFoundException("⚠️ NO EXAM FOUND !!")
-        user_id = request.user.get("user_id")
-        stmt = insert(md.ExamList).values(
-            user_id=user_id, exam_id=data.course_id, view=data.view.value
+def academics_from_exam(exam_id: int) -> Select:
+    return (
+        select(
+            md.College.id.label("College_id"),
+            md.College.name.label("College"),
+            md.Course.id.label("Course_id"),
+            md.Course.name.label("Course"),
         )
-        try:
-            await db.scalar(stmt)
-        except Exception:
-            return Response("⚠️ LIST ENTRY ALREADY EXISTS !!", status_code=400)
-        return "✅ ADDED SUCCESSFULLY !!"
-
-    @delete("/list/{exam_id:int}/delete", status_code=200, media_type=MediaType.TEXT)
-    async def list_delete(
-        self,
-        request: Request,
-        db: AsyncSession,
-        exam_id: int = Parameter(description="ID of Exam in your list to delete"),
-    ) -> Any:
-        try:
-            await db.get_one(md.Exam, exam_id)
-        except NoResultFound:
-            raise NotFoundException("⚠️ NO EXAM FOUND !!")
-        user_id = request.user.get("user_id")
-        stmt = select(md.ExamList).where(
-            (md.ExamList.exam_id == exam_id) & (md.ExamList.user_id == user_id)
+        .join(
+            md.Academics,
+            (md.Academics.college_id == md.College.id),
+            # & (md.Academics.exam_id == exam_id),
         )
-        res = await db.scalar(stmt)
-        if res is None:
-            raise NotFoundException("⚠️ NO LIST ENTRY FOUND !!")
-        await db.delete(res)
-        return "✅ DELETED LIST ENTRY SUCCESSFULLY !!"
-
-    # ------------------------------------------------------------------->   EXAMLIKES 🟢
-    @post("/likes", media_type=MediaType.TEXT)
-    async def likes_add(
-        self, exam_id: int, request: Request, db: AsyncSession
-    ) -> str | Response:
-        try:
-            await db.get_one(md.Exam, exam_id)
-        except NoResultFound:
-            raise NotFoundException("⚠️ NO EXAM FOUND !!")
-        user_id = request.user.get("user_id")
-        try:
-            await db.scalar(
-                insert(md.ExamLikes).values(user_id=user_id, exam_id=exam_id)
-            )
-        except IntegrityError:
-            return Response("⚠️ ALREADY LIKED !!", status_code=400)
-        stmt = (
-            update(md.Exam).where(md.Exam.id == exam_id).values(likes=md.Exam.likes + 1)
+        .join(
+            md.Course,
+            (md.Academics.course_id == md.Course.id)
+            & (md.Academics.exam_id == exam_id),
         )
-        await db.execute(stmt)
-        return f"✅ LIKED EXAM {exam_id}"
-
-    @get("/likes/ranking", exclude_from_auth=True, cache=20)
-    async def likes_ranking(self, db: AsyncSession) -> list[md.Exam]:
-        stmt = select(md.Exam).order_by(desc(md.Exam.likes))
-        res = await db.scalars(stmt)
-        return res._allrows()
-
-
-# ..........................................................................................     ACADEMICS CONTROLLER 🔰
+    )
 
 
 class academicscontroller(Controller):
     path = "/academics"
     tags = ["🟢   Academics"]
 
-    @get("/", exclude_from_auth=True)
-    async def academics(self, db: AsyncSession) -> Sequence[md.Academics]:
-        res = await db.scalars(select(md.Academics))
-        ans = res.all()
-        return ans
+    @get("/", exclude_from_auth=True, cache=True, opt=cache.tags(md.Academics))
+    async def academics(
+        self, request: Request, page: pg.PageParams
+    ) -> Response[list[md.Academics]]:
+        state = request.app.state
+        if st.wants_ndjson(request):
+            return st.ndjson(read_engine(state), st.table_dump(md.Academics))
+        async with transaction(state, request) as db:
+            stmt = pg.keyset(select(md.Academics), md.Academics, page)
+            res = await db.scalars(stmt)
+        return pg.paginate(res.all(), page)
+
+    @get(
+        "/search",
+        exclude_from_auth=True,
+        cache=True,
+        opt=cache.tags(md.Academics, md.College, md.Course, md.Exam),
+        description="Filter academics by fee, rank, exam, course type & location",
+    )
+    async def search(
+        self, db: AsyncSession, search: sr.SearchParams, page: pg.PageParams
+    ) -> Response[dict[str, Any]]:
+        return await sr.search(db, search, page)
 
     @post("/add", guards=[check_admin], media_type=MediaType.TEXT)
     async def add(self, data: mv.Academics, db: AsyncSession) -> str | Response:
@@ -834,124 +382,215 @@ class academicscontroller(Controller):
             cutoff_rank=data.cutoff_rank,
         )
         try:
-            await db.execute(stmt)
+            academics_id = await db.scalar(stmt.returning(md.Academics.id))
         except Exception:
             return Response("⚠️ ACADEMICS ALREADY EXISTS !!", status_code=400)
+        await gr.added(db, academics_id, data)
         return "✅ ADDED SUCCESSFULLY !!"
 
+    @post(
+        "/bulk",
+        guards=[check_admin],
+        description="Bulk import from a CSV (text/csv) or NDJSON upload",
+    )
+    async def academics_bulk(
+        self, request: Request, db: AsyncSession
+    ) -> dict[str, Any]:
+        return await bulk.load(db, request, md.Academics)
+
     @delete("/delete/{academics_id:int}", status_code=200, guards=[check_admin])
     async def delete(self, academics_id: int, db: AsyncSession) -> str | Response:
-        stmt = select(md.Academics).where(md.Academics.id == academics_id)
-        res = await db.scalar(stmt)
-        if res is None:
+        stmt = (
+            sqdl(md.Academics)
+            .where(md.Academics.id == academics_id)
+            .returning(md.Academics.id)
+        )
+        if await db.scalar(stmt) is None:
             raise NotFoundException("⚠️ NO ACADEMICS FOUND !!")
-        else:
-            await db.delete(res)
+        await gr.deleted(db, academics_id)
         return "✅ DELETED SUCCESSFULLY !!"
 
-    @get("/colleges-from-course", exclude_from_auth=True, cache=20)
+    @get("/graph/stats", guards=[check_admin])
+    async def graph_stats(self) -> dict[str, Any]:
+        return gr.graph.stats()
+
+    @get(
+        "/predict",
+        exclude_from_auth=True,
+        cache=True,
+        opt=cache.tags(md.Academics, md.College, md.Course),
+        description="College & Course combinations open to a rank in an exam",
+    )
+    async def predict(
+        self,
+        exam_id: int,
+        rank: int = Parameter(ge=1, description="Rank obtained in the exam"),
+        course_type: Optional[mv.course_type] = None,
+        college_state: Optional[str] = Parameter(query="state", default=None),
+        max_fee: Optional[float] = None,
+        sort: gr.PredictSort = "college_rank",
+        limit: int = Parameter(default=pg.DEFAULT_PAGE_SIZE, ge=1, le=pg.MAX_PAGE_SIZE),
+    ) -> dict[str, Any]:
+        query = mv.PredictQuery(exam_id, rank, course_type, college_state, max_fee)
+        return gr.graph.predict(query, sort, limit)
+
+    @post(
+        "/predict/batch",
+        exclude_from_auth=True,
+        status_code=200,
+        description=f"Score up to {gr.MAX_PREDICTIONS} (exam, rank) pairs at once",
+    )
+    async def predict_batch(
+        self,
+        data: list[mv.PredictQuery],
+        sort: gr.PredictSort = "college_rank",
+        limit: int = Parameter(default=10, ge=1, le=pg.MAX_PAGE_SIZE),
+    ) -> list[dict[str, Any]]:
+        if len(data) > gr.MAX_PREDICTIONS:
+            raise ValidationException(f"⚠️ At most {gr.MAX_PREDICTIONS} queries")
+        return [gr.graph.predict(query, sort, limit) for query in data]
+
+    @get(
+        "/colleges-from-course",
+        exclude_from_auth=True,
+        cache=True,
+        opt=cache.tags(md.Academics, md.College),
+    )
     async def CollegesFromCourse(
         self,
-        db: AsyncSession,
         course_id: int = Parameter(description="Get all Colleges offering this Course"),
     ) -> list[md.College]:
-        # ) -> list[Any]:
-        # stmt = select(md.College).where(
-        #     md.College.id.in_(
-        #         select(md.Academics.college_id).where(
-        #             md.Academics.course_id == course_id
-        #         )
-        #     )
-        # )
-        # -----------------IN CLAUSE VS JOIN
-        stmt = (
-            select(md.College).join(
-                md.Academics,
-                (md.Academics.college_id == md.College.id)
-                & (md.Academics.course_id == course_id),
-            )
-            # .where(md.Academics.course_id == course_id)
-        )
-        # print(stmt)
-        res = await db.scalars(stmt)
-        ans = res._allrows()
-        return ans
+        return gr.graph.colleges_from_course(course_id)
 
-    @get("/academics-from-exam", exclude_from_auth=True, cache=20)
+    @get(
+        "/academics-from-exam",
+        exclude_from_auth=True,
+        cache=True,
+        opt=cache.tags(md.Academics, md.College, md.Course),
+    )
     async def AcademicsFromExam(
         self,
-        db: AsyncSession,
         exam_id: int = Parameter(
             description="All College & Courses accepting this Exam"
         ),
     ) -> list[dict]:
-        stmt = (
-            select(
-                md.College.id.label("College_id"),
-                md.College.name.label("College"),
-                md.Course.id.label("Course_id"),
-                md.Course.name.label("Course"),
-            )
-            .join(
-                md.Academics,
-                (md.Academics.college_id == md.College.id),
-                # & (md.Academics.exam_id == exam_id),
-            )
-            .join(
-                md.Course,
-                (md.Academics.course_id == md.Course.id)
-                & (md.Academics.exam_id == exam_id),
-            )
-        )
-        res = await db.execute(stmt)
-        ans = res.mappings()
-        ans = [dict(i) for i in ans]
-        return ans
+        return gr.graph.academics_from_exam(exam_id)
 
-    @get("/fees-from-course", exclude_from_auth=True, cache=20)
+    @get(
+        "/fees-from-course",
+        exclude_from_auth=True,
+        cache=True,
+        opt=cache.tags(md.Academics, md.College),
+    )
     async def FeesCourseCollege(
         self,
-        db: AsyncSession,
         course_id: int = Parameter(
             description="All Colleges accepting the course (ASC sorted by fees)"
         ),
     ) -> list[Any]:
-        # stmt = (
-        #     select(
-        #         md.College.name.label("College"), md.Academics.course_fee.label("Fee")
-        #     )
-        #     .where(md.Academics.course_id == course_id)
-        #     .join(md.College, md.Academics.college_id == md.College.id)
-        #     .order_by(md.Academics.course_fee)
-        # )
-        subq = (
-            select(md.Academics.college_id, md.Academics.course_fee)
-            .where(md.Academics.course_id == course_id)
-            .alias()
-        )
-        stmt = (
-            select(md.College.name.label("College"), subq.c.course_fee.label("Fee"))
-            .join(subq, md.College.id == subq.c.college_id)
-            .order_by(subq.c.course_fee)
-        )
+        return gr.graph.fees_from_course(course_id)
+
+
+# ..........................................................................................     EXPORT CONTROLLER 🔰
+
+
+class exportcontroller(Controller):
+    path = "/export"
+    tags = ["🟣   Export"]
+    guards = [check_admin]
+
+    @get(
+        "/academics-from-exam",
+        description="Stream College & Courses accepting an Exam as CSV or NDJSON",
+    )
+    async def export_academics_from_exam(
+        self,
+        request: Request,
+        exam_id: int,
+        format: ex.Format = "csv",
+        compress: Optional[ex.Compression] = None,
+    ) -> Stream:
+        engine = read_engine(request.app.state)
+        stmt = academics_from_exam(exam_id)
+        name = f"academics-from-exam-{exam_id}"
+        return ex.copy_stream(engine, stmt, name, format, compress)
 
-        res = await db.execute(stmt)
-        ans = res.mappings()
-        ans = [dict(i) for i in ans]
-        return ans
+    @get(
+        "/{table:str}",
+        description="Stream a whole table from one snapshot as CSV or NDJSON",
+    )
+    async def export_table(
+        self,
+        request: Request,
+        table: str,
+        format: ex.Format = "csv",
+        compress: Optional[ex.Compression] = None,
+    ) -> Stream:
+        engine = read_engine(request.app.state)
+        stmt = ex.table_dump(table)
+        return ex.copy_stream(engine, stmt, table.lower(), format, compress)
+
+
+# ..........................................................................................     ADMIN CONTROLLER 🔰
+
+
+class admincontroller(Controller):
+    path = "/admin"
+    tags = ["🟣   Admin"]
+    guards = [check_admin]
+
+    @get("/sql-trace", description="SQL trace settings of this worker")
+    async def sql_trace(self) -> dict[str, Any]:
+        return asdict(sqltrace.settings)
+
+    @patch(
+        "/sql-trace",
+        description="Change the SQL trace settings of every worker, no restart",
+    )
+    async def sql_trace_update(
+        self, data: mv.SqlTrace, db: AsyncSession
+    ) -> dict[str, Any]:
+        changes = {k: v for k, v in asdict(data).items() if v is not None}
+        if not 0 <= changes.get("sample_rate", 0) <= 1:
+            raise ValidationException("⚠️ sample_rate must be between 0 and 1")
+        if changes.get("slow_ms", 0) < 0:
+            raise ValidationException("⚠️ slow_ms can't be negative")
+        if changes.get("repeat_threshold", 2) < 2:
+            raise ValidationException("⚠️ repeat_threshold must be at least 2")
+        return await sqltrace.configure(db, changes)
 
 
 # -----------------------------------------------------------------------------> EXCEPTION HANDLER
 def exception_handler(_: Request, exc: Exception) -> Response:
     status_code = getattr(exc, "status_code", 500)
     detail = getattr(exc, "detail", "⚠️ SOME ERROR OCCURED")
+    headers = dict(getattr(exc, "headers", None) or {})
+    # unset for errors raised before the middleware runs, e.g. an unknown path
+    if rid := logs.request_id.get():
+        headers[logs.REQUEST_ID_HEADER] = rid
     return Response(
         media_type=MediaType.TEXT,
         content=detail,
         status_code=status_code,
+        headers=headers,
     )
 
 
+# -----------------------------------------------------------------------------> WARM-UP
+
+
+@asynccontextmanager
+async def warm_up(app: Litestar) -> AsyncIterator[None]:
+    if dc.config.warmup:
+        hot = [
+            statement
+            for entity in (COURSE, COLLEGE, EXAM)
+            for statement in en.warm_up_statements(entity)
+        ]
+        await dc.warm_up(app.state, hot)
+    yield
+
+
 # -----------------------------------------------------------------------------> MAIN APP
 
 
@@ -962,16 +601,34 @@ app = Litestar(
         collegecontroller,
         examcontroller,
         academicscontroller,
+        exportcontroller,
+        admincontroller,
+        mt.metrics_endpoint,
+    ],
+    dependencies={
+        "db": Provide(provide_transaction),
+        "page": Provide(pg.provide_page, sync_to_thread=False),
+        "thread": Provide(th.provide_thread, sync_to_thread=False),
+        "search": Provide(sr.provide_search, sync_to_thread=False),
+    },
+    lifespan=[
+        logs.logging_pipeline,
+        db_connection,
+        warm_up,
+        cache.response_cache,
+        mt.loop_monitor,
     ],
-    dependencies={"db": Provide(provide_transaction)},
-    lifespan=[db_connection],
+    response_cache_config=cache.config,
     plugins=[SQLAlchemySerializationPlugin()],
-    on_app_init=[jwt_cookie_auth.on_app_init],
+    on_app_init=[jwt_cookie_auth.on_app_init, admission.on_app_init, mt.on_app_init],
     debug=True,
+    logging_config=None,  # every logger goes through logs.pipeline
+    after_exception=[logs.log_exception],
     exception_handlers={
         ValidationException: exception_handler,
         NotAuthorizedException: exception_handler,
         NotFoundException: exception_handler,
+        ServiceUnavailableException: exception_handler,
     },
     openapi_config=OpenAPIConfig(
         title="AcademicWorld", version="", root_schema_site="rapidoc"
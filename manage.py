@@ -0,0 +1,105 @@
+"""One-off database commands, run once per deploy / setup instead of on every API boot.
+
+    python manage.py migrate                 (applies the pending schema migrations, --to N stops at version N)
+    python manage.py status                  (current and latest schema version, exits 1 when behind)
+    python manage.py create-admin --username admin --email admin --password admin
+    python manage.py reconcile-likes         (sets drifted `likes` counts back to their likes rows, API stopped)
+
+Uses the database configured in db_connection.py (DB_* environment variables /
+DB_CONFIG). migrate is safe to run from several places at once.
+"""
+import argparse
+import asyncio
+import getpass
+import os
+import db_connenction as dc
+import hashing
+import likes as lk
+import migrations as mg
+
+
+# // COMMANDS
+async def migrate(args: argparse.Namespace) -> int:
+    engine = dc.direct_engine()
+    try:
+        applied = await mg.upgrade(engine, args.to)
+    finally:
+        await engine.dispose()
+    for migration in applied:
+        print(f"✅ v{migration.version} {migration.description}")
+    if not applied:
+        print("✅ NOTHING TO MIGRATE !!")
+    return 0
+
+
+async def status(args: argparse.Namespace) -> int:
+    engine = dc.create_engine()
+    try:
+        async with engine.connect() as conn:
+            version = await mg.current_version(conn)
+    finally:
+        await engine.dispose()
+    print(f"schema version {version}, latest {mg.LATEST}")
+    for migration in mg.MIGRATIONS:
+        if migration.version > version:
+            print(f"⚠️ pending v{migration.version} {migration.description}")
+    return 0 if version >= mg.LATEST else 1
+
+
+async def create_admin(args: argparse.Namespace) -> int:
+    password = args.password or os.environ.get("ADMIN_PASSWORD") or getpass.getpass()
+    pwd = await hashing.pool.hash(password)
+    hashing.pool.shutdown()
+    engine = dc.create_engine()
+    try:
+        async with engine.begin() as conn:
+            await mg.check(conn)
+            created = await mg.create_admin(
+                conn, args.name or args.username, args.username, args.email, pwd
+            )
+    finally:
+        await engine.dispose()
+    if not created:
+        print("⚠️ USERNAME OR EMAIL ALREADY EXISTS")
+        return 1
+    print(f"✅ ADMIN {args.username} CREATED !!")
+    return 0
+
+
+# with the API stopped: a running worker's unflushed deltas would be added on
+# top of the recount
+async def reconcile_likes(args: argparse.Namespace) -> int:
+    engine = dc.create_engine()
+    try:
+        async with engine.begin() as conn:
+            await mg.check(conn)
+            repaired = await lk.reconcile(conn)
+    finally:
+        await engine.dispose()
+    for table, n in repaired.items():
+        print(f"{'⚠️' if n else '✅'} {table}: {n} drifted counts recounted")
+    return 0
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    commands = parser.add_subparsers(dest="command", required=True)
+    run = commands.add_parser("migrate", help="apply pending schema migrations")
+    run.add_argument("--to", type=int, default=mg.LATEST, help="target version")
+    run.set_defaults(handler=migrate)
+    commands.add_parser("status", help="schema version").set_defaults(handler=status)
+    admin = commands.add_parser("create-admin", help="add an admin account")
+    admin.add_argument("--username", default="admin")
+    admin.add_argument("--email", default="admin")
+    admin.add_argument("--name", help="defaults to the username")
+    admin.add_argument("--password", help="else $ADMIN_PASSWORD, else a prompt")
+    admin.set_defaults(handler=create_admin)
+    commands.add_parser(
+        "reconcile-likes", help="recount drifted likes counts"
+    ).set_defaults(handler=reconcile_likes)
+    args = parser.parse_args()
+    raise SystemExit(asyncio.run(args.handler(args)))
+
+
+if __name__ == "__main__":
+    main()
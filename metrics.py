@@ -0,0 +1,266 @@
+import asyncio
+from bisect import bisect_left
+from contextlib import asynccontextmanager
+from time import perf_counter
+from typing import Any, AsyncIterator
+from litestar import Litestar, get
+from litestar.config.app import AppConfig
+from litestar.datastructures import State
+from litestar.types import ASGIApp, Message, Receive, Scope, Send
+from sqlalchemy.ext.asyncio import AsyncEngine
+from sqlalchemy.pool import QueuePool
+import admission as ad
+import logs
+import sqltrace
+
+
+# // METRICS CONFIGURATION
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 25, 50, 100)
+LAG_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1)
+LAG_INTERVAL = 0.25  # seconds between two event loop lag samples
+REQUEST_ID = logs.REQUEST_ID_HEADER.lower().encode()
+
+
+# // HISTOGRAM
+# plain counters on the event loop thread, no locks: observe() is one bisect
+class Histogram:
+    __slots__ = ("bounds", "counts", "sum")
+
+    def __init__(self, bounds: tuple[float, ...]) -> None:
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.sum += value
+
+
+class RouteMetrics:
+    __slots__ = ("latency", "statuses", "queries", "db_time", "repeated")
+
+    def __init__(self) -> None:
+        self.latency = Histogram(LATENCY_BUCKETS)
+        self.statuses: dict[int, int] = {}
+        self.queries = Histogram(QUERY_BUCKETS)  # per request, spots N+1 loops
+        self.db_time = Histogram(LATENCY_BUCKETS)
+        self.repeated = 0  # statements flagged as N+1 by sqltrace
+
+
+class Metrics:
+    def __init__(self) -> None:
+        self.routes: dict[tuple[str, str], RouteMetrics] = {}
+        self.in_flight = 0
+        self.pool_wait = Histogram(LATENCY_BUCKETS)
+        self.loop_lag = Histogram(LAG_BUCKETS)
+        self.loop_lag_last = 0.0
+        self.paths: dict[int, str] = {}  # id(route handler) -> route path
+
+
+metrics = Metrics()
+
+
+# // MIDDLEWARE
+def _route(scope: Scope) -> str:
+    handler = scope["route_handler"]
+    path = metrics.paths.get(id(handler))
+    if path is None:
+        # handler paths lack the controller prefix, the app's routes have it
+        for route in scope["app"].routes:
+            for h in getattr(route, "route_handlers", ()):
+                metrics.paths.setdefault(id(h), route.path)
+        path = metrics.paths.setdefault(id(handler), "unknown")
+    return path
+
+
+def middleware(app: ASGIApp) -> ASGIApp:
+    async def measured(scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await app(scope, receive, send)
+            return
+        status = 500
+        rid = logs.begin(scope)
+
+        async def send_status(message: Message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                headers = message.get("headers", [])
+                # error responses may already carry it from the exception handler
+                if status < 400 or all(k.lower() != REQUEST_ID for k, _ in headers):
+                    message["headers"] = [*headers, (REQUEST_ID, rid.encode())]
+            await send(message)
+
+        key = (scope["method"], _route(scope))
+        trace, token = sqltrace.start(f"{key[0]} {key[1]}")
+        metrics.in_flight += 1
+        start = perf_counter()
+        try:
+            await app(scope, receive, send_status)
+        except Exception as exc:
+            # turned into a response by the app's exception handler, above us
+            status = getattr(exc, "status_code", 500)
+            raise
+        finally:
+            elapsed = perf_counter() - start
+            metrics.in_flight -= 1
+            repeated = sqltrace.finish(trace, token)
+            route = metrics.routes.get(key)
+            if route is None:
+                route = metrics.routes[key] = RouteMetrics()
+            route.latency.observe(elapsed)
+            route.statuses[status] = route.statuses.get(status, 0) + 1
+            route.queries.observe(trace.queries)
+            route.db_time.observe(trace.db_time)
+            route.repeated += repeated
+            logs.access(
+                trace.route, status, elapsed, trace.db_time, trace.queries, scope
+            )
+
+    return measured
+
+
+# outermost, so the requests the auth middleware turns away are counted too
+def on_app_init(app_config: AppConfig) -> AppConfig:
+    app_config.middleware.insert(0, middleware)
+    return app_config
+
+
+# // EVENT LOOP LAG
+# how late a sleep wakes up: time the loop spent on something that never awaited
+async def _sample_loop_lag() -> None:
+    while True:
+        start = perf_counter()
+        await asyncio.sleep(LAG_INTERVAL)
+        lag = max(0.0, perf_counter() - start - LAG_INTERVAL)
+        metrics.loop_lag_last = lag
+        metrics.loop_lag.observe(lag)
+
+
+@asynccontextmanager
+async def loop_monitor(app: Litestar) -> AsyncIterator[None]:
+    sampler = asyncio.create_task(_sample_loop_lag())
+    try:
+        yield
+    finally:
+        sampler.cancel()
+
+
+# // PROMETHEUS TEXT FORMAT
+def _labels(**labels: Any) -> str:
+    return ",".join(f'{k}="{v}"' for k, v in labels.items())
+
+
+def _histogram(lines: list[str], name: str, labels: str, h: Histogram) -> None:
+    sep = "," if labels else ""
+    total = 0
+    for bound, n in zip((*h.bounds, "+Inf"), h.counts):
+        total += n
+        lines.append(f'{name}_bucket{{{labels}{sep}le="{bound}"}} {total}')
+    braced = f"{{{labels}}}" if labels else ""
+    lines.append(f"{name}_sum{braced} {h.sum}")
+    lines.append(f"{name}_count{braced} {total}")
+
+
+def _header(lines: list[str], name: str, kind: str, text: str) -> None:
+    lines.append(f"# HELP {name} {text}")
+    lines.append(f"# TYPE {name} {kind}")
+
+
+def _overflow(pool: QueuePool) -> int:
+    return max(0, pool.overflow())  # counts up from -pool_size
+
+
+def _pool(lines: list[str], engines: dict[str, AsyncEngine]) -> None:
+    pools = {
+        name: engine.pool
+        for name, engine in engines.items()
+        if isinstance(engine.pool, QueuePool)
+    }
+    for metric, read, text in (
+        ("db_pool_size", QueuePool.size, "Configured pool size"),
+        ("db_pool_checked_out", QueuePool.checkedout, "Connections in use"),
+        ("db_pool_overflow", _overflow, "Connections above pool_size"),
+    ):
+        _header(lines, metric, "gauge", text)
+        for name, pool in pools.items():
+            lines.append(f"{metric}{{{_labels(engine=name)}}} {read(pool)}")
+
+
+def _admission(lines: list[str]) -> None:
+    name = "http_requests_shed_total"
+    _header(lines, name, "counter", "Requests answered 503 by admission control")
+    for (route_class, reason), n in sorted(ad.admission.shed.items()):
+        labels = _labels(route_class=route_class, reason=reason)
+        lines.append(f"{name}{{{labels}}} {n}")
+    for metric, read, text in (
+        ("admission_limit", lambda g: g.limit, "Slots per route class"),
+        ("admission_active", lambda g: g.active, "Requests holding a slot"),
+        ("admission_queued", lambda g: len(g.waiters), "Requests waiting for a slot"),
+    ):
+        _header(lines, metric, "gauge", text)
+        for route_class, gate in ad.admission.gates.items():
+            lines.append(f"{metric}{{{_labels(route_class=route_class)}}} {read(gate)}")
+    name = "db_pool_wait_average_seconds"
+    _header(
+        lines, name, "gauge", "Moving average of the pool wait, sheds above a limit"
+    )
+    lines.append(f"{name} {ad.admission.pool_wait}")
+
+
+def render(state: State) -> str:
+    lines: list[str] = []
+    routes = sorted(metrics.routes.items())
+    _header(lines, "http_requests_total", "counter", "Requests per route and status")
+    for (method, path), route in routes:
+        for status, n in sorted(route.statuses.items()):
+            labels = _labels(method=method, route=path, status=status)
+            lines.append(f"http_requests_total{{{labels}}} {n}")
+    for name, attr, text in (
+        ("http_request_duration_seconds", "latency", "Request latency"),
+        ("http_request_db_queries", "queries", "DB queries per request"),
+        ("http_request_db_seconds", "db_time", "DB time per request"),
+    ):
+        _header(lines, name, "histogram", text)
+        for (method, path), route in routes:
+            labels = _labels(method=method, route=path)
+            _histogram(lines, name, labels, getattr(route, attr))
+    name = "http_request_repeated_statements_total"
+    _header(lines, name, "counter", "Statements repeated within a request (N+1)")
+    for (method, path), route in routes:
+        labels = _labels(method=method, route=path)
+        lines.append(f"{name}{{{labels}}} {route.repeated}")
+    _header(lines, "http_requests_in_flight", "gauge", "Requests being served")
+    lines.append(f"http_requests_in_flight {metrics.in_flight}")
+    engines = {"primary": state.engine}
+    if state.get("replica_engine") is not None:
+        engines["replica"] = state.replica_engine
+    _pool(lines, engines)
+    _header(lines, "db_pool_wait_seconds", "histogram", "Wait for a connection")
+    _histogram(lines, "db_pool_wait_seconds", "", metrics.pool_wait)
+    _header(lines, "event_loop_lag_seconds", "gauge", "Last event loop lag sample")
+    lines.append(f"event_loop_lag_seconds {metrics.loop_lag_last}")
+    name = "event_loop_lag_seconds_histogram"
+    _header(lines, name, "histogram", "Event loop lag samples")
+    _histogram(lines, name, "", metrics.loop_lag)
+    _admission(lines)
+    _header(lines, "log_records_dropped_total", "counter", "Log records dropped")
+    lines.append(f"log_records_dropped_total {logs.pipeline.handler.dropped}")
+    _header(lines, "log_queue_depth", "gauge", "Log records waiting to be written")
+    lines.append(f"log_queue_depth {logs.pipeline.records.qsize()}")
+    return "\n".join(lines) + "\n"
+
+
+# // ENDPOINT
+@get(
+    "/metrics",
+    exclude_from_auth=True,
+    include_in_schema=False,
+    media_type=CONTENT_TYPE,
+    opt={"admission": ad.EXEMPT},
+    sync_to_thread=False,
+)
+def metrics_endpoint(state: State) -> str:
+    return render(state)
@@ -0,0 +1,338 @@
+import asyncio
+import re
+from dataclasses import dataclass
+from sqlalchemy import (
+    Column,
+    DateTime,
+    Integer,
+    MetaData,
+    String,
+    Table,
+    func,
+    insert,
+    select,
+    text,
+)
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncEngine
+import models as md
+
+
+# // MIGRATIONS CONFIGURATION
+# one migrator at a time (pg_advisory_lock), the next finds nothing to do
+LOCK_KEY = 7_301_025
+LOCK_POLL = 1.0  # seconds between two tries of a migrator waiting for the lock
+MIGRATE_COMMAND = "python manage.py migrate"
+
+schema_version = Table(
+    "schema_version",
+    MetaData(),
+    Column("version", Integer, primary_key=True),
+    Column("description", String, nullable=False),
+    Column(
+        "applied_at", DateTime(timezone=True), server_default=func.now(), nullable=False
+    ),
+)
+
+
+@dataclass(frozen=True)
+class Migration:
+    version: int
+    description: str
+    statements: tuple[str, ...]
+    # CREATE INDEX CONCURRENTLY, one statement at a time outside a transaction:
+    # the table takes writes while its index builds
+    concurrent: bool = False
+
+
+# // MIGRATIONS
+# each version is frozen DDL, never edited once released: a change to models.py
+# ships as a new migration written out here, models.py only describes the result.
+# v1 is the schema create_all made before versioned migrations, IF NOT EXISTS
+# adopts those databases as they are. Later versions run once, in order, on a
+# schema that is exactly the previous version
+V1 = (
+    # trigram indexes / similarity() for the fuzzy name search
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    """CREATE TABLE IF NOT EXISTS "College" (
+        id SERIAL PRIMARY KEY,
+        name VARCHAR NOT NULL UNIQUE,
+        rank INTEGER UNIQUE,
+        city VARCHAR,
+        email VARCHAR,
+        state VARCHAR,
+        country VARCHAR,
+        address VARCHAR NOT NULL,
+        likes INTEGER NOT NULL
+    )""",
+    """CREATE TABLE IF NOT EXISTS "Course" (
+        id SERIAL PRIMARY KEY,
+        name VARCHAR NOT NULL UNIQUE,
+        duration INTEGER NOT NULL,
+        type VARCHAR NOT NULL,
+        elig VARCHAR NOT NULL,
+        likes INTEGER NOT NULL
+    )""",
+    """CREATE TABLE IF NOT EXISTS "Exam" (
+        id SERIAL PRIMARY KEY,
+        name VARCHAR NOT NULL UNIQUE,
+        elig VARCHAR NOT NULL,
+        syllabus VARCHAR NOT NULL,
+        fee FLOAT NOT NULL,
+        likes INTEGER NOT NULL
+    )""",
+    """CREATE TABLE IF NOT EXISTS "User" (
+        name VARCHAR NOT NULL,
+        email VARCHAR NOT NULL UNIQUE,
+        pwd VARCHAR NOT NULL,
+        username VARCHAR PRIMARY KEY,
+        created_at TIMESTAMP WITHOUT TIME ZONE DEFAULT now() NOT NULL,
+        admin BOOLEAN NOT NULL
+    )""",
+    """CREATE TABLE IF NOT EXISTS "Academics" (
+        id SERIAL PRIMARY KEY,
+        course_id INTEGER NOT NULL REFERENCES "Course" (id) ON DELETE CASCADE ON UPDATE CASCADE,
+        college_id INTEGER NOT NULL REFERENCES "College" (id) ON DELETE CASCADE ON UPDATE CASCADE,
+        exam_id INTEGER NOT NULL REFERENCES "Exam" (id) ON DELETE CASCADE ON UPDATE CASCADE,
+        course_fee FLOAT NOT NULL,
+        cutoff_rank INTEGER NOT NULL,
+        CONSTRAINT "CHECKKEY" UNIQUE (course_id, college_id, exam_id)
+    )""",
+    'CREATE INDEX IF NOT EXISTS "ix_Academics_course_id" ON "Academics" (course_id)',
+    """CREATE TABLE IF NOT EXISTS "CollegeLikes" (
+        college_id INTEGER NOT NULL REFERENCES "College" (id) ON DELETE CASCADE ON UPDATE CASCADE,
+        id SERIAL PRIMARY KEY,
+        user_id VARCHAR NOT NULL REFERENCES "User" (username) ON DELETE CASCADE ON UPDATE CASCADE,
+        UNIQUE (college_id, user_id)
+    )""",
+    """CREATE TABLE IF NOT EXISTS "CollegeList" (
+        college_id INTEGER NOT NULL REFERENCES "College" (id) ON DELETE CASCADE ON UPDATE CASCADE,
+        id SERIAL PRIMARY KEY,
+        user_id VARCHAR NOT NULL REFERENCES "User" (username) ON DELETE CASCADE ON UPDATE CASCADE,
+        view VARCHAR NOT NULL,
+        UNIQUE (college_id, user_id)
+    )""",
+    """CREATE TABLE IF NOT EXISTS "CollegePost" (
+        college_id INTEGER NOT NULL REFERENCES "College" (id) ON DELETE CASCADE ON UPDATE CASCADE,
+        collegepost_id INTEGER REFERENCES "CollegePost" (id) ON DELETE CASCADE ON UPDATE CASCADE,
+        id SERIAL PRIMARY KEY,
+        title VARCHAR NOT NULL,
+        body VARCHAR NOT NULL,
+        user_id VARCHAR NOT NULL REFERENCES "User" (username) ON DELETE CASCADE ON UPDATE CASCADE,
+        created_at TIMESTAMP WITHOUT TIME ZONE DEFAULT now() NOT NULL
+    )""",
+    """CREATE TABLE IF NOT EXISTS "CourseLikes" (
+        course_id INTEGER NOT NULL REFERENCES "Course" (id) ON DELETE CASCADE ON UPDATE CASCADE,
+        id SERIAL PRIMARY KEY,
+        user_id VARCHAR NOT NULL REFERENCES "User" (username) ON DELETE CASCADE ON UPDATE CASCADE,
+        UNIQUE (course_id, user_id)
+    )""",
+    """CREATE TABLE IF NOT EXISTS "CourseList" (
+        course_id INTEGER NOT NULL REFERENCES "Course" (id) ON DELETE CASCADE ON UPDATE CASCADE,
+        id SERIAL PRIMARY KEY,
+        user_id VARCHAR NOT NULL REFERENCES "User" (username) ON DELETE CASCADE ON UPDATE CASCADE,
+        view VARCHAR NOT NULL,
+        UNIQUE (course_id, user_id)
+    )""",
+    """CREATE TABLE IF NOT EXISTS "CoursePost" (
+        course_id INTEGER NOT NULL REFERENCES "Course" (id) ON DELETE CASCADE ON UPDATE CASCADE,
+        coursepost_id INTEGER REFERENCES "CoursePost" (id) ON DELETE CASCADE ON UPDATE CASCADE,
+        id SERIAL PRIMARY KEY,
+        title VARCHAR NOT NULL,
+        body VARCHAR NOT NULL,
+        user_id VARCHAR NOT NULL REFERENCES "User" (username) ON DELETE CASCADE ON UPDATE CASCADE,
+        created_at TIMESTAMP WITHOUT TIME ZONE DEFAULT now() NOT NULL
+    )""",
+    """CREATE TABLE IF NOT EXISTS "ExamLikes" (
+        exam_id INTEGER NOT NULL REFERENCES "Exam" (id) ON DELETE CASCADE ON UPDATE CASCADE,
+        id SERIAL PRIMARY KEY,
+        user_id VARCHAR NOT NULL REFERENCES "User" (username) ON DELETE CASCADE ON UPDATE CASCADE,
+        UNIQUE (exam_id, user_id)
+    )""",
+    """CREATE TABLE IF NOT EXISTS "ExamList" (
+        exam_id INTEGER NOT NULL REFERENCES "Exam" (id) ON DELETE CASCADE ON UPDATE CASCADE,
+        id SERIAL PRIMARY KEY,
+        user_id VARCHAR NOT NULL REFERENCES "User" (username) ON DELETE CASCADE ON UPDATE CASCADE,
+        view VARCHAR NOT NULL,
+        UNIQUE (exam_id, user_id)
+    )""",
+    """CREATE TABLE IF NOT EXISTS "ExamPost" (
+        exam_id INTEGER NOT NULL REFERENCES "Exam" (id) ON DELETE CASCADE ON UPDATE CASCADE,
+        exampost_id INTEGER REFERENCES "ExamPost" (id) ON DELETE CASCADE ON UPDATE CASCADE,
+        id SERIAL PRIMARY KEY,
+        title VARCHAR NOT NULL,
+        body VARCHAR NOT NULL,
+        user_id VARCHAR NOT NULL REFERENCES "User" (username) ON DELETE CASCADE ON UPDATE CASCADE,
+        created_at TIMESTAMP WITHOUT TIME ZONE DEFAULT now() NOT NULL
+    )""",
+)
+
+# databases from before versioned migrations stop here: create_all made their
+# tables once and never altered them. A stored generated column rewrites its
+# table under an exclusive lock, there is no concurrent form of it
+V2 = (
+    """ALTER TABLE "Course" ADD COLUMN search TSVECTOR GENERATED ALWAYS AS (
+        setweight(to_tsvector('english', coalesce(name, '')), 'A')
+        || setweight(to_tsvector('english', coalesce(elig, '')), 'B')
+    ) STORED NOT NULL""",
+    """ALTER TABLE "College" ADD COLUMN search TSVECTOR GENERATED ALWAYS AS (
+        setweight(to_tsvector('english', coalesce(name, '')), 'A')
+        || setweight(to_tsvector('english', coalesce(city, '')), 'B')
+        || setweight(to_tsvector('english', coalesce(state, '')), 'B')
+    ) STORED NOT NULL""",
+    """ALTER TABLE "Exam" ADD COLUMN search TSVECTOR GENERATED ALWAYS AS (
+        setweight(to_tsvector('english', coalesce(name, '')), 'A')
+        || setweight(to_tsvector('english', coalesce(syllabus, '')), 'B')
+        || setweight(to_tsvector('english', coalesce(elig, '')), 'C')
+    ) STORED NOT NULL""",
+)
+
+# the indexes added since v1, on tables that are already in use
+V3 = (
+    'CREATE INDEX CONCURRENTLY "ix_Course_ranking" ON "Course" (likes DESC, id)',
+    'CREATE INDEX CONCURRENTLY "ix_College_ranking" ON "College" (likes DESC, id)',
+    'CREATE INDEX CONCURRENTLY "ix_Exam_ranking" ON "Exam" (likes DESC, id)',
+    'CREATE INDEX CONCURRENTLY "ix_Course_search" ON "Course" USING gin (search)',
+    'CREATE INDEX CONCURRENTLY "ix_College_search" ON "College" USING gin (search)',
+    'CREATE INDEX CONCURRENTLY "ix_Exam_search" ON "Exam" USING gin (search)',
+    'CREATE INDEX CONCURRENTLY "ix_Course_name_trgm" ON "Course" USING gin (name gin_trgm_ops)',
+    'CREATE INDEX CONCURRENTLY "ix_College_name_trgm" ON "College" USING gin (name gin_trgm_ops)',
+    'CREATE INDEX CONCURRENTLY "ix_Exam_name_trgm" ON "Exam" USING gin (name gin_trgm_ops)',
+    'CREATE INDEX CONCURRENTLY "ix_Academics_college_id" ON "Academics" (college_id)',
+    'CREATE INDEX CONCURRENTLY "ix_Academics_exam_fee" ON "Academics" (exam_id, course_fee, id) INCLUDE (course_id, college_id, cutoff_rank)',
+    'CREATE INDEX CONCURRENTLY "ix_Academics_exam_rank" ON "Academics" (exam_id, cutoff_rank, id) INCLUDE (course_id, college_id, course_fee)',
+    'CREATE INDEX CONCURRENTLY "ix_Academics_fee" ON "Academics" (course_fee, id) INCLUDE (course_id, college_id, exam_id, cutoff_rank)',
+    'CREATE INDEX CONCURRENTLY "ix_Academics_rank" ON "Academics" (cutoff_rank, id) INCLUDE (course_id, college_id, exam_id, course_fee)',
+    'CREATE INDEX CONCURRENTLY "ix_College_location" ON "College" (state, city, id) INCLUDE (country)',
+    'CREATE INDEX CONCURRENTLY "ix_Course_type" ON "Course" (type, id)',
+    'CREATE INDEX CONCURRENTLY "ix_Course_duration" ON "Course" (duration, id)',
+    'CREATE INDEX CONCURRENTLY "ix_Exam_fee" ON "Exam" (fee, id)',
+    'CREATE INDEX CONCURRENTLY "ix_CoursePost_thread" ON "CoursePost" (course_id, coursepost_id, created_at, id)',
+    'CREATE INDEX CONCURRENTLY "ix_CollegePost_thread" ON "CollegePost" (college_id, collegepost_id, created_at, id)',
+    'CREATE INDEX CONCURRENTLY "ix_ExamPost_thread" ON "ExamPost" (exam_id, exampost_id, created_at, id)',
+    'CREATE INDEX CONCURRENTLY "ix_CoursePost_parent" ON "CoursePost" (coursepost_id)',
+    'CREATE INDEX CONCURRENTLY "ix_CollegePost_parent" ON "CollegePost" (collegepost_id)',
+    'CREATE INDEX CONCURRENTLY "ix_ExamPost_parent" ON "ExamPost" (exampost_id)',
+    'CREATE INDEX CONCURRENTLY "ix_CoursePost_user" ON "CoursePost" (user_id)',
+    'CREATE INDEX CONCURRENTLY "ix_CollegePost_user" ON "CollegePost" (user_id)',
+    'CREATE INDEX CONCURRENTLY "ix_ExamPost_user" ON "ExamPost" (user_id)',
+    'CREATE INDEX CONCURRENTLY "ix_CourseList_user" ON "CourseList" (user_id)',
+    'CREATE INDEX CONCURRENTLY "ix_CollegeList_user" ON "CollegeList" (user_id)',
+    'CREATE INDEX CONCURRENTLY "ix_ExamList_user" ON "ExamList" (user_id)',
+    'CREATE INDEX CONCURRENTLY "ix_CourseLikes_user" ON "CourseLikes" (user_id)',
+    'CREATE INDEX CONCURRENTLY "ix_CollegeLikes_user" ON "CollegeLikes" (user_id)',
+    'CREATE INDEX CONCURRENTLY "ix_ExamLikes_user" ON "ExamLikes" (user_id)',
+    """CREATE INDEX CONCURRENTLY "ix_CourseList_public" ON "CourseList" (id) WHERE view = 'Public'""",
+    """CREATE INDEX CONCURRENTLY "ix_CollegeList_public" ON "CollegeList" (id) WHERE view = 'Public'""",
+    """CREATE INDEX CONCURRENTLY "ix_ExamList_public" ON "ExamList" (id) WHERE view = 'Public'""",
+)
+
+
+MIGRATIONS = [
+    Migration(1, "tables, pg_trgm", V1),
+    Migration(2, "search columns", V2),
+    Migration(3, "indexes added since v1", V3, concurrent=True),
+]
+LATEST = MIGRATIONS[-1].version
+
+
+# // VERSION
+async def current_version(conn: AsyncConnection) -> int:
+    if await conn.scalar(text("SELECT to_regclass('schema_version')")) is None:
+        return 0
+    return await conn.scalar(
+        select(func.coalesce(func.max(schema_version.c.version), 0))
+    )
+
+
+# a transactional migration runs whole in one transaction: postgres DDL is
+# transactional, a failed one leaves the schema and its version as they were
+async def _apply(engine: AsyncEngine, migration: Migration) -> None:
+    async with engine.begin() as conn:
+        # a table rewrite outlasts a request's DB_STATEMENT_TIMEOUT
+        await conn.execute(text("SET LOCAL statement_timeout = 0"))
+        for statement in migration.statements:
+            await conn.execute(text(statement))
+        await conn.execute(
+            insert(schema_version).values(
+                version=migration.version, description=migration.description
+            )
+        )
+
+
+INDEX_NAME = re.compile(r'CREATE INDEX CONCURRENTLY "(\w+)"')
+
+
+# a concurrent build that failed (or was interrupted) leaves an INVALID index
+# behind, a valid one was built by a run that stopped before the next: the
+# migration can be rerun from where it stopped
+async def _build_index(conn: AsyncConnection, statement: str) -> None:
+    name = f'"{INDEX_NAME.match(statement).group(1)}"'  # type: ignore
+    valid = await conn.scalar(
+        text("SELECT indisvalid FROM pg_index WHERE indexrelid = to_regclass(:name)"),
+        {"name": name},
+    )
+    if valid:
+        return
+    if valid is not None:
+        await conn.execute(text(f"DROP INDEX CONCURRENTLY {name}"))
+    await conn.execute(text(statement))
+
+
+# `conn` is in autocommit and holds the session lock. A migrator blocked in
+# pg_advisory_lock would keep a snapshot open, which CREATE INDEX CONCURRENTLY
+# in the one holding the lock waits for: the next one polls instead. Session
+# locks and autocommit need postgres itself, not a transaction pooler (see
+# db_connection.direct_engine)
+async def upgrade(engine: AsyncEngine, target: int = LATEST) -> list[Migration]:
+    async with engine.connect() as conn:
+        conn = await conn.execution_options(isolation_level="AUTOCOMMIT")
+        lock = select(func.pg_try_advisory_lock(LOCK_KEY))
+        while not await conn.scalar(lock):
+            await asyncio.sleep(LOCK_POLL)
+        try:
+            # index builds on big tables outlast a request's DB_STATEMENT_TIMEOUT
+            await conn.execute(text("SET statement_timeout = 0"))
+            await conn.run_sync(schema_version.create, checkfirst=True)
+            current = await current_version(conn)
+            pending = [m for m in MIGRATIONS if current < m.version <= target]
+            for migration in pending:
+                if not migration.concurrent:
+                    await _apply(engine, migration)
+                    continue
+                for statement in migration.statements:
+                    await _build_index(conn, statement)
+                await conn.execute(
+                    insert(schema_version).values(
+                        version=migration.version, description=migration.description
+                    )
+                )
+        finally:
+            await conn.execute(text("RESET statement_timeout"))
+            await conn.execute(select(func.pg_advisory_unlock(LOCK_KEY)))
+    return pending
+
+
+# what the API runs on startup instead of DDL: a read, no locks, safe for any
+# number of workers booting at once
+async def check(conn: AsyncConnection) -> int:
+    version = await current_version(conn)
+    if version < LATEST:
+        raise RuntimeError(
+            f"⚠️ database schema is at version {version}, this code needs {LATEST}:"
+            f" run {MIGRATE_COMMAND}"
+        )
+    return version
+
+
+# // ADMIN BOOTSTRAP
+# False when the username or the email is taken
+async def create_admin(
+    conn: AsyncConnection, name: str, username: str, email: str, pwd: str
+) -> bool:
+    res = await conn.execute(
+        pg_insert(md.User)
+        .values(name=name, username=username, email=email, pwd=pwd, admin=True)
+        .on_conflict_do_nothing()
+    )
+    return res.rowcount == 1
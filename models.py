@@ -1,5 +1,7 @@
 from typing import Any
-from sqlalchemy import DateTime, ForeignKey, UniqueConstraint, func
+from litestar.dto import dto_field
+from sqlalchemy import Computed, DateTime, ForeignKey, Index, UniqueConstraint, func
+from sqlalchemy.dialects.postgresql import TSVECTOR
 from sqlalchemy.orm import (
     Mapped,
     mapped_column,
@@ -8,10 +10,28 @@ from sqlalchemy.orm import (
     MappedAsDataclass,
 )
 from sqlalchemy.orm.relationships import Relationship
+
 # from sqlalchemy.orm.properties import MappedColumn
 
 
-class Base(DeclarativeBase, MappedAsDataclass): ...
+class Base(DeclarativeBase, MappedAsDataclass):
+    ...
+
+
+# full-text document, generated by postgres and never sent to clients
+def search_vector(*weighted: tuple[str, str]) -> Any:
+    document = " || ".join(
+        f"setweight(to_tsvector('english', coalesce({column}, '')), '{weight}')"
+        for column, weight in weighted
+    )
+    return mapped_column(
+        TSVECTOR,
+        Computed(document, persisted=True),
+        deferred=True,
+        init=False,
+        repr=False,
+        info=dto_field("private"),
+    )
 
 
 class User(Base):
@@ -35,6 +55,7 @@ class Course(Base):
     type: Mapped[str]
     elig: Mapped[str]
     likes: Mapped[int] = mapped_column(default=0)
+    search: Mapped[Any] = search_vector(("name", "A"), ("elig", "B"))
 
     # def __repr__(self) -> str:
     #     return f"<Course:{self.id}-{self.name}>"
@@ -51,6 +72,7 @@ class College(Base):
     country: Mapped[str] = mapped_column(nullable=True)
     address: Mapped[str]
     likes: Mapped[int] = mapped_column(default=0)
+    search: Mapped[Any] = search_vector(("name", "A"), ("city", "B"), ("state", "B"))
 
     # def __repr__(self) -> str:
     #     return f"<College:{self.id}-{self.name}>"
@@ -64,6 +86,7 @@ class Exam(Base):
     syllabus: Mapped[str]
     fee: Mapped[float]
     likes: Mapped[int] = mapped_column(default=0)
+    search: Mapped[Any] = search_vector(("name", "A"), ("syllabus", "B"), ("elig", "C"))
     # academics = relationship(
     #     "Academics",
     #     back_populates="exam",
@@ -75,6 +98,12 @@ class Exam(Base):
     #     return f"<Exam:{self.id}-{self.name}>"
 
 
+# ranking fallback: ORDER BY likes DESC, id
+Index("ix_Course_ranking", Course.likes.desc(), Course.id)
+Index("ix_College_ranking", College.likes.desc(), College.id)
+Index("ix_Exam_ranking", Exam.likes.desc(), Exam.id)
+
+
 class Academics(Base):
     __tablename__ = "Academics"
     id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
@@ -88,6 +117,7 @@ class Academics(Base):
     )
     college_id: Mapped[Any] = mapped_column(
         ForeignKey("College.id", ondelete="CASCADE", onupdate="CASCADE"),
+        index=True,
         nullable=False,
     )
     exam_id: Mapped[Any] = mapped_column(
@@ -100,6 +130,66 @@ class Academics(Base):
     )
 
 
+# text search: GIN over the tsvector, trigram GIN over the name for typos
+for _model in (Course, College, Exam):
+    Index(f"ix_{_model.__tablename__}_search", _model.search, postgresql_using="gin")
+    Index(
+        f"ix_{_model.__tablename__}_name_trgm",
+        _model.name,
+        postgresql_using="gin",
+        postgresql_ops={"name": "gin_trgm_ops"},
+    )
+
+
+# academics search: an equality (exam) then a fee/rank range or sort, the
+# INCLUDE columns keep filtering and keyset paging index-only
+_academics = ("course_id", "college_id", "exam_id", "course_fee", "cutoff_rank")
+
+
+def _include(*keys: str) -> list[str]:
+    return [c for c in _academics if c not in keys]
+
+
+Index(
+    "ix_Academics_exam_fee",
+    Academics.exam_id,
+    Academics.course_fee,
+    Academics.id,
+    postgresql_include=_include("exam_id", "course_fee"),
+)
+Index(
+    "ix_Academics_exam_rank",
+    Academics.exam_id,
+    Academics.cutoff_rank,
+    Academics.id,
+    postgresql_include=_include("exam_id", "cutoff_rank"),
+)
+Index(
+    "ix_Academics_fee",
+    Academics.course_fee,
+    Academics.id,
+    postgresql_include=_include("course_fee"),
+)
+Index(
+    "ix_Academics_rank",
+    Academics.cutoff_rank,
+    Academics.id,
+    postgresql_include=_include("cutoff_rank"),
+)
+Index(
+    "ix_College_location",
+    College.state,
+    College.city,
+    College.id,
+    postgresql_include=["country"],
+)
+Index("ix_Course_type", Course.type, Course.id)
+
+# keyset pages sorted by these (pagination.SORT_KEYS), read forwards or backwards
+Index("ix_Course_duration", Course.duration, Course.id)
+Index("ix_Exam_fee", Exam.fee, Exam.id)
+
+
 # ----------------------------------------------------->    POST & REPLY
 
 
@@ -161,6 +251,36 @@ class ExamPost(Post):
     )
 
 
+# threaded replies: WHERE entity = ? AND parent = ? ORDER BY created_at, id
+Index(
+    "ix_CoursePost_thread",
+    CoursePost.course_id,
+    CoursePost.coursepost_id,
+    CoursePost.created_at,
+    CoursePost.id,
+)
+Index(
+    "ix_CollegePost_thread",
+    CollegePost.college_id,
+    CollegePost.collegepost_id,
+    CollegePost.created_at,
+    CollegePost.id,
+)
+Index(
+    "ix_ExamPost_thread",
+    ExamPost.exam_id,
+    ExamPost.exampost_id,
+    ExamPost.created_at,
+    ExamPost.id,
+)
+
+# deleting a post cascades to its replies by parent alone, the thread indexes
+# lead with the entity so they could only be read whole
+Index("ix_CoursePost_parent", CoursePost.coursepost_id)
+Index("ix_CollegePost_parent", CollegePost.collegepost_id)
+Index("ix_ExamPost_parent", ExamPost.exampost_id)
+
+
 # ----------------------------------------------------->    LIST & LIKES
 
 
@@ -236,3 +356,28 @@ class ExamLikes(Likes):
         nullable=False,
     )
     __table_args__ = (UniqueConstraint("exam_id", "user_id"),)
+
+
+# a user's own rows (GET /list, and the ON DELETE CASCADE of a user), the
+# unique constraints above lead with the entity id so they can't serve these
+for _model in (
+    CoursePost,
+    CollegePost,
+    ExamPost,
+    CourseList,
+    CollegeList,
+    ExamList,
+    CourseLikes,
+    CollegeLikes,
+    ExamLikes,
+):
+    Index(f"ix_{_model.__tablename__}_user", _model.user_id)
+
+# GET /list/all: most entries are private, so the public ones are a small
+# partial index instead of a scan over every list
+for _model in (CourseList, CollegeList, ExamList):
+    Index(
+        f"ix_{_model.__tablename__}_public",
+        _model.id,
+        postgresql_where=_model.view == "Public",
+    )
@@ -1,5 +1,6 @@
 import enum
 from dataclasses import dataclass
+from typing import Optional
 
 
 # --------------------------------------------------->         USER
@@ -73,6 +74,19 @@ class Academics:
     cutoff_rank: int
 
 
+# --------------------------------------------------->         PREDICTOR
+_course_type = course_type  # the field below shadows the enum's name
+
+
+@dataclass(slots=True)
+class PredictQuery:
+    exam_id: int
+    rank: int
+    course_type: Optional[_course_type] = None
+    state: Optional[str] = None
+    max_fee: Optional[float] = None
+
+
 # --------------------------------------------------->         POST
 @dataclass(slots=True)
 class Post:
@@ -90,3 +104,18 @@ class view(enum.Enum):
 class List:
     course_id: int
     view: view
+
+
+@dataclass(slots=True)
+class ListBatch:
+    ids: list[int]
+    view: view
+
+
+# --------------------------------------------------->         SQL TRACE
+@dataclass(slots=True)
+class SqlTrace:
+    enabled: Optional[bool] = None
+    slow_ms: Optional[float] = None
+    sample_rate: Optional[float] = None
+    repeat_threshold: Optional[int] = None
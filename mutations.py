@@ -0,0 +1,23 @@
+from typing import Optional
+from sqlalchemy.exc import IntegrityError
+
+
+# // SQLSTATES
+FOREIGN_KEY_VIOLATION = "23503"
+UNIQUE_VIOLATION = "23505"
+
+
+# // INTEGRITY ERRORS
+# writes are single statements: RETURNING (or its absence) says whether a row
+# was hit, and the constraint that failed tells a missing parent from a
+# duplicate, so no SELECT has to run before the write
+def sqlstate(exc: IntegrityError) -> Optional[str]:
+    return getattr(exc.orig, "sqlstate", None)
+
+
+def is_missing(exc: IntegrityError) -> bool:
+    return sqlstate(exc) == FOREIGN_KEY_VIOLATION
+
+
+def is_duplicate(exc: IntegrityError) -> bool:
+    return sqlstate(exc) == UNIQUE_VIOLATION
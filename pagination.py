@@ -0,0 +1,135 @@
+import base64
+import json
+from dataclasses import dataclass
+from typing import Any, Mapping, Optional, Sequence
+from litestar import Response
+from litestar.exceptions import ValidationException
+from litestar.params import Parameter
+from sqlalchemy import Select, tuple_
+import models as md
+
+
+# // PAGINATION CONFIGURATION
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 500
+CURSOR_HEADER = "X-Next-Cursor"
+INT_RANGE = (-(2**31), 2**31 - 1)  # Integer columns are int4
+
+# stable sort keys per table, every key is NOT NULL, is paired with the id and
+# has an index on (key, id). Not likes: it moves between two pages, by likes is
+# GET /{entity}/likes/ranking
+SORT_KEYS: dict[type[md.Base], tuple[str, ...]] = {
+    md.Course: ("id", "name", "duration"),
+    md.College: ("id", "name"),
+    md.Exam: ("id", "name", "fee"),
+    md.Academics: ("id", "course_fee", "cutoff_rank"),
+}
+
+
+@dataclass(slots=True)
+class PageParams:
+    limit: int
+    sort: str
+    after_id: Optional[int]
+    cursor: Optional[str]
+
+    @property
+    def key(self) -> str:
+        return self.sort.lstrip("-")
+
+    @property
+    def descending(self) -> bool:
+        return self.sort.startswith("-")
+
+
+# // DEPENDENCY
+def provide_page(
+    limit: int = Parameter(
+        default=DEFAULT_PAGE_SIZE,
+        ge=1,
+        le=MAX_PAGE_SIZE,
+        description=f"Page size (max {MAX_PAGE_SIZE})",
+    ),
+    sort: str = Parameter(
+        default="id", description="Sort key, prefix with '-' for descending"
+    ),
+    after_id: Optional[int] = Parameter(
+        default=None, description="Return rows after this id (only with sort=id)"
+    ),
+    cursor: Optional[str] = Parameter(
+        default=None, description=f"Opaque cursor from the {CURSOR_HEADER} header"
+    ),
+) -> PageParams:
+    return PageParams(limit=limit, sort=sort, after_id=after_id, cursor=cursor)
+
+
+# // CURSOR
+def encode_cursor(values: Sequence[Any]) -> str:
+    return base64.urlsafe_b64encode(json.dumps(list(values)).encode()).decode()
+
+
+def decode_cursor(cursor: str) -> list[Any]:
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except ValueError:
+        raise ValidationException("⚠️ Invalid cursor")
+    if not isinstance(values, list):
+        raise ValidationException("⚠️ Invalid cursor")
+    return values
+
+
+# a cursor is client input: a value of the wrong type (or out of the column's
+# range) would only fail in postgres, as a 500
+def _cursor_value(value: Any, column: Any) -> Any:
+    kind = column.type.python_type
+    if kind is int and type(value) is int and INT_RANGE[0] <= value <= INT_RANGE[1]:
+        return value
+    if kind is float and type(value) in (int, float):
+        return float(value)
+    if kind is str and type(value) is str and "\x00" not in value:
+        return value
+    raise ValidationException("⚠️ Invalid cursor")
+
+
+# // KEYSET
+def keyset(stmt: Select, model: type[md.Base], page: PageParams) -> Select:
+    if page.key not in SORT_KEYS[model]:
+        raise ValidationException(f"⚠️ Can only sort by {', '.join(SORT_KEYS[model])}")
+    keys = [getattr(model, page.key)]
+    if page.key != "id":
+        keys.append(model.id)  # type: ignore
+
+    values = None
+    if page.cursor is not None:
+        values = decode_cursor(page.cursor)
+        if len(values) != len(keys):
+            raise ValidationException("⚠️ Cursor doesn't match the sort key")
+        values = [_cursor_value(v, k) for v, k in zip(values, keys)]
+    elif page.after_id is not None:
+        if page.key != "id":
+            raise ValidationException("⚠️ after_id only works with sort=id, use cursor")
+        values = [page.after_id]
+
+    if values is not None:
+        left = tuple_(*keys)
+        right = tuple_(*values, types=[k.type for k in keys])
+        stmt = stmt.where(left < right if page.descending else left > right)
+    order = [k.desc() for k in keys] if page.descending else keys
+    # one extra row tells us whether there is a next page
+    return stmt.order_by(*order).limit(page.limit + 1)
+
+
+def _value(row: Any, key: str) -> Any:
+    return row[key] if isinstance(row, Mapping) else getattr(row, key)
+
+
+def paginate(rows: Sequence[Any], page: PageParams) -> Response:
+    headers = {}
+    if len(rows) > page.limit:
+        rows = rows[: page.limit]
+        last = rows[-1]
+        values = [_value(last, page.key)]
+        if page.key != "id":
+            values.append(_value(last, "id"))
+        headers[CURSOR_HEADER] = encode_cursor(values)
+    return Response(list(rows), headers=headers)
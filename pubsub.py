@@ -0,0 +1,65 @@
+import asyncio
+import logging
+from typing import Any, Callable
+import asyncpg
+from sqlalchemy import URL, func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+
+# // PUBSUB CONFIGURATION
+RECONNECT_INTERVAL = 5.0
+
+logger = logging.getLogger(__name__)
+
+_subscribers: dict[str, list[Callable[[str], None]]] = {}
+_reconnect_hooks: list[Callable[[], None]] = []
+
+
+# // PUBLISH / SUBSCRIBE (postgres LISTEN/NOTIFY, reaches every worker)
+def subscribe(
+    channel: str,
+    callback: Callable[[str], None],
+    on_reconnect: Callable[[], None] | None = None,
+) -> None:
+    _subscribers.setdefault(channel, []).append(callback)
+    if on_reconnect is not None:
+        _reconnect_hooks.append(on_reconnect)
+
+
+# NOTIFY is transactional, subscribers only hear about it once `db` commits
+async def publish(db: AsyncSession, channel: str, payload: str) -> None:
+    await db.execute(select(func.pg_notify(channel, payload)))
+
+
+def _dispatch(_: Any, __: int, channel: str, payload: str) -> None:
+    for callback in _subscribers.get(channel, ()):
+        try:
+            callback(payload)
+        except Exception:
+            logger.exception("subscriber of %r failed", channel)
+
+
+# a dedicated asyncpg connection, LISTEN state must not leak into the engine's pool
+async def listen(url: URL) -> None:
+    while True:
+        try:
+            conn = await asyncpg.connect(
+                host=url.host,
+                port=url.port,
+                user=url.username,
+                password=url.password,
+                database=url.database,
+            )
+            try:
+                for channel in _subscribers:
+                    await conn.add_listener(channel, _dispatch)
+                # whatever was published while disconnected is lost
+                for hook in _reconnect_hooks:
+                    hook()
+                while not conn.is_closed():
+                    await asyncio.sleep(RECONNECT_INTERVAL)
+            finally:
+                await conn.close()
+        except (OSError, asyncpg.PostgresError):
+            logger.warning("pubsub listener disconnected, reconnecting")
+        await asyncio.sleep(RECONNECT_INTERVAL)
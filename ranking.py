@@ -0,0 +1,135 @@
+import asyncio
+import logging
+from bisect import bisect_left, insort
+from typing import Callable
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncEngine, AsyncSession
+from sqlalchemy.orm.attributes import set_committed_value
+import models as md
+
+
+# // RANKING CONFIGURATION
+# seconds between two reloads from the DB, picks up likes counted by other workers
+REFRESH_INTERVAL = 60.0
+
+logger = logging.getLogger(__name__)
+
+
+# // TOP-K INDEX
+# ids grouped in buckets by like count, a like moves an id one bucket up and a
+# top-K read walks the buckets from the top in O(K + buckets). Each bucket is
+# sorted by id, the same order as the (likes DESC, id) query of a cold start,
+# so every worker and both paths agree on the order of ties
+class RankingIndex:
+    def __init__(self) -> None:
+        self.likes: dict[int, int] = {}
+        self.buckets: dict[int, list[int]] = {}
+        self.counts: list[int] = []  # distinct like counts, ascending
+        self.ready = False
+
+    def _put(self, entity_id: int, likes: int) -> None:
+        bucket = self.buckets.get(likes)
+        if bucket is None:
+            bucket = self.buckets[likes] = []
+            insort(self.counts, likes)
+        insort(bucket, entity_id)
+        self.likes[entity_id] = likes
+
+    def _take(self, entity_id: int) -> int:
+        likes = self.likes.pop(entity_id)
+        bucket = self.buckets[likes]
+        del bucket[bisect_left(bucket, entity_id)]
+        if not bucket:
+            del self.buckets[likes]
+            del self.counts[bisect_left(self.counts, likes)]
+        return likes
+
+    def load(self, rows: list[tuple[int, int]]) -> None:
+        self.likes, self.buckets, self.counts = {}, {}, []
+        # ascending ids: every insort appends
+        for entity_id, likes in sorted(rows, key=lambda r: (-r[1], r[0])):
+            self._put(entity_id, likes)
+        self.ready = True
+
+    def add(self, entity_id: int, likes: int = 0) -> None:
+        if entity_id not in self.likes:
+            self._put(entity_id, likes)
+
+    def discard(self, entity_id: int) -> None:
+        if entity_id in self.likes:
+            self._take(entity_id)
+
+    def bump(self, entity_id: int, n: int = 1) -> None:
+        # ids this worker hasn't seen yet show up on the next refresh
+        if entity_id in self.likes:
+            self._put(entity_id, self._take(entity_id) + n)
+
+    def top(self, limit: int, offset: int = 0) -> list[int]:
+        ids: list[int] = []
+        for likes in reversed(self.counts):
+            bucket = self.buckets[likes]
+            if offset >= len(bucket):
+                offset -= len(bucket)
+                continue
+            ids.extend(bucket[offset : offset + limit - len(ids)])
+            if len(ids) == limit:
+                return ids
+            offset = 0
+        return ids
+
+
+rankings: dict[type[md.Base], RankingIndex] = {
+    md.Course: RankingIndex(),
+    md.College: RankingIndex(),
+    md.Exam: RankingIndex(),
+}
+
+
+# // SEEDING
+async def seed(
+    conn: AsyncConnection, pending: Callable[[type[md.Base], int], int]
+) -> None:
+    for model, index in rankings.items():
+        res = await conn.execute(select(model.id, model.likes))  # type: ignore
+        # likes not flushed yet are still only in this worker's counter
+        index.load([(i, likes + pending(model, i)) for i, likes in res.all()])
+
+
+async def refresh_periodically(
+    engine: AsyncEngine, pending: Callable[[type[md.Base], int], int]
+) -> None:
+    while True:
+        await asyncio.sleep(REFRESH_INTERVAL)
+        try:
+            async with engine.connect() as conn:
+                await seed(conn, pending)
+        except Exception:
+            logger.exception("ranking refresh failed, retrying on the next tick")
+
+
+# // TOP-K QUERY
+async def top(
+    db: AsyncSession, model: type[md.Base], limit: int, offset: int
+) -> list[md.Base]:
+    index = rankings[model]
+    if not index.ready:
+        # cold start: served by the (likes DESC, id) index
+        stmt = (
+            select(model)
+            .order_by(model.likes.desc(), model.id)  # type: ignore
+            .limit(limit)
+            .offset(offset)
+        )
+        return list((await db.scalars(stmt)).all())
+    ids = index.top(limit, offset)
+    if not ids:
+        return []
+    res = await db.scalars(select(model).where(model.id.in_(ids)))  # type: ignore
+    rows = {row.id: row for row in res.all()}
+    ranked = []
+    for i in ids:
+        if i in rows:
+            # report the live count without marking the row dirty
+            set_committed_value(rows[i], "likes", index.likes.get(i, rows[i].likes))
+            ranked.append(rows[i])
+    return ranked
@@ -0,0 +1,173 @@
+from dataclasses import dataclass
+from typing import Any, Optional
+from litestar import Response
+from litestar.params import Parameter
+from sqlalchemy import Integer, Select, String, bindparam, func, or_, select
+from sqlalchemy.ext.asyncio import AsyncSession
+import models as md, models_validation as mv  # noqa: E401
+import pagination as pg
+
+
+# // TEXT SEARCH CONFIGURATION
+TEXT_SEARCH_CONFIG = "english"  # must match the generated `search` columns
+MAX_QUERY_LENGTH = 200
+
+
+@dataclass(slots=True)
+class SearchParams:
+    fee_min: Optional[float]
+    fee_max: Optional[float]
+    rank_min: Optional[int]
+    rank_max: Optional[int]
+    exam_id: Optional[list[int]]
+    course_type: Optional[mv.course_type]
+    state: Optional[str]
+    city: Optional[str]
+    country: Optional[str]
+    facets: bool
+
+
+# // DEPENDENCY
+def provide_search(
+    fee_min: Optional[float] = Parameter(default=None, description="Min course fee"),
+    fee_max: Optional[float] = Parameter(default=None, description="Max course fee"),
+    rank_min: Optional[int] = Parameter(default=None, description="Min cutoff rank"),
+    rank_max: Optional[int] = Parameter(default=None, description="Max cutoff rank"),
+    exam_id: Optional[list[int]] = Parameter(
+        default=None, description="Exam ids, repeat for several"
+    ),
+    course_type: Optional[mv.course_type] = Parameter(
+        default=None, description="Course type"
+    ),
+    # `state` is reserved by litestar for the app state
+    college_state: Optional[str] = Parameter(
+        query="state", default=None, description="College state"
+    ),
+    city: Optional[str] = Parameter(default=None, description="College city"),
+    country: Optional[str] = Parameter(default=None, description="College country"),
+    facets: bool = Parameter(
+        default=True, description="Count results per state, exam and course type"
+    ),
+) -> SearchParams:
+    return SearchParams(
+        fee_min=fee_min,
+        fee_max=fee_max,
+        rank_min=rank_min,
+        rank_max=rank_max,
+        exam_id=exam_id,
+        course_type=course_type,
+        state=college_state,
+        city=city,
+        country=country,
+        facets=facets,
+    )
+
+
+# // QUERY
+def _filtered(stmt: Select, params: SearchParams) -> Select:
+    a, co, cl = md.Academics, md.Course, md.College
+    stmt = stmt.join(co, co.id == a.course_id).join(cl, cl.id == a.college_id)
+    if params.fee_min is not None:
+        stmt = stmt.where(a.course_fee >= params.fee_min)
+    if params.fee_max is not None:
+        stmt = stmt.where(a.course_fee <= params.fee_max)
+    if params.rank_min is not None:
+        stmt = stmt.where(a.cutoff_rank >= params.rank_min)
+    if params.rank_max is not None:
+        stmt = stmt.where(a.cutoff_rank <= params.rank_max)
+    if params.exam_id:
+        stmt = stmt.where(a.exam_id.in_(params.exam_id))
+    if params.course_type is not None:
+        stmt = stmt.where(co.type == params.course_type.value)
+    if params.state is not None:
+        stmt = stmt.where(cl.state == params.state)
+    if params.city is not None:
+        stmt = stmt.where(cl.city == params.city)
+    if params.country is not None:
+        stmt = stmt.where(cl.country == params.country)
+    return stmt
+
+
+def results(params: SearchParams) -> Select:
+    a, co, cl, ex = md.Academics, md.Course, md.College, md.Exam
+    stmt = select(
+        a.id,
+        a.course_fee,
+        a.cutoff_rank,
+        a.course_id,
+        co.name.label("course"),
+        co.type.label("course_type"),
+        a.college_id,
+        cl.name.label("college"),
+        cl.city,
+        cl.state,
+        cl.country,
+        a.exam_id,
+        ex.name.label("exam"),
+    ).join(ex, ex.id == a.exam_id)
+    return _filtered(stmt, params)
+
+
+# one pass over the matching rows counts all three facets
+FACETS = {
+    "state": md.College.state,
+    "exam": md.Academics.exam_id,
+    "course_type": md.Course.type,
+}
+
+
+# GROUPING() sets one bit (leftmost key first) per key left out of a row's set
+_n = len(FACETS)
+GROUPING_SETS = {((1 << _n) - 1) ^ (1 << (_n - 1 - i)): i for i in range(_n)}
+
+
+def facets(params: SearchParams) -> Select:
+    keys = list(FACETS.values())
+    stmt = select(
+        *keys, func.grouping(*keys).label("set"), func.count().label("total")
+    ).group_by(func.grouping_sets(*keys))
+    return _filtered(stmt.select_from(md.Academics), params)
+
+
+async def search(
+    db: AsyncSession, params: SearchParams, page: pg.PageParams
+) -> Response:
+    stmt = pg.keyset(results(params), md.Academics, page)
+    rows = [dict(row) for row in (await db.execute(stmt)).mappings()]
+    response = pg.paginate(rows, page)
+    content: dict[str, Any] = {"results": response.content}
+    if params.facets:
+        names = list(FACETS)
+        counts: dict[str, list[dict[str, Any]]] = {name: [] for name in names}
+        for row in await db.execute(facets(params)):
+            i = GROUPING_SETS[row.set]
+            counts[names[i]].append({"value": row[i], "count": row.total})
+        for values in counts.values():
+            values.sort(key=lambda v: -v["count"])
+        content["facets"] = counts
+    response.content = content
+    return response
+
+
+# // TEXT SEARCH
+# words go through the GIN tsvector index, typos in the name through the
+# trigram index (`%` uses pg_trgm.similarity_threshold), postgres ORs the two
+# bitmap scans and only the matching rows are ranked; built once per model
+# with :q, :limit and :offset bound at execution
+def text_search(model: type[md.Base]) -> Select:
+    q = bindparam("q", type_=String)
+    query = func.websearch_to_tsquery(TEXT_SEARCH_CONFIG, q)
+    rank = func.ts_rank_cd(model.search, query)  # type: ignore
+    score = rank + func.similarity(model.name, q)  # type: ignore
+    return (
+        select(model)
+        .where(
+            or_(
+                model.search.bool_op("@@")(query),  # type: ignore
+                model.name.bool_op("%")(q),  # type: ignore
+            )
+        )
+        .order_by(score.desc(), model.id)  # type: ignore
+        .limit(bindparam("limit", type_=Integer))
+        .offset(bindparam("offset", type_=Integer))
+    )
@@ -0,0 +1,141 @@
+import json
+import logging
+import os
+import random
+from contextvars import ContextVar, Token
+from dataclasses import asdict, dataclass
+from time import perf_counter
+from typing import Any, Optional
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.ext.asyncio import AsyncSession
+import pubsub
+
+
+# // SQL TRACE CONFIGURATION
+CHANNEL = "sql_trace"
+MAX_STATEMENT_LENGTH = 1000  # longer statements are cut in the log
+
+logger = logging.getLogger(__name__)
+
+
+# defaults from the environment, PATCH /admin/sql-trace changes them on every
+# worker at once (postgres NOTIFY), no restart
+@dataclass(slots=True)
+class Settings:
+    enabled: bool = os.environ.get("SQL_TRACE", "1") == "1"
+    slow_ms: float = float(os.environ.get("SQL_SLOW_MS", "100"))
+    sample_rate: float = float(os.environ.get("SQL_SLOW_SAMPLE_RATE", "1"))
+    repeat_threshold: int = int(os.environ.get("SQL_REPEAT_THRESHOLD", "5"))
+
+
+settings = Settings()
+
+
+# // PER-REQUEST TRACE
+class RequestTrace:
+    __slots__ = ("route", "queries", "db_time", "statements")
+
+    def __init__(self, route: str) -> None:
+        self.route = route
+        self.queries = 0
+        self.db_time = 0.0
+        self.statements: dict[str, int] = {}  # only while tracing is on
+
+
+# the async engine runs the driver in a greenlet that shares the request's
+# context, so the cursor events below see the request they belong to
+_current: ContextVar[Optional[RequestTrace]] = ContextVar("sql_trace", default=None)
+
+
+def start(route: str) -> tuple[RequestTrace, Token[Optional[RequestTrace]]]:
+    trace = RequestTrace(route)
+    return trace, _current.set(trace)
+
+
+# returns how many statements ran often enough in the request to look like N+1
+def finish(trace: RequestTrace, token: Token[Optional[RequestTrace]]) -> int:
+    _current.reset(token)
+    if not trace.statements:
+        return 0
+    repeated = [
+        (statement, n)
+        for statement, n in trace.statements.items()
+        if n >= settings.repeat_threshold
+    ]
+    for statement, n in repeated:
+        logger.warning(
+            "N+1 on %s: same statement %d times in one request: %s",
+            trace.route,
+            n,
+            _shorten(statement),
+            extra={"route": trace.route, "repeats": n},
+        )
+    return len(repeated)
+
+
+# // CURSOR EVENTS
+def _shorten(statement: str) -> str:
+    return " ".join(statement.split())[:MAX_STATEMENT_LENGTH]
+
+
+# values never reach the log (passwords, emails, tokens), only their types
+def _redact(parameters: Any, executemany: bool) -> str:
+    if executemany:
+        return f"{len(parameters)} rows"
+    if isinstance(parameters, dict):
+        parameters = parameters.values()
+    return ", ".join(type(p).__name__ for p in parameters or ())
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _query_start(conn: Any, *_: Any) -> None:
+    conn.info["query_start"] = perf_counter()
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _query_end(
+    conn: Any,
+    _: Any,
+    statement: str,
+    parameters: Any,
+    __: Any,
+    executemany: bool,
+) -> None:
+    elapsed = perf_counter() - conn.info.pop("query_start", perf_counter())
+    trace = _current.get()
+    if trace is not None:
+        trace.queries += 1
+        trace.db_time += elapsed
+    if not settings.enabled:
+        return
+    if trace is not None:
+        seen = trace.statements
+        seen[statement] = seen.get(statement, 0) + 1
+    if elapsed * 1000 >= settings.slow_ms and random.random() < settings.sample_rate:
+        route = trace.route if trace is not None else "background"
+        logger.warning(
+            "slow query on %s: %.1f ms: %s [%s]",
+            route,
+            elapsed * 1000,
+            _shorten(statement),
+            _redact(parameters, executemany),
+            extra={"route": route, "duration_ms": round(elapsed * 1000, 3)},
+        )
+
+
+# // RUNTIME TOGGLE
+def _apply(payload: str) -> None:
+    for key, value in json.loads(payload).items():
+        if key in Settings.__slots__:  # type: ignore
+            setattr(settings, key, type(getattr(settings, key))(value))
+    logger.warning("sql trace settings: %s", asdict(settings))
+
+
+# NOTIFY is transactional, every worker applies it once `db` commits
+async def configure(db: AsyncSession, changes: dict[str, Any]) -> dict[str, Any]:
+    await pubsub.publish(db, CHANNEL, json.dumps(changes))
+    return {**asdict(settings), **changes}
+
+
+pubsub.subscribe(CHANNEL, _apply)
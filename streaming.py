@@ -0,0 +1,47 @@
+from typing import Any, AsyncIterator
+from litestar import Request
+from litestar.dto.field import DTO_FIELD_META_KEY, Mark
+from litestar.response import Stream
+from litestar.serialization import encode_json
+from sqlalchemy import Column, Select, select
+from sqlalchemy.ext.asyncio import AsyncEngine
+import models as md
+
+
+# // STREAMING CONFIGURATION
+NDJSON = "application/x-ndjson"
+CHUNK_SIZE = 1000
+
+
+def wants_ndjson(request: Request) -> bool:
+    return NDJSON in request.headers.get("accept", "")
+
+
+def public(column: Column[Any]) -> bool:
+    # same rule as the DTOs: private columns (search vectors) are never sent out
+    field = column.info.get(DTO_FIELD_META_KEY)
+    return getattr(field, "mark", None) != Mark.PRIVATE
+
+
+def columns(model: type[md.Base]) -> list[Column[Any]]:
+    return [c for c in model.__table__.columns if public(c)]
+
+
+def table_dump(model: type[md.Base]) -> Select:
+    return select(*columns(model)).order_by(model.id)  # type: ignore
+
+
+# // NDJSON STREAM
+# runs on its own connection while the body is sent, handlers serving it take
+# no injected `db` (see db_connection.transaction)
+async def _ndjson_chunks(
+    engine: AsyncEngine, stmt: Select, chunk_size: int
+) -> AsyncIterator[bytes]:
+    async with engine.connect() as conn:
+        result = await conn.stream(stmt.execution_options(yield_per=chunk_size))
+        async for part in result.mappings().partitions(chunk_size):
+            yield b"".join(encode_json(dict(row)) + b"\n" for row in part)
+
+
+def ndjson(engine: AsyncEngine, stmt: Select, chunk_size: int = CHUNK_SIZE) -> Stream:
+    return Stream(_ndjson_chunks(engine, stmt, chunk_size), media_type=NDJSON)
@@ -0,0 +1,185 @@
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Optional
+from litestar import Response
+from litestar.exceptions import ValidationException
+from litestar.params import Parameter
+from sqlalchemy import Column, Select, func, literal, select, true, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+import models as md
+import pagination as pg
+
+
+# // THREAD CONFIGURATION
+DEFAULT_TOP_LEVEL = 20
+MAX_TOP_LEVEL = 100
+DEFAULT_DEPTH = 3
+MAX_DEPTH = 10
+DEFAULT_REPLIES = 5  # replies loaded under each post, the rest become a stub
+MAX_REPLIES = 50
+
+# post table -> (entity column, parent post column)
+THREADS: dict[type[md.Base], tuple[str, str]] = {
+    md.CoursePost: ("course_id", "coursepost_id"),
+    md.CollegePost: ("college_id", "collegepost_id"),
+    md.ExamPost: ("exam_id", "exampost_id"),
+}
+FIELDS = ("id", "title", "body", "user_id", "created_at")
+
+
+@dataclass(slots=True)
+class ThreadParams:
+    parent_id: Optional[int]
+    limit: int
+    depth: int
+    replies: int
+    cursor: Optional[str]
+
+
+# // DEPENDENCY
+def provide_thread(
+    parent_id: Optional[int] = Parameter(
+        default=None, description="Start below this post (load more replies)"
+    ),
+    limit: int = Parameter(
+        default=DEFAULT_TOP_LEVEL,
+        ge=1,
+        le=MAX_TOP_LEVEL,
+        description="Top-level posts per page",
+    ),
+    depth: int = Parameter(
+        default=DEFAULT_DEPTH, ge=1, le=MAX_DEPTH, description="Levels to expand"
+    ),
+    replies: int = Parameter(
+        default=DEFAULT_REPLIES,
+        ge=0,
+        le=MAX_REPLIES,
+        description="Replies loaded per post",
+    ),
+    cursor: Optional[str] = Parameter(
+        default=None, description=f"Opaque cursor from the {pg.CURSOR_HEADER} header"
+    ),
+) -> ThreadParams:
+    return ThreadParams(
+        parent_id=parent_id, limit=limit, depth=depth, replies=replies, cursor=cursor
+    )
+
+
+def _cursor(node: dict[str, Any]) -> str:
+    return pg.encode_cursor([node["created_at"].isoformat(), node["id"]])
+
+
+def _after(cursor: str) -> tuple[datetime, int]:
+    values = pg.decode_cursor(cursor)
+    try:
+        created_at, post_id = values
+        after = datetime.fromisoformat(created_at)
+    except (TypeError, ValueError):
+        raise ValidationException("⚠️ Invalid cursor")
+    # created_at is a timestamp without time zone, the id an int4
+    if after.tzinfo is not None or type(post_id) is not int:
+        raise ValidationException("⚠️ Invalid cursor")
+    if not pg.INT_RANGE[0] <= post_id <= pg.INT_RANGE[1]:
+        raise ValidationException("⚠️ Invalid cursor")
+    return after, post_id
+
+
+# // RECURSIVE QUERY
+# level 1 is one page of posts under `parent_id`, every level below takes the
+# first `replies` children of each post through a LATERAL LIMIT, so a post
+# with thousands of replies costs `replies` index entries, not thousands
+def _thread(
+    model: type[md.Base],
+    entity_id: int,
+    parent_id: Optional[int],
+    after: Optional[tuple[datetime, int]],
+    limit: int,
+    depth: int,
+    replies: int,
+) -> Select:
+    post = model.__table__
+    entity, parent = (post.c[name] for name in THREADS[model])
+
+    def fields(table: Any) -> list[Column[Any]]:
+        return [table.c[name] for name in FIELDS]
+
+    top = select(
+        *fields(post),
+        parent.label("parent_id"),
+        literal(1).label("depth"),
+        func.row_number().over(order_by=(post.c.created_at, post.c.id)).label("rn"),
+    ).where(entity == entity_id, parent == parent_id)
+    if after is not None:
+        top = top.where(tuple_(post.c.created_at, post.c.id) > tuple_(*after))
+    # one extra top-level post tells us whether there is a next page
+    top = top.order_by(post.c.created_at, post.c.id).limit(limit + 1).subquery()
+    tree = select(*top.c).cte("tree", recursive=True)
+
+    child = post.alias("child")
+    first = (
+        select(*fields(child), child.c[parent.name].label("parent_id"))
+        .where(child.c[entity.name] == entity_id)
+        .where(child.c[parent.name] == tree.c.id)
+        .order_by(child.c.created_at, child.c.id)
+        .limit(replies)
+        .lateral("first")
+    )
+    tree = tree.union_all(
+        select(*first.c, tree.c.depth + 1, tree.c.rn)
+        .select_from(tree.join(first, true()))
+        .where(tree.c.depth < depth, tree.c.rn <= limit)
+    )
+
+    total = (
+        select(func.count())
+        .where(child.c[entity.name] == entity_id)
+        .where(child.c[parent.name] == tree.c.id)
+        .scalar_subquery()
+    )
+    return select(*tree.c, total.label("reply_count")).order_by(
+        tree.c.depth, tree.c.created_at, tree.c.id
+    )
+
+
+# // TREE
+async def thread(
+    db: AsyncSession,
+    model: type[md.Base],
+    entity_id: int,
+    params: ThreadParams,
+) -> Response:
+    after = _after(params.cursor) if params.cursor is not None else None
+    limit = params.limit
+    stmt = _thread(
+        model,
+        entity_id,
+        params.parent_id,
+        after,
+        limit,
+        params.depth,
+        params.replies,
+    )
+    rows = (await db.execute(stmt)).mappings().all()
+
+    nodes: dict[int, dict[str, Any]] = {}
+    roots: list[dict[str, Any]] = []
+    for row in rows:  # parents always come before their replies
+        node = {name: row[name] for name in FIELDS}
+        node["replies"] = []
+        node["more_replies"] = row["reply_count"]
+        node["replies_cursor"] = None
+        nodes[node["id"]] = node
+        if row["depth"] == 1:
+            roots.append(node)
+        else:
+            up = nodes[row["parent_id"]]
+            up["replies"].append(node)
+            up["more_replies"] -= 1
+            # continue with ?parent_id=<id>&cursor=<replies_cursor>
+            up["replies_cursor"] = _cursor(node) if up["more_replies"] else None
+
+    headers = {}
+    if len(roots) > limit:
+        roots = roots[:limit]
+        headers[pg.CURSOR_HEADER] = _cursor(roots[-1])
+    return Response(roots, headers=headers)